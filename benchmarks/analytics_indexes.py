@@ -0,0 +1,174 @@
+"""
+Compare the analytics queries before and after the `0002` index migration.
+
+Fills the configured database with generated data, runs the queries on
+the `0001` schema (no indexes), upgrades to head and runs them again.
+Every table is truncated first, point it at a scratch database.
+
+    PYTHONPATH=src python -m benchmarks.analytics_indexes [--scale 1.0]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from server.db import engine
+from server.db.models import PageView, QuizSubmission, QuizSubmissionAnswer, User
+from server.routes.platform_stats import services as platform_stats_services
+from server.routes.quizes import services as quizes_services
+from server.routes.students import services as students_services
+
+USERS = 50_000
+QUIZES = 200
+SUBMISSIONS = 500_000
+PAGE_VIEWS = 5_000_000
+
+FILL_STATEMENTS = [
+    "TRUNCATE users, quizes, quiz_questions, quiz_question_options,"
+    " quiz_submissions, quiz_submission_answer, challenges,"
+    " challenge_submissions, page_views RESTART IDENTITY CASCADE",
+    "INSERT INTO users (username, name, password, role, created_at)"
+    " SELECT 'user' || i, 'User ' || i, '',"
+    " CASE WHEN i % 10 = 0 THEN 'editor' ELSE 'student' END,"
+    " now() - random() * interval '365 days'"
+    " FROM generate_series(1, :users) i",
+    "INSERT INTO quizes (title, created_at)"
+    " SELECT 'Quiz ' || i, now() FROM generate_series(1, :quizes) i",
+    "INSERT INTO quiz_questions (quiz_id, title, created_at)"
+    " SELECT q.id, 'Question ' || i, now()"
+    " FROM quizes q, generate_series(1, 10) i ORDER BY q.id, i",
+    "INSERT INTO quiz_question_options (question_id, text, is_correct)"
+    " SELECT qq.id, 'Option ' || i, i = 1"
+    " FROM quiz_questions qq, generate_series(1, 4) i ORDER BY qq.id, i",
+    "INSERT INTO quiz_submissions (user_id, quiz_id, created_at)"
+    " SELECT 1 + floor(random() * :users)::int, 1 + floor(random() * :quizes)::int,"
+    " now() - random() * interval '365 days'"
+    " FROM generate_series(1, :submissions)",
+    # Options were inserted in question order, four per question
+    "INSERT INTO quiz_submission_answer"
+    " (submission_id, question_id, selected_option_id, spent_time_seconds)"
+    " SELECT s.id, qq.id, (qq.id - 1) * 4 + 1 + floor(random() * 4)::int,"
+    " 10 + floor(random() * 290)::int"
+    " FROM quiz_submissions s JOIN quiz_questions qq ON qq.quiz_id = s.quiz_id",
+    "INSERT INTO page_views (user_id, url, duration, created_at)"
+    " SELECT 1 + floor(random() * :users)::int,"
+    " '/quiz/' || floor(random() * 300)::int, 10 + floor(random() * 290)::int,"
+    " now() - random() * interval '365 days'"
+    " FROM generate_series(1, :page_views)",
+    "ANALYZE",
+]
+
+EXPLAINED_QUERIES = {
+    "submissions of a quiz": select(func.count()).where(QuizSubmission.quiz_id == 7),
+    "submissions of a user": select(func.count()).where(QuizSubmission.user_id == 42),
+    "answers of an option": select(func.count()).where(
+        QuizSubmissionAnswer.selected_option_id == 123
+    ),
+    "monthly active users": select(func.count(func.distinct(PageView.user_id))).where(
+        PageView.created_at >= func.now() - text("interval '30 days'")
+    ),
+    "user activity": select(func.count()).where(
+        PageView.user_id == 42,
+        PageView.created_at >= func.now() - text("interval '30 days'"),
+    ),
+    "views of a page": select(func.count()).where(PageView.url == "/quiz/7"),
+    "students count": select(func.count()).where(User.role == "student"),
+}
+
+
+def get_service_calls(db_session: AsyncSession):
+    today = date.today()
+    return {
+        "list_quizes(ids)": lambda: quizes_services.list_quizes(
+            db_session=db_session,
+            ids=[1, 2, 3],
+        ),
+        "list_students(usernames)": lambda: students_services.list_students(
+            db_session=db_session,
+            usernames=["user1", "user2", "user3"],
+        ),
+        "get_student_stats": lambda: students_services.get_student_stats(
+            db_session=db_session,
+        ),
+        "get_platform_stats": lambda: platform_stats_services.get_platform_stats(
+            db_session=db_session,
+        ),
+        "get_daily_platform_stats": lambda: (
+            platform_stats_services.get_daily_platform_stats_distribution(
+                db_session=db_session,
+                start_date=today - timedelta(days=30),
+                end_date=today,
+            )
+        ),
+    }
+
+
+async def fill(scale: float) -> None:
+    params = {
+        "users": int(USERS * scale),
+        "quizes": max(int(QUIZES * scale), 1),
+        "submissions": int(SUBMISSIONS * scale),
+        "page_views": int(PAGE_VIEWS * scale),
+    }
+    bench_engine = create_async_engine(engine.url, poolclass=NullPool)
+    async with bench_engine.begin() as conn:
+        for statement in FILL_STATEMENTS:
+            await conn.execute(text(statement), params)
+    await bench_engine.dispose()
+
+
+async def measure() -> dict[str, float]:
+    """Execution time in milliseconds for every query"""
+
+    bench_engine = create_async_engine(engine.url, poolclass=NullPool)
+    results = {}
+    async with bench_engine.connect() as conn:
+        for name, query in EXPLAINED_QUERIES.items():
+            sql = query.compile(
+                dialect=conn.dialect,
+                compile_kwargs={"literal_binds": True},
+            )
+            plan = await conn.scalar(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"))
+            results[name] = plan[0]["Execution Time"]
+
+    async with async_sessionmaker(bench_engine)() as session:
+        for name, call in get_service_calls(session).items():
+            timings = []
+            for _ in range(3):
+                started_at = time.perf_counter()
+                await call()
+                timings.append((time.perf_counter() - started_at) * 1000)
+            results[name] = min(timings)
+
+    await bench_engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    config = Config("alembic.ini")
+    command.upgrade(config, "0001")
+    command.downgrade(config, "0001")
+    asyncio.run(fill(args.scale))
+    before = asyncio.run(measure())
+
+    command.upgrade(config, "head")
+    after = asyncio.run(measure())
+
+    print(f"{'query':<28} {'before, ms':>12} {'after, ms':>12}")
+    for name in before:
+        print(f"{name:<28} {before[name]:>12.1f} {after[name]:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
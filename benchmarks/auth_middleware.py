@@ -0,0 +1,108 @@
+"""
+Compare the pure ASGI `AuthenticationMiddleware` with the previous
+`BaseHTTPMiddleware` based implementation.
+
+Endpoints mirror the shape of the protected `/quizes` and the public
+`/students/{username}` routes but don't touch the database, so only the
+middleware overhead is measured.
+
+    ENV=testing PYTHONPATH=src python -m benchmarks.auth_middleware
+"""
+
+import asyncio
+import statistics
+import time
+
+from fakeredis.aioredis import FakeRedis
+from fastapi import FastAPI, Request, Response
+from httpx import ASGITransport, AsyncClient
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+
+from server.authentication.utils import protected_route
+from server.config import settings
+from server.middlewares import AuthenticationMiddleware
+from server.routes.auth.jwt import generate_jwt
+
+REQUESTS = 5000
+CONCURRENCY = 32
+
+
+class LegacyAuthenticationMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, redis) -> None:
+        super().__init__(app)
+        self._auth = AuthenticationMiddleware(app, redis=redis)
+
+    async def dispatch(
+        self,
+        request: Request,
+        call_next: RequestResponseEndpoint,
+    ) -> Response:
+        response = await self._auth.authenticate(request)
+        if response is not None:
+            return response
+        return await call_next(request)
+
+
+def build_app(middleware_class: type) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware_class, redis=FakeRedis())
+
+    @app.get("/quizes")
+    @protected_route
+    async def list_quizes():
+        return []
+
+    @app.get("/students/{username}")
+    async def get_student(username: str):
+        return {"username": username}
+
+    return app
+
+
+async def run(app: FastAPI, path: str, headers: dict[str, str]) -> tuple[float, float]:
+    latencies: list[float] = []
+    queue: asyncio.Queue[None] = asyncio.Queue()
+    for _ in range(REQUESTS):
+        queue.put_nowait(None)
+
+    async with AsyncClient(
+        transport=ASGITransport(app),
+        base_url="http://bench",
+    ) as client:
+
+        async def worker() -> None:
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - started
+
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    return REQUESTS / elapsed, p99 * 1000
+
+
+async def main() -> None:
+    token = generate_jwt(username="bench", jwt_secret=settings.JWT_SECRET)
+    cases = [
+        ("/quizes", {"Authorization": f"Bearer {token}"}),
+        ("/students/bench", {}),
+    ]
+
+    for path, headers in cases:
+        for name, middleware_class in (
+            ("BaseHTTPMiddleware", LegacyAuthenticationMiddleware),
+            ("pure ASGI", AuthenticationMiddleware),
+        ):
+            app = build_app(middleware_class)
+            await run(app, path, headers)  # warmup
+            rps, p99 = await run(app, path, headers)
+            print(f"{path:<18} {name:<20} {rps:>8.0f} req/s  p99 {p99:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
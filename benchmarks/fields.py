@@ -0,0 +1,96 @@
+"""
+Time the first page of the quizes and the students, and a quiz detail, with
+every aggregate against the "titles and counts" view of `fields=title`.
+
+The quiz list used to aggregate the questions of its page even though it
+doesn't return them, its first row is that. Fills the configured database
+like `benchmarks.quiz_filters`, every table is truncated first, point it at
+a scratch database.
+
+    PYTHONPATH=src python -m benchmarks.fields [--scale 1.0]
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from benchmarks.quiz_filters import QUIZES, SUBMISSIONS, USERS, fill
+from server.db import engine
+from server.routes.quizes import services as quizes_services
+from server.routes.quizes.schemas import QuizDetailSchema
+from server.routes.students import services as students_services
+from server.routes.students.schemas import StudentDetailSchema
+
+COUNTS_ONLY = frozenset()
+
+
+def get_service_calls(db_session: AsyncSession):
+    """Call name: service call taking the aggregates to compute"""
+    return {
+        "list_quizes": lambda fields: quizes_services.list_quizes(
+            db_session, fields=fields
+        ),
+        "get_quiz": lambda fields: quizes_services.list_quizes(
+            db_session, ids=[1], out_type=QuizDetailSchema, fields=fields
+        ),
+        "list_students": lambda fields: students_services.list_students(
+            db_session, fields=fields
+        ),
+        "get_student": lambda fields: students_services.list_students(
+            db_session, usernames=["user1"], out_type=StudentDetailSchema, fields=fields
+        ),
+    }
+
+
+async def measure() -> dict[str, tuple[float, float]]:
+    """Best times in milliseconds, with every aggregate and with none"""
+    bench_engine = create_async_engine(engine.url, poolclass=NullPool)
+    results = {}
+    async with async_sessionmaker(bench_engine)() as session:
+        all_fields = {
+            "list_quizes": quizes_services.QUIZ_FIELDS,
+            "get_quiz": quizes_services.QUIZ_FIELDS,
+            "list_students": students_services.STUDENT_FIELDS,
+            "get_student": students_services.STUDENT_FIELDS,
+        }
+        for name, call in get_service_calls(session).items():
+            timings = []
+            for fields in (all_fields[name], COUNTS_ONLY):
+                runs = []
+                for _ in range(5):
+                    started_at = time.perf_counter()
+                    await call(fields)
+                    runs.append((time.perf_counter() - started_at) * 1000)
+                timings.append(min(runs))
+            results[name] = tuple(timings)
+
+    await bench_engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    asyncio.run(
+        fill(
+            {
+                "users": int(USERS * args.scale),
+                "quizes": max(int(QUIZES * args.scale), 1),
+                "submissions": int(SUBMISSIONS * args.scale),
+            }
+        )
+    )
+    results = asyncio.run(measure())
+
+    print(f"{'call':<16} {'all fields, ms':>16} {'counts only, ms':>16}")
+    for name, (every_aggregate, counts_only) in results.items():
+        print(f"{name:<16} {every_aggregate:>16.1f} {counts_only:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Time the item analysis of a quiz of 10 questions and 100k submissions, and
+the longest the event loop stalls meanwhile.
+
+Adds the quiz to the configured database, and removes it at the end.
+
+    PYTHONPATH=src python -m benchmarks.item_analysis [--scale 1.0]
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from server.db import engine
+from server.routes.quizes import services as quizes_services
+
+SUBMISSIONS = 100_000
+
+FILL_STATEMENTS = [
+    "INSERT INTO users (username, name, password, role, created_at)"
+    " VALUES ('item-analysis', 'Item analysis', '', 'student', now())",
+    "INSERT INTO quizes (title, description, created_at)"
+    " VALUES ('Item analysis', '', now())",
+    "INSERT INTO quiz_questions (quiz_id, title, description, created_at)"
+    " SELECT max(q.id), 'Question ' || i, '', now()"
+    " FROM quizes q, generate_series(1, 10) i GROUP BY i ORDER BY i",
+    "INSERT INTO quiz_question_options (question_id, text, is_correct)"
+    " SELECT qq.id, 'Option ' || i, i = 1"
+    " FROM quiz_questions qq, generate_series(1, 4) i"
+    " WHERE qq.quiz_id = (SELECT max(id) FROM quizes) ORDER BY qq.id, i",
+    "INSERT INTO quiz_submissions (user_id, quiz_id, created_at)"
+    " SELECT u.id, q.id, now()"
+    " FROM generate_series(1, :submissions),"
+    " (SELECT max(id) AS id FROM quizes) q,"
+    " (SELECT id FROM users WHERE username = 'item-analysis') u",
+    # Better submissions pick the correct option more often
+    "INSERT INTO quiz_submission_answer"
+    " (submission_id, question_id, selected_option_id, spent_time_seconds)"
+    " SELECT s.id, qq.id, o.first_id"
+    " + CASE WHEN random() < s.id % 100 / 100.0 THEN 0"
+    " ELSE 1 + floor(random() * 3)::int END,"
+    " 10 + floor(random() * 290)::int"
+    " FROM quiz_submissions s"
+    " JOIN quiz_questions qq ON qq.quiz_id = s.quiz_id"
+    " JOIN (SELECT question_id, min(id) AS first_id FROM quiz_question_options"
+    " GROUP BY question_id) o ON o.question_id = qq.id"
+    " WHERE s.quiz_id = (SELECT max(id) FROM quizes)",
+    "VACUUM ANALYZE quiz_submission_answer",
+]
+
+CLEANUP_STATEMENTS = [
+    "DELETE FROM quiz_submission_answer WHERE question_id IN"
+    " (SELECT id FROM quiz_questions WHERE quiz_id = :quiz_id)",
+    "DELETE FROM quiz_submissions WHERE quiz_id = :quiz_id",
+    "DELETE FROM quiz_question_options WHERE question_id IN"
+    " (SELECT id FROM quiz_questions WHERE quiz_id = :quiz_id)",
+    "DELETE FROM quiz_questions WHERE quiz_id = :quiz_id",
+    "DELETE FROM quizes WHERE id = :quiz_id",
+    "DELETE FROM users WHERE username = 'item-analysis'",
+]
+
+
+async def run_statements(statements: list[str], params: dict[str, int]) -> None:
+    bench_engine = create_async_engine(
+        engine.url, poolclass=NullPool, isolation_level="AUTOCOMMIT"
+    )
+    async with bench_engine.connect() as conn:
+        for statement in statements:
+            await conn.execute(text(statement), params)
+    await bench_engine.dispose()
+
+
+async def measure_loop_lag(lags: list[float]) -> None:
+    while True:
+        started_at = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - started_at - 0.001)
+
+
+async def run(scale: float) -> None:
+    await run_statements(
+        FILL_STATEMENTS, {"submissions": max(int(SUBMISSIONS * scale), 1)}
+    )
+    bench_engine = create_async_engine(engine.url, poolclass=NullPool)
+    executor = ThreadPoolExecutor(max_workers=1)
+    async with async_sessionmaker(bench_engine)() as session:
+        quiz_id = await session.scalar(text("SELECT max(id) FROM quizes"))
+        for _ in range(3):
+            lags: list[float] = []
+            lag_task = asyncio.create_task(measure_loop_lag(lags))
+            started_at = time.perf_counter()
+            analysis = await quizes_services.get_item_analysis(
+                session, quiz_id, executor
+            )
+            elapsed = time.perf_counter() - started_at
+            lag_task.cancel()
+            print(
+                f"{analysis.submissions} submissions: {elapsed * 1000:.1f} ms,"
+                f" longest loop stall {max(lags, default=0) * 1000:.1f} ms"
+            )
+
+    executor.shutdown()
+    await bench_engine.dispose()
+    await run_statements(CLEANUP_STATEMENTS, {"quiz_id": quiz_id})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.scale))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare encode/decode throughput of python-jose with `Hs256Codec`.
+
+    ENV=testing PYTHONPATH=src python -m benchmarks.jwt_codec
+"""
+
+import time
+import timeit
+
+from jose import jwt
+
+from server.routes.auth.jwt import Hs256Codec
+
+SECRET = "12345678"
+NUMBER = 20_000
+
+
+def ops_per_second(func) -> float:
+    func()  # warmup
+    return NUMBER / timeit.timeit(func, number=NUMBER)
+
+
+def main() -> None:
+    claims = {
+        "username": "john.smith",
+        "exp": int(time.time()) + 3600,
+        "jti": "Zm9vYmFyYmF6cXV4",
+        "gen": 0,
+    }
+    codec = Hs256Codec(SECRET)
+    token = codec.encode(claims)
+
+    cases = [
+        (
+            "encode",
+            lambda: jwt.encode(claims, key=SECRET, algorithm="HS256"),
+            lambda: codec.encode(claims),
+        ),
+        (
+            "decode",
+            lambda: jwt.decode(token, key=SECRET, algorithms=["HS256"]),
+            lambda: codec.decode(token),
+        ),
+    ]
+
+    for name, jose_func, codec_func in cases:
+        jose_ops = ops_per_second(jose_func)
+        codec_ops = ops_per_second(codec_func)
+        print(
+            f"{name:<8} python-jose {jose_ops:>9.0f} ops/s  "
+            f"Hs256Codec {codec_ops:>9.0f} ops/s  x{codec_ops / jose_ops:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
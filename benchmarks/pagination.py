@@ -0,0 +1,89 @@
+"""
+Time the first and the 500th page of the quizes and the students, the
+latter reached with an offset and with the cursor of the 499th page.
+
+Fills the configured database like `benchmarks.quiz_filters`, every table
+is truncated first, point it at a scratch database.
+
+    PYTHONPATH=src python -m benchmarks.pagination [--scale 1.0]
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from benchmarks.quiz_filters import QUIZES, SUBMISSIONS, USERS, fill
+from server.db import engine
+from server.routes.quizes import services as quizes_services
+from server.routes.students import services as students_services
+
+PAGE_SIZE = 20
+PAGE = 500
+
+
+async def measure(pages: int) -> dict[str, tuple[float, float, float]]:
+    """Best times in milliseconds of page 1, and page `pages` by offset and cursor"""
+    bench_engine = create_async_engine(engine.url, poolclass=NullPool)
+    results = {}
+    async with async_sessionmaker(bench_engine)() as session:
+        for name, services in (
+            ("list_quizes", quizes_services),
+            ("list_students", students_services),
+        ):
+            list_page = getattr(services, name)
+            offset = (pages - 1) * PAGE_SIZE
+            previous = await list_page(
+                db_session=session, limit=PAGE_SIZE, offset=offset - PAGE_SIZE
+            )
+            after = services.sort_key(previous[-1])
+
+            timings, pages_by_kind = [], {}
+            for kind, kwargs in (
+                ("first", {}),
+                ("offset", {"offset": offset}),
+                ("cursor", {"after": after}),
+            ):
+                runs = []
+                for _ in range(3):
+                    started_at = time.perf_counter()
+                    pages_by_kind[kind] = await list_page(
+                        db_session=session, limit=PAGE_SIZE, **kwargs
+                    )
+                    runs.append((time.perf_counter() - started_at) * 1000)
+                timings.append(min(runs))
+
+            if pages_by_kind["cursor"] != pages_by_kind["offset"]:
+                print(f"{name} by cursor differs from by offset")
+            results[name] = tuple(timings)
+
+    await bench_engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    params = {
+        "users": int(USERS * args.scale),
+        "quizes": max(int(QUIZES * args.scale), 1),
+        "submissions": int(SUBMISSIONS * args.scale),
+    }
+    asyncio.run(fill(params))
+    pages = max(min(PAGE, params["quizes"] // PAGE_SIZE), 2)
+    results = asyncio.run(measure(pages))
+
+    print(
+        f"{'call':<16} {'page 1, ms':>12} {f'page {pages} offset, ms':>20}"
+        f" {f'page {pages} cursor, ms':>20}"
+    )
+    for name, (first, by_offset, by_cursor) in results.items():
+        print(f"{name:<16} {first:>12.1f} {by_offset:>20.1f} {by_cursor:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
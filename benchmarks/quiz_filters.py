@@ -0,0 +1,154 @@
+"""
+Time the quiz detail and the quizes scoped by ids against the same
+aggregates over every quiz.
+
+With the ids filter in every aggregation, the scoped calls only read the
+answers and scores of their quizes, whatever the number of quizes. Scoped
+stats are checked against the listed quizes. Every table is truncated
+first, point it at a scratch database.
+
+    PYTHONPATH=src python -m benchmarks.quiz_filters [--scale 1.0]
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from server.db import engine
+from server.routes.quizes import services as quizes_services
+from server.routes.quizes.schemas import QuizDetailSchema
+
+USERS = 10_000
+QUIZES = 10_000
+SUBMISSIONS = 200_000
+SCOPED_QUIZES = 10
+
+FILL_STATEMENTS = [
+    "TRUNCATE users, quizes, quiz_questions, quiz_question_options,"
+    " quiz_submissions, quiz_submission_answer, challenges,"
+    " challenge_submissions, page_views RESTART IDENTITY CASCADE",
+    "INSERT INTO users (username, name, password, role, created_at)"
+    " SELECT 'user' || i, 'User ' || i, '', 'student', now()"
+    " FROM generate_series(1, :users) i",
+    "INSERT INTO quizes (title, description, created_at)"
+    " SELECT 'Quiz ' || i, '', now() FROM generate_series(1, :quizes) i",
+    "INSERT INTO quiz_questions (quiz_id, title, description, created_at)"
+    " SELECT q.id, 'Question ' || i, '', now()"
+    " FROM quizes q, generate_series(1, 10) i ORDER BY q.id, i",
+    "INSERT INTO quiz_question_options (question_id, text, is_correct)"
+    " SELECT qq.id, 'Option ' || i, i = 1"
+    " FROM quiz_questions qq, generate_series(1, 4) i ORDER BY qq.id, i",
+    "INSERT INTO quiz_submissions (user_id, quiz_id, created_at)"
+    " SELECT 1 + floor(random() * :users)::int, 1 + floor(random() * :quizes)::int,"
+    " now() FROM generate_series(1, :submissions)",
+    # Options were inserted in question order, four per question
+    "INSERT INTO quiz_submission_answer"
+    " (submission_id, question_id, selected_option_id, spent_time_seconds)"
+    " SELECT s.id, qq.id, (qq.id - 1) * 4 + 1 + floor(random() * 4)::int,"
+    " 10 + floor(random() * 290)::int"
+    " FROM quiz_submissions s JOIN quiz_questions qq ON qq.quiz_id = s.quiz_id",
+    "ANALYZE",
+]
+
+
+def get_service_calls(db_session: AsyncSession, quizes: int):
+    """Call name: (scoped call, the same aggregate over every quiz)"""
+    scoped_ids = list(range(1, quizes + 1, max(quizes // SCOPED_QUIZES, 1)))
+    return {
+        "quiz detail": (
+            lambda: quizes_services.list_quizes(
+                db_session=db_session,
+                ids=[quizes // 2 + 1],
+                out_type=QuizDetailSchema,
+            ),
+            lambda: quizes_services.list_quizes(
+                db_session=db_session,
+                limit=quizes,
+                out_type=QuizDetailSchema,
+            ),
+        ),
+        f"list_quizes({SCOPED_QUIZES} ids)": (
+            lambda: quizes_services.list_quizes(
+                db_session=db_session,
+                ids=scoped_ids,
+                limit=SCOPED_QUIZES,
+            ),
+            lambda: quizes_services.list_quizes(
+                db_session=db_session,
+                limit=quizes,
+            ),
+        ),
+        f"get_quiz_stats({SCOPED_QUIZES} ids)": (
+            lambda: quizes_services.get_quiz_stats(
+                db_session=db_session,
+                ids=scoped_ids,
+            ),
+            lambda: quizes_services.get_quiz_stats(db_session=db_session),
+        ),
+    }
+
+
+async def fill(params: dict[str, int]) -> None:
+    bench_engine = create_async_engine(engine.url, poolclass=NullPool)
+    async with bench_engine.begin() as conn:
+        for statement in FILL_STATEMENTS:
+            await conn.execute(text(statement), params)
+    await bench_engine.dispose()
+
+
+async def best_time(call) -> tuple[float, object]:
+    """Best time in milliseconds and the result"""
+    timings = []
+    for _ in range(3):
+        started_at = time.perf_counter()
+        result = await call()
+        timings.append((time.perf_counter() - started_at) * 1000)
+    return min(timings), result
+
+
+async def measure(quizes: int) -> dict[str, tuple[float, float]]:
+    bench_engine = create_async_engine(engine.url, poolclass=NullPool)
+    timings, scoped_results = {}, {}
+    async with async_sessionmaker(bench_engine)() as session:
+        for name, (scoped_call, every_quiz_call) in get_service_calls(
+            session, quizes
+        ).items():
+            scoped, scoped_results[name] = await best_time(scoped_call)
+            every_quiz, _ = await best_time(every_quiz_call)
+            timings[name] = scoped, every_quiz
+    await bench_engine.dispose()
+
+    listed = scoped_results[f"list_quizes({SCOPED_QUIZES} ids)"]
+    stats = scoped_results[f"get_quiz_stats({SCOPED_QUIZES} ids)"]
+    if (stats.quizzes_count, stats.submissions_count) != (
+        len(listed),
+        sum(quiz.total_submissions_count for quiz in listed),
+    ):
+        print("get_quiz_stats(ids) doesn't match the listed quizes")
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    params = {
+        "users": int(USERS * args.scale),
+        "quizes": max(int(QUIZES * args.scale), 1),
+        "submissions": int(SUBMISSIONS * args.scale),
+    }
+    asyncio.run(fill(params))
+    results = asyncio.run(measure(params["quizes"]))
+
+    print(f"{'call':<28} {'scoped, ms':>12} {'every quiz, ms':>16}")
+    for name, (scoped, every_quiz) in results.items():
+        print(f"{name:<28} {scoped:>12.1f} {every_quiz:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Time the scatter-gather aggregates with 1 to N shards of the event tables.
+
+Fills the configured database with users and quizes, then generates the
+same submissions and page views on the primary and, for every shard count,
+spread over that many shards by user id. Results are checked against the
+unsharded run. Every table is truncated first, point it at scratch
+databases.
+
+    PYTHONPATH=src python -m benchmarks.sharding \\
+        --shard localhost:5433 --shard localhost:5434 [--scale 1.0]
+
+Scaling is only visible with shards on separate machines, or at least on
+separate cores.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from server.db import async_session_maker, engine, get_host_url
+from server.db.partitions import add_months, create_partitions, month_start
+from server.db.shards import UNSHARDED, Shard, ShardSet, create_shard_tables
+from server.routes.platform_stats import services as platform_stats_services
+from server.routes.quizes import services as quizes_services
+from server.routes.students import services as students_services
+
+USERS = 20_000
+QUIZES = 100
+SUBMISSIONS = 200_000
+PAGE_VIEWS = 2_000_000
+
+PRIMARY_STATEMENTS = [
+    "TRUNCATE users, quizes, quiz_questions, quiz_question_options,"
+    " quiz_submissions, quiz_submission_answer, challenges,"
+    " challenge_submissions, page_views RESTART IDENTITY CASCADE",
+    "INSERT INTO users (username, name, password, role, created_at)"
+    " SELECT 'user' || i, 'User ' || i, '',"
+    " CASE WHEN i % 10 = 0 THEN 'editor' ELSE 'student' END, now()"
+    " FROM generate_series(1, :users) i",
+    "INSERT INTO quizes (title, description, created_at)"
+    " SELECT 'Quiz ' || i, '', now() FROM generate_series(1, :quizes) i",
+    "INSERT INTO quiz_questions (quiz_id, title, created_at)"
+    " SELECT q.id, 'Question ' || i, now()"
+    " FROM quizes q, generate_series(1, 10) i ORDER BY q.id, i",
+    "INSERT INTO quiz_question_options (question_id, text, is_correct)"
+    " SELECT qq.id, 'Option ' || i, i = 1"
+    " FROM quiz_questions qq, generate_series(1, 4) i ORDER BY qq.id, i",
+]
+
+# Deterministic, so every shard count gets the same events. Only the rows
+# of the users with `user_id % :shards = :index` are inserted.
+EVENT_STATEMENTS = [
+    # The scores and histograms on the primary cascade
+    "TRUNCATE quiz_submissions, quiz_submission_answer, page_views CASCADE",
+    "INSERT INTO quiz_submissions (id, user_id, quiz_id, created_at)"
+    " SELECT * FROM ("
+    " SELECT i, 1 + i * 7919 % :users AS user_id, 1 + i * 104729 % :quizes,"
+    " now() - i % 90 * interval '1 day'"
+    " FROM generate_series(1, :submissions) i"
+    ") s WHERE user_id % :shards = :index",
+    # Options were inserted in question order, four per question
+    "INSERT INTO quiz_submission_answer"
+    " (submission_id, question_id, selected_option_id, spent_time_seconds)"
+    " SELECT s.id, qq.id, (qq.id - 1) * 4 + 1 + (s.id * 31 + qq.id) % 4,"
+    " 10 + (s.id * qq.id) % 290"
+    " FROM quiz_submissions s JOIN quiz_questions qq ON qq.quiz_id = s.quiz_id",
+    "INSERT INTO page_views (user_id, url, duration, created_at)"
+    " SELECT * FROM ("
+    " SELECT 1 + i * 7919 % :users AS user_id, '/quiz/' || i * 31 % 300,"
+    " 10 + i % 290, now() - i % 90 * interval '1 day'"
+    " FROM generate_series(1, :page_views) i"
+    ") p WHERE user_id % :shards = :index",
+    "ANALYZE",
+]
+
+# quiz_questions lives on the primary only, the shards get a copy to
+# generate the answers
+QUESTIONS_COPY_STATEMENTS = [
+    "CREATE TEMPORARY TABLE quiz_questions (id int, quiz_id int)",
+    "INSERT INTO quiz_questions"
+    " SELECT (q - 1) * 10 + i, q"
+    " FROM generate_series(1, :quizes) q, generate_series(1, 10) i",
+]
+
+
+def get_service_calls(db_session: AsyncSession, shards: ShardSet):
+    today = date.today()
+    return {
+        "get_platform_stats": lambda: platform_stats_services.get_platform_stats(
+            db_session=db_session,
+            shards=shards,
+        ),
+        "get_daily_platform_stats": lambda: (
+            platform_stats_services.get_daily_platform_stats_distribution(
+                db_session=db_session,
+                start_date=today - timedelta(days=60),
+                end_date=today,
+                shards=shards,
+            )
+        ),
+        "get_student_stats": lambda: students_services.get_student_stats(
+            db_session=db_session,
+            shards=shards,
+        ),
+        "list_students": lambda: students_services.list_students(
+            db_session=db_session,
+            offset=100,
+            shards=shards,
+        ),
+        "get_quiz_stats": lambda: quizes_services.get_quiz_stats(
+            db_session=db_session,
+            shards=shards,
+        ),
+        "list_quizes": lambda: quizes_services.list_quizes(
+            db_session=db_session,
+            shards=shards,
+        ),
+        "get_score_distribution": lambda: quizes_services.get_score_distribution(
+            db_session=db_session,
+            quiz_id=1,
+            shards=shards,
+        ),
+    }
+
+
+async def fill_events(url: str, params: dict[str, int], shard: bool) -> None:
+    bench_engine = create_async_engine(url, poolclass=NullPool)
+    async with bench_engine.begin() as conn:
+        if shard:
+            await conn.run_sync(create_shard_tables)
+            for statement in QUESTIONS_COPY_STATEMENTS:
+                await conn.execute(text(statement), params)
+        for statement in EVENT_STATEMENTS:
+            await conn.execute(text(statement), params)
+    await bench_engine.dispose()
+
+
+async def fill_primary(params: dict[str, int]) -> None:
+    bench_engine = create_async_engine(engine.url, poolclass=NullPool)
+    async with bench_engine.begin() as conn:
+        for statement in PRIMARY_STATEMENTS:
+            await conn.execute(text(statement), params)
+        current_month = month_start(date.today())
+        await conn.run_sync(
+            create_partitions,
+            add_months(current_month, -4),
+            add_months(current_month, 1),
+        )
+    await bench_engine.dispose()
+    await fill_events(engine.url, params | {"shards": 1, "index": 0}, shard=False)
+
+
+async def measure(shards: ShardSet) -> tuple[dict[str, float], dict[str, object]]:
+    """Best time in milliseconds and result of every call"""
+    timings, results = {}, {}
+    async with async_session_maker() as session:
+        for name, call in get_service_calls(session, shards).items():
+            runs = []
+            for _ in range(3):
+                started_at = time.perf_counter()
+                results[name] = await call()
+                runs.append((time.perf_counter() - started_at) * 1000)
+            timings[name] = min(runs)
+    return timings, results
+
+
+async def run(addresses: list[str], scale: float) -> None:
+    params = {
+        "users": int(USERS * scale),
+        "quizes": max(int(QUIZES * scale), 1),
+        "submissions": int(SUBMISSIONS * scale),
+        "page_views": int(PAGE_VIEWS * scale),
+    }
+    await fill_primary(params)
+    columns = {"unsharded": await measure(UNSHARDED)}
+    expected = columns["unsharded"][1]
+
+    for count in range(1, len(addresses) + 1):
+        urls = [get_host_url(address) for address in addresses[:count]]
+        for index, url in enumerate(urls):
+            shard_params = params | {"shards": count, "index": index}
+            await fill_events(url, shard_params, shard=True)
+
+        shards = ShardSet(
+            [
+                Shard(name=address, engine=create_async_engine(url))
+                for address, url in zip(addresses, urls)
+            ]
+        )
+        columns[f"{count} shards"] = await measure(shards)
+        for shard in shards.shards:
+            await shard.engine.dispose()
+
+        for name, result in columns[f"{count} shards"][1].items():
+            if result != expected[name]:
+                print(f"{name} with {count} shards differs from the unsharded run")
+
+    print(f"{'call':<28}" + "".join(f"{column:>14}" for column in columns))
+    for name in expected:
+        print(
+            f"{name:<28}"
+            + "".join(f"{timings[name]:>14.1f}" for timings, _ in columns.values())
+        )
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--shard",
+        action="append",
+        required=True,
+        help="Shard address as host or host:port, repeat for every shard",
+    )
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.shard, args.scale))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Cold start cost of a worker: importing `server.main` in a fresh interpreter,
+then building another application with `create_app`. The slowest modules
+by their own import time are listed, to see what's worth deferring.
+
+    ENV=testing PYTHONPATH=src python -m benchmarks.startup
+"""
+
+import os
+import subprocess
+import sys
+
+RUNS = 5
+TOP = 15
+
+MEASURE = """
+import time
+started_at = time.perf_counter()
+import server.main
+imported_at = time.perf_counter()
+server.main.create_app()
+print(imported_at - started_at, time.perf_counter() - imported_at)
+"""
+
+
+def run(*args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ,
+    )
+
+
+def main() -> None:
+    timings = [
+        tuple(map(float, run("-c", MEASURE).stdout.split())) for _ in range(RUNS)
+    ]
+    import_time = min(timing[0] for timing in timings)
+    create_time = min(timing[1] for timing in timings)
+    print(f"import server.main: {import_time * 1000:.0f} ms (best of {RUNS})")
+    print(f"create_app():      {create_time * 1000:.1f} ms")
+
+    # Lines look like "import time:  self | cumulative | name"
+    modules = []
+    report = run("-X", "importtime", "-c", "import server.main").stderr
+    for line in report.splitlines():
+        self_time, _, name = line.removeprefix("import time:").split("|")
+        if self_time.strip().isdigit():
+            modules.append((int(self_time), name.strip()))
+
+    print("\nslowest modules, own import time:")
+    for self_time, name in sorted(modules, reverse=True)[:TOP]:
+        print(f"  {self_time / 1000:7.1f} ms  {name}")
+
+    own = sum(t for t, name in modules if name.split(".")[0] == "server")
+    print(f"\nserver.* modules: {own / 1000:.0f} ms in total")
+
+
+if __name__ == "__main__":
+    main()
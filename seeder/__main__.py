@@ -1,13 +1,15 @@
 import asyncio
-import hashlib
 import logging
 import random
 from datetime import datetime, timedelta
 from typing import List, Tuple
 
+from alembic import command
+from alembic.config import Config
 from faker import Faker
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from server.config import settings
 from server.db import async_session_maker, engine
 from server.db.models import (
     Base,
@@ -19,7 +21,10 @@ from server.db.models import (
     QuizSubmissionAnswer,
     User,
 )
+from server.db.partitions import add_months, create_partitions, month_start
+from server.db.scores import create_score_triggers
 from server.schemas import UserRole
+from server.state import password_hashing
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -28,11 +33,27 @@ QUESTIONS_PER_QUIZ = 10
 OPTIONS_PER_QUESTION = 4
 
 
+def stamp_head(connection) -> None:
+    """Mark the freshly created schema as up to date with the migrations"""
+    config = Config("alembic.ini")
+    config.attributes["connection"] = connection
+    command.stamp(config, "head", purge=True)
+
+
 async def create_tables():
     """Create all tables in the database"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_score_triggers)
+        # Seeded page views go back a year, to a few weeks from now
+        today = datetime.utcnow().date()
+        await conn.run_sync(
+            create_partitions,
+            today - timedelta(days=366),
+            add_months(month_start(today), settings.PAGE_VIEWS_PARTITIONS_AHEAD + 1),
+        )
+        await conn.run_sync(stamp_head)
     logger.info("Database tables created successfully")
 
 
@@ -72,7 +93,7 @@ class AsyncDatabaseSeeder:
     def generate_password() -> str:
         """Generate a hashed password."""
         password = fake.password()
-        return hashlib.sha256(password.encode()).hexdigest()
+        return password_hashing.hasher.hash(password)
 
     async def seed_users(self, num_users: int, role: UserRole) -> List[User]:
         """Seed users table"""
@@ -0,0 +1,153 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Protocol
+
+
+class PasswordHasher(Protocol):
+    def hash(self, password: str) -> str: ...
+
+    def verify(self, password: str, hashed: str) -> bool: ...
+
+    def identifies(self, hashed: str) -> bool:
+        """Whether the stored hash was produced by this hasher"""
+        ...
+
+    def needs_rehash(self, hashed: str) -> bool: ...
+
+
+class Sha256Hasher:
+    """Legacy unsalted sha256 hex digests"""
+
+    def hash(self, password: str) -> str:
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return hmac.compare_digest(self.hash(password), hashed)
+
+    def identifies(self, hashed: str) -> bool:
+        return len(hashed) == 64 and all(c in "0123456789abcdef" for c in hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return True
+
+
+class Pbkdf2Hasher:
+    """Salted PBKDF2-HMAC-SHA256 stored as `pbkdf2_sha256$<iterations>$<salt>$<hash>`"""
+
+    algorithm = "pbkdf2_sha256"
+
+    def __init__(self, iterations: int) -> None:
+        self.iterations = iterations
+
+    def _derive(self, password: str, salt: str, iterations: int) -> str:
+        digest = hashlib.pbkdf2_hmac(
+            "sha256",
+            password.encode(),
+            salt.encode(),
+            iterations,
+        )
+        return base64.b64encode(digest).decode()
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_urlsafe(16)
+        digest = self._derive(password, salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${salt}${digest}"
+
+    def verify(self, password: str, hashed: str) -> bool:
+        try:
+            _, iterations, salt, digest = hashed.split("$")
+            rounds = int(iterations)
+        except ValueError:
+            return False
+
+        return hmac.compare_digest(self._derive(password, salt, rounds), digest)
+
+    def identifies(self, hashed: str) -> bool:
+        return hashed.startswith(f"{self.algorithm}$")
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return int(hashed.split("$")[1]) < self.iterations
+
+
+class PasswordHashing:
+    """
+    Runs password hashers in a bounded thread pool, away from the event loop.
+
+    New hashes are produced by `hasher`. Hashes produced by any of the
+    `legacy_hashers` are still verified, and reported as needing a rehash.
+    At most `max_workers` hashes are computed at once; the time requests
+    spend waiting for a free worker is recorded.
+    """
+
+    def __init__(
+        self,
+        hasher: PasswordHasher,
+        legacy_hashers: Sequence[PasswordHasher] = (),
+        max_workers: int = 4,
+    ) -> None:
+        self.hasher = hasher
+        self.max_workers = max_workers
+        self._hashers = (hasher, *legacy_hashers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="password-hashing",
+        )
+        self._semaphore = asyncio.Semaphore(max_workers)
+
+        self.waiting = 0
+        self.in_progress = 0
+        self.completed = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+
+    def _get_hasher(self, hashed: str) -> PasswordHasher | None:
+        for hasher in self._hashers:
+            if hasher.identifies(hashed):
+                return hasher
+        return None
+
+    async def _run[T](self, func: Callable[..., T], *args) -> T:
+        started_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        queue_time = time.perf_counter() - started_at
+        self.queue_time_total += queue_time
+        self.queue_time_max = max(self.queue_time_max, queue_time)
+
+        self.in_progress += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_progress -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.hasher.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, bool]:
+        """
+        Check the password against the stored hash, returning whether it
+        matches and whether the hash should be replaced.
+        """
+
+        hasher = self._get_hasher(hashed)
+        if hasher is None:
+            return False, False
+
+        is_valid = await self._run(hasher.verify, password, hashed)
+        return is_valid, is_valid and hasher.needs_rehash(hashed)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
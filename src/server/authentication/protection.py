@@ -0,0 +1,111 @@
+import re
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from types import FunctionType
+
+from starlette._utils import get_route_path
+from starlette.routing import BaseRoute, Mount, Route, compile_path
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from .utils import is_route_protected
+
+ANY_METHOD = "*"
+
+type _DynamicEntry = tuple[int, re.Pattern[str], bool]
+
+
+def _first_segment(path: str) -> str:
+    return path.split("/", 2)[1] if path.count("/") else path
+
+
+def _iter_routes(
+    routes: Sequence[BaseRoute],
+    prefix: str = "",
+) -> Iterator[tuple[str, set[str] | None, bool]]:
+    """Flatten routes (including mounted apps) into (path, methods, protected)"""
+
+    for route in routes:
+        if isinstance(route, Route):
+            endpoint = route.endpoint
+            protected = isinstance(endpoint, FunctionType) and is_route_protected(
+                endpoint
+            )
+            yield prefix + route.path, route.methods, protected
+        elif isinstance(route, Mount) and not isinstance(route.app, StaticFiles):
+            yield from _iter_routes(route.routes, prefix + route.path)
+
+
+class RouteProtectionIndex:
+    """
+    Lookup table answering "is this request routed to a protected endpoint?".
+
+    It's compiled once from the application routes: paths without parameters
+    go into a dict keyed by (method, path), templated paths are bucketed by
+    (method, first literal segment) so a lookup only runs the handful of
+    regexes that share the prefix. Each entry remembers the registration
+    order, so the answer is the same as the first match of the router.
+
+    The index is rebuilt when `invalidate` is called or when the number of
+    application routes changes.
+    """
+
+    def __init__(self) -> None:
+        self._routes: Sequence[BaseRoute] | None = None
+        self._routes_count = 0
+        self._static: dict[tuple[str, str], tuple[int, bool]] = {}
+        self._dynamic: dict[tuple[str, str], list[_DynamicEntry]] = {}
+
+    def build(self, routes: Sequence[BaseRoute]) -> None:
+        static: dict[tuple[str, str], tuple[int, bool]] = {}
+        dynamic: defaultdict[tuple[str, str], list[_DynamicEntry]] = defaultdict(list)
+
+        for order, (path, methods, protected) in enumerate(_iter_routes(routes)):
+            path_regex, _, convertors = compile_path(path)
+            for method in methods or (ANY_METHOD,):
+                if not convertors:
+                    static.setdefault((method, path), (order, protected))
+                    continue
+
+                segment = _first_segment(path)
+                if "{" in segment:
+                    segment = ""
+                dynamic[(method, segment)].append((order, path_regex, protected))
+
+        self._static = static
+        self._dynamic = dict(dynamic)
+        self._routes = routes
+        self._routes_count = len(routes)
+
+    def invalidate(self) -> None:
+        """Drop the compiled index, it's rebuilt on the next lookup"""
+
+        self._routes = None
+
+    def is_stale(self, routes: Sequence[BaseRoute]) -> bool:
+        return routes is not self._routes or len(routes) != self._routes_count
+
+    def is_protected(self, routes: Sequence[BaseRoute], scope: Scope) -> bool:
+        if self.is_stale(routes):
+            self.build(routes)
+
+        path = get_route_path(scope)
+        segment = _first_segment(path)
+        best: tuple[int, bool] | None = None
+
+        for method in (scope["method"], ANY_METHOD):
+            entry = self._static.get((method, path))
+            if entry is not None and (best is None or entry[0] < best[0]):
+                best = entry
+
+            for bucket in (segment, ""):
+                for order, path_regex, protected in self._dynamic.get(
+                    (method, bucket), ()
+                ):
+                    if best is not None and order >= best[0]:
+                        break
+                    if path_regex.match(path):
+                        best = (order, protected)
+                        break
+
+        return best is not None and best[1]
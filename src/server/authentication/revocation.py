@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import time
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from ..redis_sharding import RedisClient, get_nodes, is_node_healthy, open_pubsub
+
+logger = logging.getLogger(__name__)
+
+REVOKED_KEY_PREFIX = "revoked:"
+TOKEN_GENERATION_KEY_PREFIX = "token_generation:"
+REVOCATIONS_CHANNEL = "revocations"
+PRUNE_INTERVAL_SECONDS = 60
+MAX_RECONNECT_DELAY_SECONDS = 30
+# How long the mirror waits for a message before checking its node is
+# still up
+LISTEN_TIMEOUT_SECONDS = 1
+
+
+async def revoke_token(redis: RedisClient, token_id: str, expires_at: int) -> None:
+    """
+    Store the revocation in Redis until the token expires and notify every
+    worker's mirror.
+    """
+
+    ttl = max(expires_at - int(time.time()), 1)
+    await redis.set(name=f"{REVOKED_KEY_PREFIX}{token_id}", value="1", ex=ttl)
+    await redis.publish(
+        REVOCATIONS_CHANNEL,
+        json.dumps({"token_id": token_id, "expires_at": expires_at}),
+    )
+
+
+async def revoke_user_tokens(redis: RedisClient, username: str) -> int:
+    """
+    Invalidate every token issued to the user so far by bumping the user's
+    token generation. The key has no TTL, the counter has to stay above the
+    generation of any token that may still be alive.
+    """
+
+    generation = await redis.incr(f"{TOKEN_GENERATION_KEY_PREFIX}{username}")
+    await redis.publish(
+        REVOCATIONS_CHANNEL,
+        json.dumps({"username": username, "generation": generation}),
+    )
+    return generation
+
+
+async def is_token_revoked(
+    redis: RedisClient,
+    token_id: str,
+    mirror: "RevocationMirror | None" = None,
+) -> bool:
+    if mirror is not None:
+        revoked = mirror.is_revoked(token_id)
+        if revoked is not None:
+            return revoked
+
+    return await redis.get(f"{REVOKED_KEY_PREFIX}{token_id}") is not None
+
+
+async def get_token_generation(
+    redis: RedisClient,
+    username: str,
+    mirror: "RevocationMirror | None" = None,
+) -> int:
+    if mirror is not None:
+        generation = mirror.get_generation(username)
+        if generation is not None:
+            return generation
+
+    value = await redis.get(f"{TOKEN_GENERATION_KEY_PREFIX}{username}")
+    return int(value) if value is not None else 0
+
+
+class RevocationMirror:
+    """
+    In-process copy of the revoked token ids and the per-user token
+    generations stored in Redis.
+
+    On start it subscribes to the revocations channel, loads the existing
+    `revoked:*` and `token_generation:*` keys and from then on applies the
+    notifications published by `revoke_token` and `revoke_user_tokens`.
+    While the mirror isn't in sync (before the initial load or after losing
+    the Redis connection) lookups return None and callers should ask Redis
+    directly. Idling without notifications doesn't count as losing it, the
+    mirror only reloads after a disconnection or when its node is down.
+    """
+
+    def __init__(self, redis: RedisClient, channel: str = REVOCATIONS_CHANNEL) -> None:
+        self._redis = redis
+        self._channel = channel
+        self._revoked: dict[str, float] = {}
+        self._generations: dict[str, int] = {}
+        self._next_prune_at = 0.0
+        self._task: asyncio.Task[None] | None = None
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, token_id: str) -> bool | None:
+        if not self.ready:
+            return None
+
+        expires_at = self._revoked.get(token_id)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self._revoked[token_id]
+            return False
+        return True
+
+    def get_generation(self, username: str) -> int | None:
+        if not self.ready:
+            return None
+
+        return self._generations.get(username, 0)
+
+    def set_generation(self, username: str, generation: int) -> None:
+        # Notifications may arrive after the initial load already saw a newer value
+        self._generations[username] = max(
+            generation,
+            self._generations.get(username, 0),
+        )
+
+    def add(self, token_id: str, expires_at: float) -> None:
+        self._revoked[token_id] = expires_at
+
+        now = time.time()
+        if now >= self._next_prune_at:
+            self._next_prune_at = now + PRUNE_INTERVAL_SECONDS
+            self._revoked = {
+                revoked_id: revoked_until
+                for revoked_id, revoked_until in self._revoked.items()
+                if revoked_until > now
+            }
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.ready = False
+
+    async def _load(self) -> None:
+        for node in get_nodes(self._redis):
+            await self._load_node(node)
+
+    async def _load_node(self, node: Redis) -> None:
+        keys = [key async for key in node.scan_iter(f"{REVOKED_KEY_PREFIX}*")]
+
+        async with node.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.pttl(key)
+            ttls = await pipe.execute()
+
+        now = time.time()
+        for key, ttl in zip(keys, ttls):
+            if ttl == -2:  # expired while loading
+                continue
+            token_id = key.decode()[len(REVOKED_KEY_PREFIX) :]
+            self.add(token_id, now + ttl / 1000 if ttl >= 0 else float("inf"))
+
+        keys = [key async for key in node.scan_iter(f"{TOKEN_GENERATION_KEY_PREFIX}*")]
+        generations = await node.mget(keys) if keys else []
+        for key, generation in zip(keys, generations):
+            if generation is None:
+                continue
+            username = key.decode()[len(TOKEN_GENERATION_KEY_PREFIX) :]
+            self.set_generation(username, int(generation))
+
+    def _handle(self, message: dict) -> None:
+        if message["type"] != "message":
+            return
+
+        data = json.loads(message["data"])
+        if "token_id" in data:
+            self.add(data["token_id"], data["expires_at"])
+        else:
+            self.set_generation(data["username"], data["generation"])
+
+    async def _run(self) -> None:
+        delay = 1
+        while True:
+            try:
+                pubsub, node_name = open_pubsub(self._redis)
+                async with pubsub:
+                    await pubsub.subscribe(self._channel)
+                    await self._load()
+                    self.ready = True
+                    delay = 1
+                    logger.info("Revocation mirror loaded %d tokens", len(self))
+
+                    while is_node_healthy(self._redis, node_name):
+                        message = await pubsub.get_message(
+                            timeout=LISTEN_TIMEOUT_SECONDS
+                        )
+                        if message is not None:
+                            self._handle(message)
+                    logger.warning("Revocation mirror node %s is down", node_name)
+            except (RedisError, OSError) as e:
+                logger.warning("Revocation mirror lost Redis connection: %r", e)
+
+            self.ready = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
@@ -4,3 +4,5 @@ from pydantic import BaseModel
 class AutheticatedUser(BaseModel):
     username: str
     token: str
+    token_id: str
+    expires_at: int
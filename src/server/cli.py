@@ -0,0 +1,160 @@
+"""
+Operational commands, run as `python -m server.cli <command>`.
+"""
+
+import argparse
+import asyncio
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from .authentication.passwords import PasswordHashing
+from .config import settings
+from .db import async_session_maker, engine, page_views_partitions, shards
+from .db.scores import rebuild_score_histograms, refresh_scores_batch
+from .db.shards import create_shard_tables
+from .routes.users import services as users_services
+from .routes.users.importing import ImportFormat, parse_rows
+from .state import password_hashing
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def read_chunks(path: Path) -> AsyncIterator[bytes]:
+    with path.open("rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            yield chunk
+
+
+async def import_users(path: Path, import_format: ImportFormat, workers: int) -> None:
+    hashing = PasswordHashing(hasher=password_hashing.hasher, max_workers=workers)
+    try:
+        async with async_session_maker() as session:
+            result = await users_services.import_users(
+                db_session=session,
+                password_hashing=hashing,
+                rows=parse_rows(read_chunks(path), import_format),
+            )
+    finally:
+        hashing.shutdown()
+
+    for error in result.errors:
+        print(f"row {error.row} ({error.username or '-'}): {error.detail}")
+    print(f"Imported {result.imported} users, {len(result.errors)} rows failed")
+
+
+async def maintain_partitions(retention_months: int | None) -> None:
+    if retention_months is not None:
+        page_views_partitions.retention_months = retention_months
+    try:
+        created, removed = await page_views_partitions.run()
+    finally:
+        await engine.dispose()
+
+    action = page_views_partitions.retention_action
+    print(f"Created partitions: {', '.join(created) or '-'}")
+    print(f"Removed partitions ({action}): {', '.join(removed) or '-'}")
+
+
+async def backfill_scores(batch_size: int) -> None:
+    refreshed = 0
+    last_id = 0
+    try:
+        while True:
+            # A transaction per batch, the triggers keep up meanwhile
+            async with engine.begin() as conn:
+                submission_ids = await conn.run_sync(
+                    refresh_scores_batch, last_id, batch_size
+                )
+            if not submission_ids:
+                break
+
+            refreshed += len(submission_ids)
+            last_id = submission_ids[-1]
+            print(f"Scored {refreshed} submissions, up to #{last_id}")
+
+        async with engine.begin() as conn:
+            await conn.run_sync(rebuild_score_histograms)
+    finally:
+        await engine.dispose()
+    print(f"Backfilled the scores of {refreshed} submissions and their histograms")
+
+
+async def init_shards() -> None:
+    if not shards.enabled:
+        print("No shards configured, set DB_SHARD_HOSTS")
+        return
+
+    for shard in shards.shards:
+        try:
+            async with shard.engine.begin() as conn:
+                await conn.run_sync(create_shard_tables)
+        finally:
+            await shard.engine.dispose()
+        print(f"Created the event tables on {shard.name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m server.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_users_parser = commands.add_parser(
+        "import-users",
+        help="Bulk create users from a CSV or NDJSON file",
+    )
+    import_users_parser.add_argument("path", type=Path)
+    import_users_parser.add_argument(
+        "--format",
+        choices=[import_format.value for import_format in ImportFormat],
+        help="File format, guessed from the extension by default",
+    )
+    import_users_parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.CLI_IMPORT_HASHING_CONCURRENCY,
+        help="Number of passwords hashed in parallel",
+    )
+
+    maintain_partitions_parser = commands.add_parser(
+        "maintain-partitions",
+        help="Create the next page_views partitions and apply the retention policy",
+    )
+    maintain_partitions_parser.add_argument(
+        "--retention-months",
+        type=int,
+        help="Full months of page views to keep, overrides the settings",
+    )
+
+    backfill_scores_parser = commands.add_parser(
+        "backfill-scores",
+        help="Recompute the submission scores and their histograms",
+    )
+    backfill_scores_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10_000,
+        help="Submissions scored per transaction",
+    )
+
+    commands.add_parser(
+        "init-shards",
+        help="Create the event tables on the configured shards",
+    )
+
+    args = parser.parse_args()
+    if args.command == "import-users":
+        suffix = args.path.suffix.lstrip(".").replace("jsonl", "ndjson")
+        try:
+            import_format = ImportFormat(args.format or suffix)
+        except ValueError:
+            parser.error("Can't guess the file format, pass --format")
+        asyncio.run(import_users(args.path, import_format, args.workers))
+    elif args.command == "maintain-partitions":
+        asyncio.run(maintain_partitions(args.retention_months))
+    elif args.command == "backfill-scores":
+        asyncio.run(backfill_scores(args.batch_size))
+    elif args.command == "init-shards":
+        asyncio.run(init_shards())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 from typing import Literal
 
 from pydantic_settings import BaseSettings
@@ -10,5 +11,40 @@ class TestSettings(BaseSettings):
     DB_HOST: str = "localhost"
     DB_PORT: str = "5477"
     DB_NAME: str = "politeh"
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+    DB_WARMUP_CONNECTIONS: int = 0
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_STATEMENT_TIMEOUT: float = 0
+    DB_STATEMENT_TIMEOUTS: dict[str, float] = {
+        "/quizes": 10,
+        "/students": 10,
+        "/platform_stats": 10,
+    }
+    DB_REPLICA_HOSTS: list[str] = []
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5
+    DB_REPLICA_CHECK_INTERVAL: float = 1
+    DB_SHARD_HOSTS: list[str] = []
+    PAGE_VIEWS_PARTITIONS_AHEAD: int = 3
+    PAGE_VIEWS_RETENTION_MONTHS: int = 0
+    PAGE_VIEWS_RETENTION_ACTION: Literal["detach", "drop"] = "detach"
+    PAGE_VIEWS_MAINTENANCE_INTERVAL: float = 3600
     JWT_SECRET: str = "12345678"
     REDIS_URL: str = "redis://localhost:6379"
+    JWT_CACHE_SIZE: int = 10_000
+    PASSWORD_HASH_ITERATIONS: int = 1_000
+    PASSWORD_HASHING_CONCURRENCY: int = 4
+    # Half the cores for imports served by the API, leaving the rest to
+    # logins and requests. The CLI has the machine to itself.
+    IMPORT_HASHING_CONCURRENCY: int = max(1, (os.cpu_count() or 2) // 2)
+    CLI_IMPORT_HASHING_CONCURRENCY: int = os.cpu_count() or 1
+    ITEM_ANALYSIS_CONCURRENCY: int = 2
+    REDIS_URLS: list[str] = []
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_HEALTH_CHECK_INTERVAL: float = 5
+    REDIS_FAILURE_POLICY: Literal["open", "closed"] = "closed"
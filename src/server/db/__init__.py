@@ -1,32 +1,158 @@
+from functools import lru_cache
 from typing import Annotated, AsyncGenerator
 
-from fastapi import Depends
-from sqlalchemy.ext.asyncio import (
-    AsyncSession,
-    async_sessionmaker,
-    create_async_engine,
-)
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 
 from ..config import settings
+from .partitions import PartitionMaintenance
+from .pool import InstrumentedPool
+from .replicas import READ_YOUR_WRITES_HEADER, Replica, ReplicaSet
+from .sessions import ROUTE_KEY, STATEMENT_TIMEOUT_KEY, create_session_maker
+from .shards import Shard, ShardSet
+
+
+def get_database_url(host: str, port: str) -> str:
+    return (
+        f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}"
+        f"@{host}:{port}/{settings.DB_NAME}"
+    )
+
+
+def get_host_url(address: str) -> str:
+    """
+    Replicas and shards are given as "host" or "host:port", with the
+    primary's credentials.
+    """
+    host, _, port = address.partition(":")
+    return get_database_url(host, port or settings.DB_PORT)
+
+
+def create_engine(url: str, **kwargs) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            # SQLAlchemy's cache of prepared statements, per connection
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+            # asyncpg's own cache, used by raw driver calls (e.g. COPY)
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+        **kwargs,
+    )
+
 
 # Create async engine
-engine = create_async_engine(
-    f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}"
-    f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}",
-)
+engine = create_engine(get_database_url(settings.DB_HOST, settings.DB_PORT))
 
 # Create async session factory
-async_session_maker = async_sessionmaker(
+async_session_maker = create_session_maker(engine)
+
+replicas = ReplicaSet(
+    primary=async_session_maker,
+    primary_engine=engine,
+    replicas=[
+        Replica(
+            name=address,
+            engine=create_engine(
+                get_host_url(address),
+                execution_options={"postgresql_readonly": True},
+            ),
+        )
+        for address in settings.DB_REPLICA_HOSTS
+    ],
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+)
+
+shards = ShardSet(
+    [
+        Shard(name=address, engine=create_engine(get_host_url(address)))
+        for address in settings.DB_SHARD_HOSTS
+    ]
+)
+
+page_views_partitions = PartitionMaintenance(
     engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
+    months_ahead=settings.PAGE_VIEWS_PARTITIONS_AHEAD,
+    retention_months=settings.PAGE_VIEWS_RETENTION_MONTHS,
+    retention_action=settings.PAGE_VIEWS_RETENTION_ACTION,
+    interval=settings.PAGE_VIEWS_MAINTENANCE_INTERVAL,
 )
 
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency for getting async session"""
+def get_engines() -> dict[str, AsyncEngine]:
+    return {
+        "primary": engine,
+        **{replica.name: replica.engine for replica in replicas.replicas},
+        **{shard.name: shard.engine for shard in shards.shards},
+    }
+
+
+def get_route_name(request: Request) -> str:
+    route = request.scope.get("route")
+    return f"{request.method} {getattr(route, 'path', request.url.path)}"
+
+
+@lru_cache(maxsize=1024)
+def get_statement_timeout(route_name: str) -> float:
+    """
+    `DB_STATEMENT_TIMEOUTS` keys are either route names ("GET /students")
+    or path prefixes used as a router's default ("/students"). The longest
+    matching prefix wins, `DB_STATEMENT_TIMEOUT` applies otherwise.
+    """
+    timeouts = settings.DB_STATEMENT_TIMEOUTS
+    if route_name in timeouts:
+        return timeouts[route_name]
+
+    _, _, path = route_name.partition(" ")
+    prefixes = [
+        prefix
+        for prefix in timeouts
+        if prefix.startswith("/")
+        and (path == prefix or path.startswith(prefix.rstrip("/") + "/"))
+    ]
+    if prefixes:
+        return timeouts[max(prefixes, key=len)]
+    return settings.DB_STATEMENT_TIMEOUT
+
+
+def init_session(session: AsyncSession, request: Request) -> None:
+    route_name = get_route_name(request)
+    session.info[ROUTE_KEY] = route_name
+    session.info[STATEMENT_TIMEOUT_KEY] = get_statement_timeout(route_name)
+
+
+async def get_async_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for getting async session. The connection is checked out on
+    the first query and given back when the request is done with it.
+    """
     async with async_session_maker() as session:
+        init_session(session, request)
+        yield session
+
+
+async def get_read_only_session(
+    request: Request,
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for getting a session on an up to date replica, falls back
+    to the primary. Clients that need to see their own writes send the
+    `X-Read-Your-Writes` header.
+    """
+    session_maker = replicas.get_session_maker(
+        read_your_writes=READ_YOUR_WRITES_HEADER in request.headers,
+    )
+    async with session_maker() as session:
+        init_session(session, request)
         yield session
 
 
 DbSession = Annotated[AsyncSession, Depends(get_async_session)]
+ReadOnlyDbSession = Annotated[AsyncSession, Depends(get_read_only_session)]
@@ -0,0 +1,27 @@
+"""Shared by the migrations of `versions`, run within a migration only"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+
+def is_invalid_index(name: str) -> bool:
+    return bool(
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT 1 FROM pg_index"
+                " WHERE indexrelid = to_regclass(:name) AND NOT indisvalid"
+            ),
+            {"name": name},
+        )
+        .scalar()
+    )
+
+
+def drop_invalid_index(name: str, table: str) -> None:
+    """
+    Drop the index left invalid by a failed CREATE INDEX CONCURRENTLY, so
+    that it's built again. Needs the database, does nothing offline.
+    """
+    if not context.is_offline_mode() and is_invalid_index(name):
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
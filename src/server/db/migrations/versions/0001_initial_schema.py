@@ -0,0 +1,129 @@
+"""initial schema
+
+Databases created before migrations existed (by the seeder's `create_all`)
+already match this revision, mark them with `alembic stamp 0001`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-11-20 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(length=256), nullable=False),
+        sa.Column("name", sa.String(length=256), nullable=False),
+        sa.Column("password", sa.String(length=256), nullable=False),
+        sa.Column("role", sa.String(length=50), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("username"),
+    )
+    op.create_table(
+        "quizes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=256), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("image", sa.String(length=256), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "challenges",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=256), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("image", sa.String(length=256), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "quiz_questions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("quiz_id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=256), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("image", sa.String(length=256), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["quiz_id"], ["quizes.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "quiz_question_options",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("question_id", sa.Integer(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=True),
+        sa.Column("image", sa.String(length=256), nullable=True),
+        sa.Column("is_correct", sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(["question_id"], ["quiz_questions.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "quiz_submissions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("quiz_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["quiz_id"], ["quizes.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "quiz_submission_answer",
+        sa.Column("submission_id", sa.Integer(), nullable=False),
+        sa.Column("question_id", sa.Integer(), nullable=False),
+        sa.Column("selected_option_id", sa.Integer(), nullable=False),
+        sa.Column("spent_time_seconds", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["question_id"], ["quiz_questions.id"]),
+        sa.ForeignKeyConstraint(["selected_option_id"], ["quiz_question_options.id"]),
+        sa.ForeignKeyConstraint(["submission_id"], ["quiz_submissions.id"]),
+        sa.PrimaryKeyConstraint("submission_id", "question_id", "selected_option_id"),
+    )
+    op.create_table(
+        "challenge_submissions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("challenge_id", sa.Integer(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("execution_time_ms", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["challenge_id"], ["challenges.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "page_views",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("url", sa.String(length=256), nullable=False),
+        sa.Column("duration", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("page_views")
+    op.drop_table("challenge_submissions")
+    op.drop_table("quiz_submission_answer")
+    op.drop_table("quiz_submissions")
+    op.drop_table("quiz_question_options")
+    op.drop_table("quiz_questions")
+    op.drop_table("challenges")
+    op.drop_table("quizes")
+    op.drop_table("users")
@@ -0,0 +1,86 @@
+"""analytics indexes
+
+Indexes for the foreign keys and timestamps used by the quiz, student and
+platform stats aggregates. They are built with CREATE INDEX CONCURRENTLY,
+outside of the migration transaction, so writes aren't blocked while they
+build. A failed concurrent build leaves an invalid index behind, it is
+dropped and rebuilt on the next run.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-11-20 12:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from server.db.migrations.helpers import drop_invalid_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_users_student_id", "users", ["id"], "role = 'student'"),
+    ("ix_quiz_questions_quiz_id", "quiz_questions", ["quiz_id"], None),
+    (
+        "ix_quiz_question_options_question_id",
+        "quiz_question_options",
+        ["question_id"],
+        None,
+    ),
+    ("ix_quiz_submissions_quiz_id", "quiz_submissions", ["quiz_id"], None),
+    ("ix_quiz_submissions_user_id", "quiz_submissions", ["user_id"], None),
+    (
+        "ix_quiz_submission_answer_question_id",
+        "quiz_submission_answer",
+        ["question_id"],
+        None,
+    ),
+    (
+        "ix_quiz_submission_answer_selected_option_id",
+        "quiz_submission_answer",
+        ["selected_option_id"],
+        None,
+    ),
+    ("ix_challenge_submissions_user_id", "challenge_submissions", ["user_id"], None),
+    (
+        "ix_challenge_submissions_challenge_id",
+        "challenge_submissions",
+        ["challenge_id"],
+        None,
+    ),
+    ("ix_page_views_created_at", "page_views", ["created_at"], None),
+    ("ix_page_views_user_id_created_at", "page_views", ["user_id", "created_at"], None),
+    ("ix_page_views_url", "page_views", ["url"], None),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            drop_invalid_index(name, table)
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
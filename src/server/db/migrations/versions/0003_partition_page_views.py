@@ -0,0 +1,151 @@
+"""partition page_views by month
+
+`page_views` becomes a table partitioned by range of `created_at`, one
+partition per month (see `server.db.partitions`). The existing rows are
+copied into partitions covering their months, up to the configured number
+of months ahead; the application creates the following ones.
+
+The btree index on `created_at` is replaced with a BRIN index: rows are
+appended in time order, so block ranges summarize them well at a fraction
+of the size. The primary key becomes (id, created_at), a partitioned table
+can't have a unique constraint without the partition key. Ids keep coming
+from the same sequence.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-11-27 12:00:00.000000
+
+"""
+
+from datetime import date, datetime
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+
+from server.config import settings
+from server.db.partitions import (
+    add_months,
+    create_partition_sql,
+    iter_months,
+    month_start,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, user_id, url, duration, created_at"
+INDEXES = [
+    "ix_page_views_url",
+    "ix_page_views_user_id_created_at",
+    "ix_page_views_created_at",
+]
+
+
+def _create_table(name: str, primary_key: sa.PrimaryKeyConstraint, **kwargs) -> None:
+    op.create_table(
+        name,
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('page_views_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("url", sa.String(length=256), nullable=False),
+        sa.Column("duration", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.id"], name="page_views_user_id_fkey"
+        ),
+        primary_key,
+        **kwargs,
+    )
+
+
+def _move_rows(source: str) -> None:
+    op.execute(f"INSERT INTO page_views ({COLUMNS}) SELECT {COLUMNS} FROM {source}")
+    # Keep the sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE page_views_id_seq OWNED BY page_views.id")
+    op.drop_table(source)
+
+
+def _get_partition_range() -> tuple[date, date]:
+    """Months of the existing rows, and of the next ones up to the months ahead"""
+    today = datetime.utcnow().date()
+    first, last = today, today
+    if not context.is_offline_mode():
+        oldest, newest = (
+            op.get_bind()
+            .execute(sa.text("SELECT min(created_at), max(created_at) FROM page_views"))
+            .one()
+        )
+        if oldest is not None:
+            first, last = min(oldest.date(), today), max(newest.date(), today)
+
+    ahead = settings.PAGE_VIEWS_PARTITIONS_AHEAD
+    return first, max(
+        add_months(month_start(last), 1),
+        add_months(month_start(today), ahead + 1),
+    )
+
+
+def upgrade() -> None:
+    start, end = _get_partition_range()
+
+    op.rename_table("page_views", "page_views_unpartitioned")
+    # Index names are unique per schema, the new table takes the old ones
+    op.execute(
+        "ALTER TABLE page_views_unpartitioned"
+        " RENAME CONSTRAINT page_views_pkey TO page_views_unpartitioned_pkey"
+    )
+    for index in INDEXES:
+        op.drop_index(index, table_name="page_views_unpartitioned", if_exists=True)
+
+    _create_table(
+        "page_views",
+        sa.PrimaryKeyConstraint("id", "created_at", name="page_views_pkey"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    for month in iter_months(start, end):
+        op.execute(create_partition_sql(month))
+    _move_rows("page_views_unpartitioned")
+
+    # Built once the rows are in, on every partition
+    op.create_index("ix_page_views_url", "page_views", ["url"])
+    op.create_index(
+        "ix_page_views_user_id_created_at",
+        "page_views",
+        ["user_id", "created_at"],
+    )
+    op.create_index(
+        "ix_page_views_created_at",
+        "page_views",
+        ["created_at"],
+        postgresql_using="brin",
+    )
+
+
+def downgrade() -> None:
+    op.rename_table("page_views", "page_views_partitioned")
+    op.execute(
+        "ALTER TABLE page_views_partitioned"
+        " RENAME CONSTRAINT page_views_pkey TO page_views_partitioned_pkey"
+    )
+    for index in INDEXES:
+        op.drop_index(index, table_name="page_views_partitioned")
+
+    _create_table("page_views", sa.PrimaryKeyConstraint("id", name="page_views_pkey"))
+    # Drops the partitions too, detached ones are left alone
+    _move_rows("page_views_partitioned")
+
+    op.create_index("ix_page_views_url", "page_views", ["url"])
+    op.create_index(
+        "ix_page_views_user_id_created_at",
+        "page_views",
+        ["user_id", "created_at"],
+    )
+    op.create_index("ix_page_views_created_at", "page_views", ["created_at"])
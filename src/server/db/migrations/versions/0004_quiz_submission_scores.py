@@ -0,0 +1,61 @@
+"""quiz submission scores
+
+Adds `quiz_submission_scores`, one row per submission with its correct and
+total answer counts, and the triggers keeping it up to date (see
+`server.db.scores`). The existing submissions are scored here in one
+statement; `python -m server.cli backfill-scores` rebuilds the table in
+batches if it ever drifts.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-12-04 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from server.db.scores import CREATE_SQL, DROP_SQL
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "quiz_submission_scores",
+        sa.Column("submission_id", sa.Integer(), nullable=False),
+        sa.Column("quiz_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("correct_count", sa.Integer(), nullable=False),
+        sa.Column("total_count", sa.Integer(), nullable=False),
+        sa.Column("spent_time_seconds", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["submission_id"], ["quiz_submissions.id"]),
+        sa.PrimaryKeyConstraint("submission_id"),
+    )
+    op.create_index(
+        "ix_quiz_submission_scores_quiz_id",
+        "quiz_submission_scores",
+        ["quiz_id"],
+    )
+    op.create_index(
+        "ix_quiz_submission_scores_user_id",
+        "quiz_submission_scores",
+        ["user_id"],
+    )
+    for statement in CREATE_SQL:
+        op.execute(statement)
+    op.execute(
+        "SELECT refresh_quiz_submission_scores(ARRAY(SELECT id FROM quiz_submissions))"
+    )
+
+
+def downgrade() -> None:
+    for statement in DROP_SQL:
+        op.execute(statement)
+    op.drop_table("quiz_submission_scores")
@@ -0,0 +1,52 @@
+"""score histograms
+
+Adds `quiz_score_histograms` and `student_score_histograms`: submissions,
+answers and time spent per bin of the ratio of correct answers, per quiz
+and per student. Triggers on `quiz_submission_scores` keep them up to date
+(see `server.db.scores`), they are built here from the existing scores.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-12-11 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from server.db.scores import (
+    HISTOGRAMS,
+    HISTOGRAMS_CREATE_SQL,
+    HISTOGRAMS_DROP_SQL,
+    REBUILD_HISTOGRAMS_SQL,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table, key in HISTOGRAMS.items():
+        op.create_table(
+            table,
+            sa.Column(key, sa.Integer(), nullable=False),
+            sa.Column("bin", sa.Integer(), nullable=False),
+            sa.Column("submissions", sa.Integer(), nullable=False),
+            sa.Column("answers", sa.BigInteger(), nullable=False),
+            sa.Column("spent_time_seconds", sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint(key, "bin"),
+        )
+    for statement in HISTOGRAMS_CREATE_SQL + REBUILD_HISTOGRAMS_SQL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in HISTOGRAMS_DROP_SQL:
+        op.execute(statement)
+    for table in HISTOGRAMS:
+        op.drop_table(table)
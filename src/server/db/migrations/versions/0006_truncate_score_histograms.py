@@ -0,0 +1,38 @@
+"""truncate score histograms
+
+TRUNCATE fires no delete trigger, so truncating `quiz_submission_scores`
+(directly or cascading from `quiz_submissions`) left the histograms
+counting the removed scores. A truncate trigger empties them too.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-12-16 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from server.db.scores import (
+    HISTOGRAMS_TRUNCATE_CREATE_SQL,
+    HISTOGRAMS_TRUNCATE_DROP_SQL,
+    REBUILD_HISTOGRAMS_SQL,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Histograms left over by an earlier truncate are rebuilt
+    for statement in HISTOGRAMS_TRUNCATE_CREATE_SQL + REBUILD_HISTOGRAMS_SQL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in HISTOGRAMS_TRUNCATE_DROP_SQL:
+        op.execute(statement)
@@ -0,0 +1,65 @@
+"""answers covering index
+
+Replaces the index of `quiz_submission_answer.question_id` by one that
+includes the other columns, so the item analysis reads the answers of a
+quiz with an index-only scan. Built with CREATE INDEX CONCURRENTLY like in
+`0002`, an invalid index left by a failed build is dropped and rebuilt.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-12-23 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from server.db.migrations.helpers import drop_invalid_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE = "quiz_submission_answer"
+OLD_INDEX = "ix_quiz_submission_answer_question_id"
+NEW_INDEX = "ix_quiz_submission_answer_question_id_include"
+INCLUDE = ["submission_id", "selected_option_id", "spent_time_seconds"]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        drop_invalid_index(NEW_INDEX, TABLE)
+        op.create_index(
+            NEW_INDEX,
+            TABLE,
+            ["question_id"],
+            postgresql_concurrently=True,
+            postgresql_include=INCLUDE,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            OLD_INDEX,
+            table_name=TABLE,
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            OLD_INDEX,
+            TABLE,
+            ["question_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            NEW_INDEX,
+            table_name=TABLE,
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
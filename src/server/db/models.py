@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import Boolean, ForeignKey, String, Text
+from sqlalchemy import BigInteger, Boolean, ForeignKey, Index, String, Text, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -10,6 +10,9 @@ Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_student_id", "id", postgresql_where=text("role = 'student'")),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     username: Mapped[str] = mapped_column(String(256), unique=True)
@@ -48,7 +51,7 @@ class QuizQuestion(Base):
     __tablename__ = "quiz_questions"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizes.id"))
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizes.id"), index=True)
     title: Mapped[str] = mapped_column(String(256))
     description: Mapped[Optional[str]] = mapped_column(Text)
     image: Mapped[Optional[str]] = mapped_column(String(256))
@@ -68,7 +71,9 @@ class QuizQuestionOption(Base):
     __tablename__ = "quiz_question_options"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    question_id: Mapped[int] = mapped_column(ForeignKey("quiz_questions.id"))
+    question_id: Mapped[int] = mapped_column(
+        ForeignKey("quiz_questions.id"), index=True
+    )
     text: Mapped[Optional[str]] = mapped_column(Text)
     image: Mapped[Optional[str]] = mapped_column(String(256))
     is_correct: Mapped[bool] = mapped_column(Boolean)
@@ -84,8 +89,8 @@ class QuizSubmission(Base):
     __tablename__ = "quiz_submissions"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizes.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizes.id"), index=True)
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
 
     # Relationships
@@ -98,6 +103,18 @@ class QuizSubmission(Base):
 
 class QuizSubmissionAnswer(Base):
     __tablename__ = "quiz_submission_answer"
+    __table_args__ = (
+        # Covers the answers of a quiz read by the item analysis
+        Index(
+            "ix_quiz_submission_answer_question_id_include",
+            "question_id",
+            postgresql_include=[
+                "submission_id",
+                "selected_option_id",
+                "spent_time_seconds",
+            ],
+        ),
+    )
 
     submission_id: Mapped[int] = mapped_column(
         ForeignKey("quiz_submissions.id"), primary_key=True
@@ -106,7 +123,7 @@ class QuizSubmissionAnswer(Base):
         ForeignKey("quiz_questions.id"), primary_key=True
     )
     selected_option_id: Mapped[int] = mapped_column(
-        ForeignKey("quiz_question_options.id"), primary_key=True
+        ForeignKey("quiz_question_options.id"), primary_key=True, index=True
     )
     spent_time_seconds: Mapped[int]
 
@@ -118,6 +135,51 @@ class QuizSubmissionAnswer(Base):
     )
 
 
+class QuizSubmissionScore(Base):
+    """
+    Answer counts of a submission, kept up to date by triggers on
+    `quiz_submission_answer` (see server.db.scores).
+    """
+
+    __tablename__ = "quiz_submission_scores"
+
+    submission_id: Mapped[int] = mapped_column(
+        ForeignKey("quiz_submissions.id"), primary_key=True
+    )
+    quiz_id: Mapped[int] = mapped_column(index=True)
+    user_id: Mapped[int] = mapped_column(index=True)
+    correct_count: Mapped[int]
+    total_count: Mapped[int]
+    spent_time_seconds: Mapped[int]
+
+
+class QuizScoreHistogram(Base):
+    """
+    Submissions of a quiz per score bin, kept up to date by triggers on
+    `quiz_submission_scores` (see server.db.scores).
+    """
+
+    __tablename__ = "quiz_score_histograms"
+
+    quiz_id: Mapped[int] = mapped_column(primary_key=True)
+    bin: Mapped[int] = mapped_column(primary_key=True)
+    submissions: Mapped[int]
+    answers: Mapped[int] = mapped_column(BigInteger)
+    spent_time_seconds: Mapped[int] = mapped_column(BigInteger)
+
+
+class StudentScoreHistogram(Base):
+    """Submissions of a user per score bin, like `QuizScoreHistogram`"""
+
+    __tablename__ = "student_score_histograms"
+
+    user_id: Mapped[int] = mapped_column(primary_key=True)
+    bin: Mapped[int] = mapped_column(primary_key=True)
+    submissions: Mapped[int]
+    answers: Mapped[int] = mapped_column(BigInteger)
+    spent_time_seconds: Mapped[int] = mapped_column(BigInteger)
+
+
 class Challenge(Base):
     __tablename__ = "challenges"
 
@@ -137,8 +199,8 @@ class ChallengeSubmission(Base):
     __tablename__ = "challenge_submissions"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    challenge_id: Mapped[int] = mapped_column(ForeignKey("challenges.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    challenge_id: Mapped[int] = mapped_column(ForeignKey("challenges.id"), index=True)
     text: Mapped[str] = mapped_column(Text)
     execution_time_ms: Mapped[int]
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
@@ -150,12 +212,21 @@ class ChallengeSubmission(Base):
 
 class PageView(Base):
     __tablename__ = "page_views"
+    # Partitioned by month, see server.db.partitions. The partition key has
+    # to be part of the primary key.
+    __table_args__ = (
+        Index("ix_page_views_user_id_created_at", "user_id", "created_at"),
+        Index("ix_page_views_created_at", "created_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id: Mapped[int] = mapped_column(primary_key=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    url: Mapped[str] = mapped_column(String(256))
+    url: Mapped[str] = mapped_column(String(256), index=True)
     duration: Mapped[Optional[int]]
-    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(
+        primary_key=True, default=datetime.utcnow
+    )
 
     # Relationships
     user: Mapped["User"] = relationship(back_populates="page_views")
@@ -0,0 +1,213 @@
+"""
+Monthly range partitions of the `page_views` table.
+
+Partitions are named `page_views_YYYY_MM` and hold the rows with
+`created_at` in [first day of the month, first day of the next month).
+Functions here take a sync connection: run them with `run_sync` from
+async code, or directly from migrations.
+"""
+
+import asyncio
+import logging
+from collections.abc import Iterator
+from datetime import date, datetime
+from typing import Literal
+
+from sqlalchemy import Connection, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "page_views"
+
+type RetentionAction = Literal["detach", "drop"]
+
+LIST_PARTITIONS_QUERY = text(
+    """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = CAST(:parent AS regclass)
+    """
+)
+
+# Serializes maintenance between workers, taken for the transaction
+MAINTENANCE_LOCK_QUERY = text("SELECT pg_advisory_xact_lock(hashtext(:parent))")
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def iter_months(start: date, end: date) -> Iterator[date]:
+    """First days of the months overlapping [start, end)"""
+    month = month_start(start)
+    while month < end:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month:%Y_%m}"
+
+
+def parse_partition_name(name: str) -> date | None:
+    try:
+        return datetime.strptime(name, f"{PARENT_TABLE}_%Y_%m").date()
+    except ValueError:
+        return None
+
+
+def create_partition_sql(month: date) -> str:
+    return (
+        f"CREATE TABLE {partition_name(month)} PARTITION OF {PARENT_TABLE}"
+        f" FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+    )
+
+
+def list_partitions(connection: Connection) -> list[str]:
+    return list(connection.scalars(LIST_PARTITIONS_QUERY, {"parent": PARENT_TABLE}))
+
+
+def create_partitions(connection: Connection, start: date, end: date) -> list[str]:
+    """Create the missing partitions for [start, end), returns their names"""
+    existing = set(list_partitions(connection))
+    created = []
+    for month in iter_months(start, end):
+        name = partition_name(month)
+        if name in existing:
+            continue
+
+        connection.exec_driver_sql(create_partition_sql(month))
+        created.append(name)
+    return created
+
+
+def remove_expired_partitions(
+    connection: Connection,
+    today: date,
+    retention_months: int,
+    action: RetentionAction = "detach",
+) -> list[str]:
+    """
+    Detach or drop the partitions older than `retention_months` full months,
+    returns their names. Detached partitions become plain tables, to be
+    archived and dropped separately.
+    """
+    cutoff = add_months(month_start(today), -retention_months)
+    removed = []
+    for name in sorted(list_partitions(connection)):
+        month = parse_partition_name(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+
+        if action == "drop":
+            connection.exec_driver_sql(f"DROP TABLE {name}")
+        else:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"
+            )
+        removed.append(name)
+    return removed
+
+
+def maintain_partitions(
+    connection: Connection,
+    today: date,
+    months_ahead: int,
+    retention_months: int = 0,
+    retention_action: RetentionAction = "detach",
+) -> tuple[list[str], list[str]]:
+    """
+    Create the partitions from the current month to `months_ahead` months
+    later and, when `retention_months` is set, remove the expired ones.
+    Returns the names of the created and the removed partitions.
+    """
+    connection.execute(MAINTENANCE_LOCK_QUERY, {"parent": PARENT_TABLE})
+    current_month = month_start(today)
+    created = create_partitions(
+        connection,
+        current_month,
+        add_months(current_month, months_ahead + 1),
+    )
+
+    removed = []
+    if retention_months > 0:
+        removed = remove_expired_partitions(
+            connection,
+            today,
+            retention_months,
+            retention_action,
+        )
+    return created, removed
+
+
+class PartitionMaintenance:
+    """
+    Runs `maintain_partitions` every `interval` seconds in the background,
+    so inserts always find a partition for the coming months.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        months_ahead: int = 3,
+        retention_months: int = 0,
+        retention_action: RetentionAction = "detach",
+        interval: float = 3600,
+    ) -> None:
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.retention_action = retention_action
+        self._engine = engine
+        self._interval = interval
+        self._task: asyncio.Task[None] | None = None
+
+    async def run(self) -> tuple[list[str], list[str]]:
+        async with self._engine.begin() as conn:
+            created, removed = await conn.run_sync(
+                maintain_partitions,
+                datetime.utcnow().date(),
+                self.months_ahead,
+                self.retention_months,
+                self.retention_action,
+            )
+
+        if created:
+            logger.info("Created partitions %s", ", ".join(created))
+        if removed:
+            logger.info(
+                "Retention: %s partitions %s",
+                self.retention_action,
+                ", ".join(removed),
+            )
+        return created, removed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run()
+            except (SQLAlchemyError, OSError) as e:
+                logger.warning("Can't maintain %s partitions: %r", PARENT_TABLE, e)
+            await asyncio.sleep(self._interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,93 @@
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util import LRUCache
+
+
+class PoolStats:
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.connects = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.statement_cache_hits = 0
+        self.statement_cache_misses = 0
+
+    def record_checkout(self, wait: float) -> None:
+        self.checkouts += 1
+        self.checkout_wait_total += wait
+        self.checkout_wait_max = max(self.checkout_wait_max, wait)
+
+
+class CountingLRUCache(LRUCache):
+    """
+    The asyncpg dialect's prepared statement cache, counting lookups.
+    The dialect checks `statement in cache` before preparing a statement.
+    """
+
+    __slots__ = ("_stats",)
+
+    def __init__(self, capacity: int, stats: PoolStats) -> None:
+        super().__init__(capacity)
+        self._stats = stats
+
+    def __contains__(self, key: object) -> bool:
+        found = key in self._data
+        if found:
+            self._stats.statement_cache_hits += 1
+        else:
+            self._stats.statement_cache_misses += 1
+        return found
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool recording how long checkouts wait for a connection, how many
+    connections get opened and invalidated, and prepared statement cache
+    hits. The stats survive pool recreation (e.g. `engine.dispose()`).
+    """
+
+    stats: PoolStats
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if "_dispatch" not in kwargs:
+            self.stats = PoolStats()
+            self._listen()
+
+    def _listen(self) -> None:
+        stats = self.stats
+
+        @event.listens_for(self, "connect")
+        def on_connect(dbapi_connection, connection_record) -> None:
+            stats.connects += 1
+            cache = getattr(dbapi_connection, "_prepared_statement_cache", None)
+            if cache is not None:
+                dbapi_connection._prepared_statement_cache = CountingLRUCache(
+                    cache.capacity,
+                    stats,
+                )
+
+        @event.listens_for(self, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception) -> None:
+            stats.invalidations += 1
+
+        @event.listens_for(self, "soft_invalidate")
+        def on_soft_invalidate(dbapi_connection, connection_record, exception) -> None:
+            stats.soft_invalidations += 1
+
+    def recreate(self) -> "InstrumentedPool":
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def connect(self):
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.stats.record_checkout(time.perf_counter() - started_at)
@@ -0,0 +1,132 @@
+import asyncio
+import itertools
+import logging
+import math
+from collections.abc import Sequence
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from .sessions import create_session_maker
+
+logger = logging.getLogger(__name__)
+
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+PRIMARY_LSN_QUERY = text("SELECT pg_current_wal_lsn()::text")
+
+# A replica that replayed everything the primary has written isn't behind,
+# however long ago the last transaction was. A server that isn't in
+# recovery isn't replicating at all (e.g. a second local instance).
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_replay_lsn() >= CAST(:primary_lsn AS pg_lsn) THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class Replica:
+    def __init__(self, name: str, engine: AsyncEngine) -> None:
+        self.name = name
+        self.engine = engine
+        self.session_maker = create_session_maker(engine)
+        # Unknown until the first successful check, unknown replicas aren't used
+        self.lag: float | None = None
+
+
+class ReplicaSet:
+    """
+    Routes read-only sessions to replicas that are in sync with the primary.
+
+    Replica lag is checked every `check_interval` seconds in the background.
+    Replicas lagging more than `max_lag_seconds`, or that couldn't be
+    checked, are skipped; when none is left reads go to the primary.
+    """
+
+    def __init__(
+        self,
+        primary: async_sessionmaker[AsyncSession],
+        primary_engine: AsyncEngine,
+        replicas: Sequence[Replica] = (),
+        max_lag_seconds: float = 5,
+        check_interval: float = 1,
+    ) -> None:
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag_seconds = max_lag_seconds
+        self._primary_engine = primary_engine
+        self._check_interval = check_interval
+        self._counter = itertools.count()
+        self._task: asyncio.Task[None] | None = None
+
+    def get_available(self) -> list[Replica]:
+        return [
+            replica
+            for replica in self.replicas
+            if replica.lag is not None and replica.lag <= self.max_lag_seconds
+        ]
+
+    def get_session_maker(
+        self,
+        read_your_writes: bool = False,
+    ) -> async_sessionmaker[AsyncSession]:
+        if read_your_writes:
+            return self.primary
+
+        available = self.get_available()
+        if not available:
+            return self.primary
+        return available[next(self._counter) % len(available)].session_maker
+
+    async def _get_primary_lsn(self) -> str | None:
+        try:
+            async with self._primary_engine.connect() as conn:
+                return await conn.scalar(PRIMARY_LSN_QUERY)
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Can't get the primary WAL position: %r", e)
+            return None
+
+    async def _check_replica(self, replica: Replica, primary_lsn: str | None) -> None:
+        try:
+            async with replica.engine.connect() as conn:
+                lag = await conn.scalar(
+                    REPLICA_LAG_QUERY,
+                    {"primary_lsn": primary_lsn},
+                )
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Can't check replica %s: %r", replica.name, e)
+            replica.lag = None
+            return
+
+        replica.lag = float(lag) if lag is not None else math.inf
+
+    async def check_lag(self) -> None:
+        primary_lsn = await self._get_primary_lsn()
+        await asyncio.gather(
+            *(self._check_replica(replica, primary_lsn) for replica in self.replicas)
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await self.check_lag()
+            await asyncio.sleep(self._check_interval)
+
+    async def start(self) -> None:
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
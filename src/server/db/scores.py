@@ -0,0 +1,297 @@
+"""
+Per-submission scores in `quiz_submission_scores`, and their histograms
+per quiz and per student.
+
+A score row holds the correct and total answer counts of a submission, so
+the stats read one narrow row per submission instead of joining every
+answer with its option. Triggers keep the rows up to date as answers are
+written and as options are marked correct or not.
+
+The histograms count the submissions of a quiz or a student per bin of
+their ratio of correct answers, so success counts for any threshold sum
+at most `SCORE_BINS + 1` rows. Triggers on the score rows keep them up to
+date.
+
+Functions here take a sync connection: run them with `run_sync` from
+async code, or directly from migrations.
+"""
+
+from sqlalchemy import ColumnElement, Connection, Float, cast, text
+
+# Bin 0 holds the submissions without a correct answer, bin k those with a
+# ratio of correct answers in ((k - 1) / SCORE_BINS, k / SCORE_BINS]. Success
+# counts are exact for thresholds in multiples of 1 / SCORE_BINS.
+SCORE_BINS = 100
+
+# Histogram table: the column it's kept per
+HISTOGRAMS = {
+    "quiz_score_histograms": "quiz_id",
+    "student_score_histograms": "user_id",
+}
+
+# Recomputes the rows of the given submissions from their answers
+REFRESH_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION refresh_quiz_submission_scores(submission_ids integer[])
+RETURNS void LANGUAGE sql AS $$
+    DELETE FROM quiz_submission_scores score
+    WHERE score.submission_id = ANY(submission_ids)
+        AND NOT EXISTS (
+            SELECT 1 FROM quiz_submission_answer answer
+            WHERE answer.submission_id = score.submission_id
+        );
+
+    INSERT INTO quiz_submission_scores (
+        submission_id,
+        quiz_id,
+        user_id,
+        correct_count,
+        total_count,
+        spent_time_seconds
+    )
+    SELECT
+        submission.id,
+        submission.quiz_id,
+        submission.user_id,
+        count(*) FILTER (WHERE answer_option.is_correct),
+        count(*),
+        sum(answer.spent_time_seconds)
+    FROM quiz_submissions submission
+    JOIN quiz_submission_answer answer ON answer.submission_id = submission.id
+    JOIN quiz_question_options answer_option
+        ON answer_option.id = answer.selected_option_id
+    WHERE submission.id = ANY(submission_ids)
+    GROUP BY submission.id
+    ON CONFLICT (submission_id) DO UPDATE SET
+        quiz_id = EXCLUDED.quiz_id,
+        user_id = EXCLUDED.user_id,
+        correct_count = EXCLUDED.correct_count,
+        total_count = EXCLUDED.total_count,
+        spent_time_seconds = EXCLUDED.spent_time_seconds;
+$$
+"""
+
+# Statement level, a submission's answers inserted at once refresh it once
+ANSWERS_TRIGGER_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION quiz_submission_answer_scores() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_quiz_submission_scores(
+            ARRAY(SELECT DISTINCT submission_id FROM new_answers)
+        );
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM refresh_quiz_submission_scores(
+            ARRAY(SELECT DISTINCT submission_id FROM old_answers)
+        );
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+OPTIONS_TRIGGER_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION quiz_question_option_scores() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM refresh_quiz_submission_scores(
+        ARRAY(
+            SELECT DISTINCT submission_id FROM quiz_submission_answer
+            WHERE selected_option_id = NEW.id
+        )
+    );
+    RETURN NULL;
+END
+$$
+"""
+
+CREATE_SQL = [
+    REFRESH_FUNCTION_SQL,
+    ANSWERS_TRIGGER_FUNCTION_SQL,
+    OPTIONS_TRIGGER_FUNCTION_SQL,
+    # A trigger with transition tables handles a single event
+    "CREATE TRIGGER quiz_submission_answer_scores_insert"
+    " AFTER INSERT ON quiz_submission_answer"
+    " REFERENCING NEW TABLE AS new_answers"
+    " FOR EACH STATEMENT EXECUTE FUNCTION quiz_submission_answer_scores()",
+    "CREATE TRIGGER quiz_submission_answer_scores_update"
+    " AFTER UPDATE ON quiz_submission_answer"
+    " REFERENCING OLD TABLE AS old_answers NEW TABLE AS new_answers"
+    " FOR EACH STATEMENT EXECUTE FUNCTION quiz_submission_answer_scores()",
+    "CREATE TRIGGER quiz_submission_answer_scores_delete"
+    " AFTER DELETE ON quiz_submission_answer"
+    " REFERENCING OLD TABLE AS old_answers"
+    " FOR EACH STATEMENT EXECUTE FUNCTION quiz_submission_answer_scores()",
+    "CREATE TRIGGER quiz_question_option_scores"
+    " AFTER UPDATE OF is_correct ON quiz_question_options"
+    " FOR EACH ROW WHEN (OLD.is_correct IS DISTINCT FROM NEW.is_correct)"
+    " EXECUTE FUNCTION quiz_question_option_scores()",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS quiz_question_option_scores ON quiz_question_options",
+    "DROP TRIGGER IF EXISTS quiz_submission_answer_scores_delete"
+    " ON quiz_submission_answer",
+    "DROP TRIGGER IF EXISTS quiz_submission_answer_scores_update"
+    " ON quiz_submission_answer",
+    "DROP TRIGGER IF EXISTS quiz_submission_answer_scores_insert"
+    " ON quiz_submission_answer",
+    "DROP FUNCTION IF EXISTS quiz_question_option_scores()",
+    "DROP FUNCTION IF EXISTS quiz_submission_answer_scores()",
+    "DROP FUNCTION IF EXISTS refresh_quiz_submission_scores(integer[])",
+]
+
+
+def _add_to_histograms_sql(source: str, sign: int) -> list[str]:
+    """Add (or subtract) the score rows of `source` to the histograms"""
+    return [
+        f"""
+    INSERT INTO {table} AS histogram
+        ({key}, bin, submissions, answers, spent_time_seconds)
+    SELECT
+        {key},
+        (correct_count * {SCORE_BINS} + total_count - 1) / total_count,
+        {sign} * count(*),
+        {sign} * sum(total_count),
+        {sign} * sum(spent_time_seconds)
+    FROM {source}
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT ({key}, bin) DO UPDATE SET
+        submissions = histogram.submissions + EXCLUDED.submissions,
+        answers = histogram.answers + EXCLUDED.answers,
+        spent_time_seconds =
+            histogram.spent_time_seconds + EXCLUDED.spent_time_seconds
+"""
+        for table, key in HISTOGRAMS.items()
+    ]
+
+
+HISTOGRAMS_TRIGGER_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION quiz_submission_scores_histograms() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+{";".join(_add_to_histograms_sql("old_scores", -1))};
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+{";".join(_add_to_histograms_sql("new_scores", 1))};
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+HISTOGRAMS_CREATE_SQL = [
+    HISTOGRAMS_TRIGGER_FUNCTION_SQL,
+    "CREATE TRIGGER quiz_submission_scores_histograms_insert"
+    " AFTER INSERT ON quiz_submission_scores"
+    " REFERENCING NEW TABLE AS new_scores"
+    " FOR EACH STATEMENT EXECUTE FUNCTION quiz_submission_scores_histograms()",
+    "CREATE TRIGGER quiz_submission_scores_histograms_update"
+    " AFTER UPDATE ON quiz_submission_scores"
+    " REFERENCING OLD TABLE AS old_scores NEW TABLE AS new_scores"
+    " FOR EACH STATEMENT EXECUTE FUNCTION quiz_submission_scores_histograms()",
+    "CREATE TRIGGER quiz_submission_scores_histograms_delete"
+    " AFTER DELETE ON quiz_submission_scores"
+    " REFERENCING OLD TABLE AS old_scores"
+    " FOR EACH STATEMENT EXECUTE FUNCTION quiz_submission_scores_histograms()",
+]
+
+HISTOGRAMS_DROP_SQL = [
+    *(
+        f"DROP TRIGGER IF EXISTS quiz_submission_scores_histograms_{event}"
+        " ON quiz_submission_scores"
+        for event in ("delete", "update", "insert")
+    ),
+    "DROP FUNCTION IF EXISTS quiz_submission_scores_histograms()",
+]
+
+# TRUNCATE fires no delete trigger, the histograms follow a truncate of the
+# scores (or of the submissions, cascading to them)
+HISTOGRAMS_TRUNCATE_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION quiz_submission_scores_truncate_histograms()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    TRUNCATE {", ".join(HISTOGRAMS)};
+    RETURN NULL;
+END
+$$
+"""
+
+HISTOGRAMS_TRUNCATE_CREATE_SQL = [
+    HISTOGRAMS_TRUNCATE_FUNCTION_SQL,
+    "CREATE TRIGGER quiz_submission_scores_histograms_truncate"
+    " AFTER TRUNCATE ON quiz_submission_scores"
+    " FOR EACH STATEMENT"
+    " EXECUTE FUNCTION quiz_submission_scores_truncate_histograms()",
+]
+
+HISTOGRAMS_TRUNCATE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS quiz_submission_scores_histograms_truncate"
+    " ON quiz_submission_scores",
+    "DROP FUNCTION IF EXISTS quiz_submission_scores_truncate_histograms()",
+]
+
+# TRUNCATE locks the histograms, concurrent score changes wait and then
+# apply on top of the rebuilt counts
+REBUILD_HISTOGRAMS_SQL = [
+    f"TRUNCATE {', '.join(HISTOGRAMS)}",
+    *_add_to_histograms_sql("quiz_submission_scores", 1),
+]
+
+BATCH_QUERY = text(
+    "SELECT id FROM quiz_submissions WHERE id > :after_id ORDER BY id LIMIT :limit"
+)
+REFRESH_QUERY = text("SELECT refresh_quiz_submission_scores(:submission_ids)")
+
+
+def create_score_triggers(connection: Connection) -> None:
+    """Create the functions and triggers, the tables must exist"""
+    for statement in (
+        CREATE_SQL + HISTOGRAMS_CREATE_SQL + HISTOGRAMS_TRUNCATE_CREATE_SQL
+    ):
+        connection.exec_driver_sql(statement)
+
+
+def drop_score_triggers(connection: Connection) -> None:
+    for statement in HISTOGRAMS_TRUNCATE_DROP_SQL + HISTOGRAMS_DROP_SQL + DROP_SQL:
+        connection.exec_driver_sql(statement)
+
+
+def rebuild_score_histograms(connection: Connection) -> None:
+    for statement in REBUILD_HISTOGRAMS_SQL:
+        connection.exec_driver_sql(statement)
+
+
+def score_bin(
+    correct_count: ColumnElement[int],
+    total_count: ColumnElement[int],
+) -> ColumnElement[int]:
+    """The bin of a submission, as the histogram triggers compute it"""
+    return (correct_count * SCORE_BINS + total_count - 1) // total_count
+
+
+def is_successful_bin(
+    bin_column: ColumnElement[int],
+    success_threshold: ColumnElement[float] | float,
+) -> ColumnElement[bool]:
+    """Whether the ratios of a bin are above the threshold"""
+    return cast(bin_column, Float) / SCORE_BINS > success_threshold
+
+
+def refresh_scores_batch(
+    connection: Connection,
+    after_id: int,
+    batch_size: int,
+) -> list[int]:
+    """
+    Recompute the scores of the `batch_size` submissions following
+    `after_id`, returns their ids.
+    """
+    submission_ids = list(
+        connection.scalars(BATCH_QUERY, {"after_id": after_id, "limit": batch_size})
+    )
+    if submission_ids:
+        connection.execute(REFRESH_QUERY, {"submission_ids": submission_ids})
+    return submission_ids
@@ -0,0 +1,132 @@
+import time
+from typing import Any
+
+from sqlalchemy import Connection, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, SessionTransaction
+
+ROUTE_KEY = "route"
+BEGAN_AT_KEY = "began_at"
+HAS_WRITES_KEY = "has_writes"
+STATEMENT_TIMEOUT_KEY = "statement_timeout"
+
+
+class ConnectionHoldStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, hold_time: float) -> None:
+        self.count += 1
+        self.total += hold_time
+        self.max = max(self.max, hold_time)
+
+
+class ConnectionHoldTimes:
+    """How long sessions keep a connection checked out, per route"""
+
+    def __init__(self) -> None:
+        self.routes: dict[str, ConnectionHoldStats] = {}
+
+    def record(self, route: str, hold_time: float) -> None:
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = ConnectionHoldStats()
+        stats.record(hold_time)
+
+
+connection_hold_times = ConnectionHoldTimes()
+
+
+class TrackedSession(Session):
+    pass
+
+
+@event.listens_for(TrackedSession, "after_begin")
+def on_begin(
+    session: Session, transaction: SessionTransaction, connection: Connection
+) -> None:
+    session.info.setdefault(BEGAN_AT_KEY, time.perf_counter())
+
+    # Local to the transaction, so that pooled connections don't carry it
+    # over to the maintenance and CLI code sharing the engine. Once per
+    # request, which runs in one transaction unless released.
+    timeout = session.info.get(STATEMENT_TIMEOUT_KEY)
+    if timeout is not None:
+        connection.exec_driver_sql(
+            f"SET LOCAL statement_timeout = {int(timeout * 1000)}"
+        )
+
+
+@event.listens_for(TrackedSession, "after_flush")
+def on_flush(session: Session, flush_context) -> None:
+    session.info[HAS_WRITES_KEY] = True
+
+
+@event.listens_for(TrackedSession, "after_transaction_end")
+def on_transaction_end(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is not None:
+        return
+
+    session.info.pop(HAS_WRITES_KEY, None)
+    began_at = session.info.pop(BEGAN_AT_KEY, None)
+    if began_at is not None:
+        connection_hold_times.record(
+            session.info.get(ROUTE_KEY, "-"),
+            time.perf_counter() - began_at,
+        )
+
+
+def is_read_only(statement: Any) -> bool:
+    return (
+        getattr(statement, "is_select", False)
+        and getattr(statement, "_for_update_arg", None) is None
+    )
+
+
+class ReleasingAsyncSession(AsyncSession):
+    """
+    Checks out a connection on the first statement and keeps it, in one
+    transaction, until the session is closed at the end of the request.
+
+    `release()` gives the connection back early when the session only read
+    so far, for handlers with slow work left after their last query. The
+    next statement checks out a connection again, in a new transaction.
+    Once the transaction wrote anything (a flush, a DML or text statement)
+    the connection is kept until commit or rollback as usual. Loaded
+    objects stay usable since sessions don't expire them on commit.
+    """
+
+    async def release(self) -> None:
+        if (
+            self.in_transaction()
+            and not self.info.get(HAS_WRITES_KEY)
+            and not (self.new or self.dirty or self.deleted)
+        ):
+            await self.commit()
+
+    def _track_writes(self, statement: Any) -> None:
+        if not is_read_only(statement):
+            self.info[HAS_WRITES_KEY] = True
+
+    async def execute(self, statement, *args, **kwargs):
+        self._track_writes(statement)
+        return await super().execute(statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        self._track_writes(statement)
+        return await super().scalar(statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        self._track_writes(statement)
+        return await super().scalars(statement, *args, **kwargs)
+
+
+def create_session_maker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        engine,
+        class_=ReleasingAsyncSession,
+        sync_session_class=TrackedSession,
+        expire_on_commit=False,
+    )
@@ -0,0 +1,195 @@
+"""
+Optional sharding of the event tables by user id.
+
+`page_views`, `quiz_submissions` and `quiz_submission_answer` can be spread
+over several databases, a user's rows all living on `user_id % len(shards)`.
+Everything else (users, quizes, questions) stays on the primary.
+
+Aggregates run on every shard at once and the partial results are merged
+in Python. Since a user lives on one shard only, per-user aggregates are
+complete on their shard and distinct user counts simply add up.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+from sqlalchemy import (
+    BindParameter,
+    Column,
+    ColumnElement,
+    Connection,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    PrimaryKeyConstraint,
+    RowMapping,
+    Select,
+    String,
+    Table,
+    any_,
+    bindparam,
+    func,
+    select,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from .models import QuizQuestionOption, QuizSubmission, QuizSubmissionAnswer
+from .sessions import ROUTE_KEY, STATEMENT_TIMEOUT_KEY, create_session_maker
+
+# The tables a shard holds, named like on the primary so the same queries
+# run on both. Foreign keys to the tables left on the primary are dropped.
+shard_metadata = MetaData()
+
+Table(
+    "page_views",
+    shard_metadata,
+    Column("id", Integer, autoincrement=True),
+    Column("user_id", Integer, nullable=False),
+    Column("url", String(256), nullable=False, index=True),
+    Column("duration", Integer),
+    Column("created_at", DateTime, nullable=False),
+    PrimaryKeyConstraint("id", "created_at"),
+    Index("ix_page_views_user_id_created_at", "user_id", "created_at"),
+    Index("ix_page_views_created_at", "created_at", postgresql_using="brin"),
+)
+
+Table(
+    "quiz_submissions",
+    shard_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("quiz_id", Integer, nullable=False, index=True),
+    Column("created_at", DateTime, nullable=False),
+)
+
+Table(
+    "quiz_submission_answer",
+    shard_metadata,
+    Column(
+        "submission_id",
+        Integer,
+        ForeignKey("quiz_submissions.id"),
+        primary_key=True,
+    ),
+    Column("question_id", Integer, primary_key=True),
+    Column("selected_option_id", Integer, primary_key=True, index=True),
+    Column("spent_time_seconds", Integer, nullable=False),
+    Index(
+        "ix_quiz_submission_answer_question_id_include",
+        "question_id",
+        postgresql_include=[
+            "submission_id",
+            "selected_option_id",
+            "spent_time_seconds",
+        ],
+    ),
+)
+
+
+def create_shard_tables(connection: Connection) -> None:
+    shard_metadata.create_all(connection)
+
+
+class Shard:
+    def __init__(self, name: str, engine: AsyncEngine) -> None:
+        self.name = name
+        self.engine = engine
+        self.session_maker = create_session_maker(engine)
+
+
+class ShardSet:
+    """
+    Runs queries on the shards of the event tables. Without shards the
+    event tables are on the primary and queries run on the given session.
+    """
+
+    def __init__(self, shards: Sequence[Shard] = ()) -> None:
+        self.shards = list(shards)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.shards)
+
+    def get_shard(self, user_id: int) -> Shard:
+        return self.shards[user_id % len(self.shards)]
+
+    async def scatter[T](
+        self,
+        db_session: AsyncSession,
+        query: Callable[[AsyncSession], Awaitable[T]],
+    ) -> list[T]:
+        """
+        Run `query` on every shard concurrently, or on `db_session` when
+        sharding is off. Shard sessions inherit the route and statement
+        timeout of `db_session`.
+        """
+        if not self.shards:
+            return [await query(db_session)]
+
+        async def run(shard: Shard) -> T:
+            async with shard.session_maker() as session:
+                for key in (ROUTE_KEY, STATEMENT_TIMEOUT_KEY):
+                    if key in db_session.info:
+                        session.info[key] = db_session.info[key]
+                return await query(session)
+
+        return list(await asyncio.gather(*(run(shard) for shard in self.shards)))
+
+
+# Event tables on the primary
+UNSHARDED = ShardSet()
+
+
+# quizes and options stay on the primary. The shards get the correct option
+# ids as a parameter and return totals, merged by the caller.
+
+
+def int_array_param(name: str) -> BindParameter:
+    return bindparam(name, type_=ARRAY(Integer))
+
+
+def select_per_submission(*columns: ColumnElement) -> Select:
+    """Correct and total answers of every submission, among `columns`"""
+    is_correct = QuizSubmissionAnswer.selected_option_id == any_(
+        int_array_param("correct_option_ids")
+    )
+    return (
+        select(
+            *columns,
+            func.count().filter(is_correct).label("correct_count"),
+            func.count().label("total_count"),
+            func.sum(QuizSubmissionAnswer.spent_time_seconds).label(
+                "spent_time_seconds"
+            ),
+        )
+        .join(
+            QuizSubmissionAnswer,
+            QuizSubmission.id == QuizSubmissionAnswer.submission_id,
+        )
+        .group_by(QuizSubmission.id, *columns)
+    )
+
+
+def fetch_mappings(query: Select, params: dict[str, Any]):
+    async def fetch(session: AsyncSession) -> Sequence[RowMapping]:
+        return (await session.execute(query, params)).mappings().all()
+
+    return fetch
+
+
+def fetch_scalars(query: Select, params: dict[str, Any]):
+    async def fetch(session: AsyncSession) -> Sequence[Any]:
+        return (await session.scalars(query, params)).all()
+
+    return fetch
+
+
+async def get_correct_option_ids(db_session: AsyncSession) -> list[int]:
+    result = await db_session.scalars(
+        select(QuizQuestionOption.id).where(QuizQuestionOption.is_correct)
+    )
+    return list(result)
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from .sessions import create_session_maker
+
+logger = logging.getLogger(__name__)
+
+type WarmupQuery = Callable[[AsyncSession], Awaitable[Any]]
+
+
+async def warm_up_engine(
+    name: str,
+    engine: AsyncEngine,
+    connections: int,
+    queries: Sequence[WarmupQuery] = (),
+) -> int:
+    """
+    Open up to `connections` connections at once, so they stay in the pool,
+    and run `queries` on each of them. That fills the compiled statement
+    cache and the prepared statements of every connection, which otherwise
+    the first requests of a cold worker pay for.
+
+    Queries should be cheap and read-only (e.g. LIMIT 0). Failures are
+    logged, the application starts anyway. Returns the number of warmed
+    connections.
+    """
+    connections = min(connections, engine.pool.size())
+    if connections <= 0:
+        return 0
+
+    started_at = time.perf_counter()
+    results = await asyncio.gather(
+        *(engine.connect().start() for _ in range(connections)),
+        return_exceptions=True,
+    )
+    opened = [conn for conn in results if isinstance(conn, AsyncConnection)]
+    errors = [e for e in results if isinstance(e, BaseException)]
+    if errors:
+        logger.warning("Can't open connections to %s: %r", name, errors[0])
+
+    session_maker = create_session_maker(engine)
+
+    async def run_queries(conn: AsyncConnection) -> bool:
+        try:
+            async with session_maker(bind=conn) as session:
+                for query in queries:
+                    await query(session)
+                await session.rollback()
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Can't warm up a connection to %s: %r", name, e)
+            return False
+        return True
+
+    try:
+        warmed = sum(await asyncio.gather(*(run_queries(conn) for conn in opened)))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in opened))
+
+    logger.info(
+        "Warmed up %d connections to %s in %.0f ms",
+        warmed,
+        name,
+        (time.perf_counter() - started_at) * 1000,
+    )
+    return warmed
@@ -0,0 +1,37 @@
+"""
+Sparse fieldsets: lists and details compute their costlier aggregates only
+when asked for.
+
+The aggregates are the fields of a schema with a default, the routes take
+their names in `fields`, comma separated or repeated. They are all computed
+when it's missing, and the others are always returned. Routes set
+`response_model_exclude_unset` so that the aggregates left out don't show
+up with their default.
+"""
+
+from typing import Annotated
+
+from fastapi import Query
+from pydantic import BaseModel
+
+Fields = Annotated[list[str] | None, Query()]
+
+
+def deferred_fields(model: type[BaseModel]) -> frozenset[str]:
+    """The aggregates of `model`, those left out unless requested"""
+    return frozenset(
+        name for name, field in model.model_fields.items() if not field.is_required()
+    )
+
+
+def select_fields(fields: list[str] | None, model: type[BaseModel]) -> frozenset[str]:
+    """The aggregates of `model` requested in `fields`, `ValueError` if unknown"""
+    if fields is None:
+        return deferred_fields(model)
+
+    names = {name.strip() for value in fields for name in value.split(",")}
+    names.discard("")
+    unknown = names - model.model_fields.keys()
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return frozenset(names) & deferred_fields(model)
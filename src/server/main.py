@@ -1,35 +1,213 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from starlette.middleware.cors import CORSMiddleware
 
-from .middlewares import AuthenticationMiddleware
+from .config import settings
+from .db import get_engines, page_views_partitions, replicas, shards
+from .db.warmup import WarmupQuery, warm_up_engine
+from .fields import select_fields
+from .middlewares import AuthenticationMiddleware, CancelOnDisconnectMiddleware
 from .routes.auth.routes import router as auth_router
+from .routes.internal.routes import router as internal_router
 from .routes.platform_stats.routes import router as platform_stats_router
 from .routes.quizes.routes import router as quizes_router
+from .routes.quizes.schemas import QuizDetailSchema, QuizSchema
+from .routes.quizes.services import list_quizes
 from .routes.students.routes import router as students_router
+from .routes.students.schemas import StudentDetailSchema, StudentSchema
+from .routes.students.services import list_students
 from .routes.users.routes import router as users_router
-from .state import redis
+from .state import (
+    import_password_hashing,
+    item_analysis_pool,
+    jwt_cache,
+    password_hashing,
+    redis,
+    revocations,
+    route_protection,
+)
 
-app = FastAPI()
 
-app.include_router(quizes_router, prefix="/quizes", tags=["quizes"])
-app.include_router(auth_router, prefix="/auth", tags=["auth"])
-app.include_router(users_router, prefix="/users", tags=["users"])
-app.include_router(
-    platform_stats_router,
-    prefix="/platform_stats",
-    tags=["platform_stats"],
-)
-app.include_router(
-    students_router,
-    prefix="/students",
-    tags=["students"],
-)
+# An arbitrary cursor, only its presence changes the statement
+WARMUP_CURSOR = (0, 0, 0)
 
-app.add_middleware(AuthenticationMiddleware, redis=redis)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Cheap versions of the hot read queries, the statements the routes build
+# when no `fields` are given: the first and next pages, and the details
+QUIZ_WARMUP_QUERIES: list[WarmupQuery] = [
+    *(
+        partial(
+            list_quizes,
+            limit=0,
+            after=after,
+            fields=select_fields(None, QuizSchema),
+        )
+        for after in (None, WARMUP_CURSOR)
+    ),
+    partial(
+        list_quizes,
+        ids=[0],
+        limit=0,
+        out_type=QuizDetailSchema,
+        fields=select_fields(None, QuizDetailSchema),
+    ),
+]
+STUDENT_WARMUP_QUERIES: list[WarmupQuery] = [
+    *(
+        partial(
+            list_students,
+            limit=0,
+            after=after,
+            fields=select_fields(None, StudentSchema),
+        )
+        for after in (None, WARMUP_CURSOR)
+    ),
+    partial(
+        list_students,
+        usernames=[""],
+        limit=0,
+        out_type=StudentDetailSchema,
+        fields=select_fields(None, StudentDetailSchema),
+    ),
+]
+
+
+def get_warmup_queries() -> list[WarmupQuery]:
+    # Sharded, the lists run other statements, mostly on the shards
+    if shards.enabled:
+        return []
+    return QUIZ_WARMUP_QUERIES + STUDENT_WARMUP_QUERIES
+
+
+async def warm_up() -> None:
+    # Shards only hold the event tables, their connections are just opened
+    shard_engines = {shard.engine for shard in shards.shards}
+    queries = get_warmup_queries()
+    await asyncio.gather(
+        *(
+            warm_up_engine(
+                name,
+                db_engine,
+                connections=settings.DB_WARMUP_CONNECTIONS,
+                queries=() if db_engine in shard_engines else queries,
+            )
+            for name, db_engine in get_engines().items()
+        )
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connections inherited from a parent process (e.g. a preloading
+    # server) belong to it, start each worker with empty pools
+    for db_engine in get_engines().values():
+        await db_engine.dispose(close=False)
+
+    await redis.start()
+    await revocations.start()
+    await replicas.start()
+    await page_views_partitions.start()
+    await warm_up()
+    yield
+    await page_views_partitions.stop()
+    await replicas.stop()
+    await revocations.stop()
+    await redis.aclose()
+    for db_engine in get_engines().values():
+        await db_engine.dispose()
+    password_hashing.shutdown()
+    import_password_hashing.shutdown()
+    item_analysis_pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Raised by statement_timeout
+QUERY_CANCELED_SQLSTATE = "57014"
+
+
+async def redis_error_handler(request: Request, exc: RedisError) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Service is temporarily unavailable"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+async def pool_timeout_handler(
+    request: Request,
+    exc: PoolTimeoutError,
+) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Database is busy, try again later"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+async def db_error_handler(request: Request, exc: DBAPIError) -> JSONResponse:
+    if getattr(exc.orig, "sqlstate", None) == QUERY_CANCELED_SQLSTATE:
+        return JSONResponse(
+            {"detail": "Query took too long"},
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        )
+    raise exc
+
+
+def create_app() -> FastAPI:
+    """
+    Builds the routes and middlewares. The engines, the Redis client and
+    the worker pools are those of `server.db` and `server.state`, created
+    at import and shared by every app of the process: the lifespan opens
+    and closes them, so serve a single app per process. Nothing here opens
+    a connection, pools are filled and warmed up by the lifespan, in the
+    process that serves the requests. Run with
+    `uvicorn --factory server.main:create_app` or use `app`.
+    """
+    app = FastAPI(lifespan=lifespan)
+
+    app.add_exception_handler(RedisError, redis_error_handler)
+    app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+    app.add_exception_handler(DBAPIError, db_error_handler)
+
+    app.include_router(quizes_router, prefix="/quizes", tags=["quizes"])
+    app.include_router(auth_router, prefix="/auth", tags=["auth"])
+    app.include_router(users_router, prefix="/users", tags=["users"])
+    app.include_router(
+        platform_stats_router,
+        prefix="/platform_stats",
+        tags=["platform_stats"],
+    )
+    app.include_router(
+        students_router,
+        prefix="/students",
+        tags=["students"],
+    )
+    app.include_router(
+        internal_router,
+        prefix="/internal",
+        tags=["internal"],
+    )
+
+    app.add_middleware(CancelOnDisconnectMiddleware)
+    app.add_middleware(
+        AuthenticationMiddleware,
+        redis=redis,
+        route_protection=route_protection,
+        jwt_cache=jwt_cache,
+        revocations=revocations,
+        failure_policy=settings.REDIS_FAILURE_POLICY,
+    )
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+
+app = create_app()
@@ -1,82 +1,96 @@
-from copy import copy
-from types import FunctionType
-from typing import Any, Callable
+import asyncio
+import logging
+from typing import Literal
 
-from fastapi import FastAPI, Request, Response
-from redis.asyncio import Redis
+from fastapi import Request, Response
+from redis.exceptions import RedisError
 from starlette import status
-from starlette.middleware.base import (
-    BaseHTTPMiddleware,
-    DispatchFunction,
-    RequestResponseEndpoint,
-)
 from starlette.responses import JSONResponse
-from starlette.routing import BaseRoute, Match
-from starlette.staticfiles import StaticFiles
-from starlette.types import ASGIApp, Scope
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from .authentication.schemas import AutheticatedUser
-from .authentication.utils import (
-    is_route_protected,
-    process_header,
-    set_user,
+from .authentication.protection import RouteProtectionIndex
+from .authentication.revocation import (
+    RevocationMirror,
+    get_token_generation,
+    is_token_revoked,
 )
+from .authentication.schemas import AutheticatedUser
+from .authentication.utils import process_header, set_user
 from .config import settings
-from .routes.auth.jwt import InvalidJwtTokenException, validate_jwt_token
+from .redis_sharding import RedisClient
+from .routes.auth.jwt import (
+    InvalidJwtTokenException,
+    JwtPayload,
+    JwtValidationCache,
+    get_token_id,
+    validate_jwt_token,
+)
 
+logger = logging.getLogger(__name__)
 
-def match_routes(routes: list[BaseRoute], scope: Scope) -> FunctionType | None:
-    """Find route function by given routes list and request's scope"""
 
-    for route in routes:
-        match, child_scope = route.matches(scope)
-        if match != Match.FULL:
-            continue
+class AuthenticationMiddleware:
+    """
+    Pure ASGI middleware guarding routes marked with `protected_route`.
 
-        scope.update(child_scope)
-        endpoint: FastAPI | FunctionType = scope["endpoint"]
+    Unlike `BaseHTTPMiddleware` it doesn't spawn a task and a memory stream
+    per request, so protected and public routes only pay for the auth check
+    itself and streaming responses are passed through untouched.
 
-        if isinstance(endpoint, FunctionType):
-            return endpoint
-        elif isinstance(endpoint, StaticFiles):
-            continue
-        else:
-            return match_routes(endpoint.routes, scope)
+    Whether a route is protected is answered by a `RouteProtectionIndex`,
+    compiled on application startup. Call its `invalidate` method after
+    changing the routes of a running application.
 
+    When a `JwtValidationCache` is given, tokens seen before skip the
+    signature verification. The revocation check runs either way: against
+    the in-process `RevocationMirror` when it's in sync, otherwise against
+    Redis.
 
-def _resolve_route(request: Request) -> Callable[..., Any] | None:
-    """
-    Find an endpoint function based on the request based.
-    It's mainly useful in middlewares where endpoint function is not available
-    right away.
+    If Redis can't be reached and the mirror isn't in sync, `failure_policy`
+    decides: "closed" rejects the request with 503, "open" lets it through
+    without the revocation check.
     """
 
-    app: FastAPI = request.app
-    try:
-        return request.state._route
-    except AttributeError:
-        request.state._route = match_routes(app.routes, copy(request.scope))
-        return request.state._route
-
-
-class AuthenticationMiddleware(BaseHTTPMiddleware):
     def __init__(
         self,
         app: ASGIApp,
-        redis: Redis,
-        dispatch: DispatchFunction | None = None,
+        redis: RedisClient,
+        route_protection: RouteProtectionIndex | None = None,
+        jwt_cache: JwtValidationCache | None = None,
+        revocations: RevocationMirror | None = None,
+        failure_policy: Literal["open", "closed"] = "closed",
     ) -> None:
+        self.app = app
         self._redis = redis
-        super().__init__(app, dispatch)
+        self._failure_policy = failure_policy
+        self._jwt_cache = jwt_cache
+        self._revocations = revocations
+        self.route_protection = route_protection or RouteProtectionIndex()
 
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: RequestResponseEndpoint,
-    ) -> Response:
-        route = _resolve_route(request)
-        if route is None or not is_route_protected(route):
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            self.route_protection.build(scope["app"].routes)
+
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response = await self.authenticate(Request(scope, receive))
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    async def authenticate(self, request: Request) -> Response | None:
+        """
+        Authenticate the request, returning an error response if it should
+        not reach the endpoint.
+        """
+
+        routes = request.app.routes
+        if not self.route_protection.is_protected(routes, request.scope):
+            return None
 
         auth_header_value = request.headers.get("Authorization")
         if auth_header_value is None:
@@ -94,14 +108,32 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
             )
 
         try:
-            payload = validate_jwt_token(token=token, jwt_secret=settings.JWT_SECRET)
+            if self._jwt_cache is not None:
+                payload = self._jwt_cache.validate(token)
+            else:
+                payload = validate_jwt_token(
+                    token=token,
+                    jwt_secret=settings.JWT_SECRET,
+                )
         except InvalidJwtTokenException as e:
             return JSONResponse(
                 {"detail": str(e)},
                 status_code=status.HTTP_401_UNAUTHORIZED,
             )
 
-        if await self._redis.get(f"revoked:{token}") is not None:
+        token_id = get_token_id(token, payload)
+        try:
+            is_revoked = await self.is_revoked(token_id, payload)
+        except RedisError as e:
+            if self._failure_policy == "closed":
+                return JSONResponse(
+                    {"detail": "Authentication is temporarily unavailable"},
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
+            logger.warning("Skipping the revocation check: %r", e)
+            is_revoked = False
+
+        if is_revoked:
             return JSONResponse(
                 {"detail": "JWT token is revoked"},
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -109,7 +141,78 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
 
         set_user(
             request=request,
-            user=AutheticatedUser(username=payload["username"], token=token),
+            user=AutheticatedUser(
+                username=payload["username"],
+                token=token,
+                token_id=token_id,
+                expires_at=payload["exp"],
+            ),
+        )
+
+        return None
+
+    async def is_revoked(self, token_id: str, payload: JwtPayload) -> bool:
+        if await is_token_revoked(self._redis, token_id, self._revocations):
+            return True
+
+        generation = await get_token_generation(
+            self._redis,
+            payload["username"],
+            self._revocations,
         )
+        return payload.get("gen", 0) < generation
 
-        return await call_next(request)
+
+class CancelOnDisconnectMiddleware:
+    """
+    Cancels the request handler when the client disconnects before the
+    response is complete, so in-flight queries get cancelled too (asyncpg
+    sends a cancel request to the server) and connections are released.
+
+    Request body messages are handed over one at a time, keeping the
+    backpressure of streamed uploads. Nothing is cancelled once the
+    response is complete, background tasks run to the end.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        messages: asyncio.Queue[Message] = asyncio.Queue(maxsize=1)
+        response_complete = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_complete
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                response_complete = True
+
+        handler = asyncio.create_task(self.app(scope, messages.get, send_wrapper))
+
+        async def watch_disconnect() -> None:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    if not response_complete:
+                        handler.cancel()
+                    if not messages.full():
+                        messages.put_nowait(message)
+                    return
+                await messages.put(message)
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            current_task = asyncio.current_task()
+            if current_task is not None and current_task.cancelling():
+                raise
+            logger.info("Client disconnected, cancelled %s", scope["path"])
+        finally:
+            watcher.cancel()
@@ -0,0 +1,37 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor holds the sort key of the last row of a page, the next page seeks
+right after it instead of counting rows from the start. Lists return the
+cursor of their next page in the `X-Next-Cursor` header when the page is
+full.
+"""
+
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_key: Sequence[int]) -> str:
+    payload = json.dumps(list(sort_key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> tuple[int, ...]:
+    """The sort key of `size` integers in `cursor`, `ValueError` if invalid"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_key = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise ValueError("Invalid cursor") from error
+
+    if (
+        not isinstance(sort_key, list)
+        or len(sort_key) != size
+        or not all(type(value) is int for value in sort_key)
+    ):
+        raise ValueError("Invalid cursor")
+    return tuple(sort_key)
@@ -0,0 +1,244 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+from collections import defaultdict
+from collections.abc import AsyncIterator, Mapping, Sequence
+from typing import Any
+
+from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+from redis.exceptions import ConnectionError, RedisError, TimeoutError
+
+logger = logging.getLogger(__name__)
+
+VIRTUAL_NODES = 160
+
+
+class RedisNodeUnavailable(RedisError):
+    pass
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8])
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to node names"""
+
+    def __init__(
+        self, names: Sequence[str], virtual_nodes: int = VIRTUAL_NODES
+    ) -> None:
+        points = sorted(
+            (_hash(f"{name}#{i}"), name) for name in names for i in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def get(self, key: str) -> str:
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._names[index]
+
+
+class ShardedRedis:
+    """
+    Spreads keys over several independent Redis nodes with consistent hashing.
+
+    Only the commands used by the application are implemented. Nodes are
+    pinged every `health_check_interval` seconds; commands routed to a node
+    that is known to be down fail right away with `RedisNodeUnavailable`
+    instead of waiting for the socket timeout, what happens then is up to
+    the caller's failure policy.
+
+    Subscriptions go to the first healthy node and stay there while it's up,
+    messages are published on every healthy node. Subscribers use
+    `pubsub_nodes` when given, clients to the same nodes without a read
+    timeout: they wait for messages as long as it takes.
+    """
+
+    def __init__(
+        self,
+        nodes: Mapping[str, Redis],
+        health_check_interval: float = 5,
+        pubsub_nodes: Mapping[str, Redis] | None = None,
+    ) -> None:
+        self._nodes = dict(nodes)
+        self._pubsub_nodes = dict(pubsub_nodes) if pubsub_nodes is not None else {}
+        self._ring = HashRing(list(self._nodes))
+        self._healthy = {name: True for name in self._nodes}
+        self._health_check_interval = health_check_interval
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def nodes(self) -> list[Redis]:
+        return list(self._nodes.values())
+
+    def is_healthy(self, name: str) -> bool:
+        return self._healthy[name]
+
+    def _set_health(self, name: str, healthy: bool) -> None:
+        if self._healthy[name] != healthy:
+            logger.warning("Redis node %s is %s", name, "up" if healthy else "down")
+        self._healthy[name] = healthy
+
+    def _get_node(self, name: str) -> Redis:
+        if not self._healthy[name]:
+            raise RedisNodeUnavailable(f"Redis node {name} is down")
+        return self._nodes[name]
+
+    async def _execute(self, name: str, command: str, *args: Any, **kwargs: Any) -> Any:
+        node = self._get_node(name)
+        try:
+            return await getattr(node, command)(*args, **kwargs)
+        except (ConnectionError, TimeoutError):
+            self._set_health(name, False)
+            raise
+
+    async def get(self, name: str) -> Any:
+        return await self._execute(self._ring.get(name), "get", name)
+
+    async def set(self, name: str, value: Any, **kwargs: Any) -> Any:
+        return await self._execute(self._ring.get(name), "set", name, value, **kwargs)
+
+    async def incr(self, name: str, amount: int = 1) -> int:
+        return await self._execute(self._ring.get(name), "incr", name, amount)
+
+    async def delete(self, *names: str) -> int:
+        return sum(
+            await asyncio.gather(
+                *(self._execute(self._ring.get(name), "delete", name) for name in names)
+            )
+        )
+
+    async def mget(self, keys: Sequence[str]) -> list[Any]:
+        by_node: defaultdict[str, list[str]] = defaultdict(list)
+        for key in keys:
+            by_node[self._ring.get(key)].append(key)
+
+        values: dict[str, Any] = {}
+        for node_name, node_keys in by_node.items():
+            node_values = await self._execute(node_name, "mget", node_keys)
+            values.update(zip(node_keys, node_values))
+        return [values[key] for key in keys]
+
+    def pubsub_node_name(self) -> str:
+        """The node new subscriptions go to"""
+        for name, healthy in self._healthy.items():
+            if healthy:
+                return name
+        raise RedisNodeUnavailable("All Redis nodes are down")
+
+    async def publish(self, channel: str, message: Any) -> int:
+        """
+        Publish on every healthy node, subscribers may have joined any of
+        them while the others were down. Fails when no node could publish.
+        """
+        names = [name for name, healthy in self._healthy.items() if healthy]
+        if not names:
+            raise RedisNodeUnavailable("All Redis nodes are down")
+
+        results = await asyncio.gather(
+            *(self._execute(name, "publish", channel, message) for name in names),
+            return_exceptions=True,
+        )
+        receivers = [result for result in results if isinstance(result, int)]
+        if not receivers:
+            raise results[0]
+        return sum(receivers)
+
+    def pubsub(self, node_name: str | None = None, **kwargs: Any) -> PubSub:
+        name = node_name if node_name is not None else self.pubsub_node_name()
+        return self._pubsub_nodes.get(name, self._nodes[name]).pubsub(**kwargs)
+
+    async def scan_iter(self, match: str | None = None) -> AsyncIterator[Any]:
+        for name in self._nodes:
+            node = self._get_node(name)
+            async for key in node.scan_iter(match):
+                yield key
+
+    async def check_health(self) -> None:
+        async def ping(name: str, node: Redis) -> None:
+            try:
+                await node.ping()
+            except (RedisError, OSError):
+                self._set_health(name, False)
+            else:
+                self._set_health(name, True)
+
+        await asyncio.gather(*(ping(name, node) for name, node in self._nodes.items()))
+
+    async def _run_health_checks(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self._health_check_interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_health_checks())
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for node in [*self._nodes.values(), *self._pubsub_nodes.values()]:
+            await node.aclose()
+
+
+type RedisClient = Redis | ShardedRedis
+
+
+def get_nodes(redis: RedisClient) -> list[Redis]:
+    """Physical nodes behind the client, for per-node operations like SCAN"""
+
+    return redis.nodes if isinstance(redis, ShardedRedis) else [redis]
+
+
+def open_pubsub(redis: RedisClient) -> tuple[PubSub, str | None]:
+    """A pub/sub on the client, and the name of its node when sharded"""
+
+    if isinstance(redis, ShardedRedis):
+        node_name = redis.pubsub_node_name()
+        return redis.pubsub(node_name), node_name
+    return redis.pubsub(), None
+
+
+def is_node_healthy(redis: RedisClient, node_name: str | None) -> bool:
+    return not isinstance(redis, ShardedRedis) or redis.is_healthy(node_name)
+
+
+def create_redis(
+    urls: Sequence[str],
+    max_connections: int,
+    socket_timeout: float,
+    health_check_interval: float,
+) -> ShardedRedis:
+    return ShardedRedis(
+        {
+            url: Redis.from_url(
+                url,
+                max_connections=max_connections,
+                socket_timeout=socket_timeout,
+                socket_connect_timeout=socket_timeout,
+            )
+            for url in urls
+        },
+        health_check_interval=health_check_interval,
+        # Subscribers idle between messages, a read timeout would drop them.
+        # Their connections are pinged instead.
+        pubsub_nodes={
+            url: Redis.from_url(
+                url,
+                max_connections=max_connections,
+                socket_timeout=None,
+                socket_connect_timeout=socket_timeout,
+                socket_keepalive=True,
+                health_check_interval=health_check_interval,
+            )
+            for url in urls
+        },
+    )
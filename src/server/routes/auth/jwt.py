@@ -1,7 +1,16 @@
-from datetime import datetime, timedelta, timezone
-from typing import TypedDict, cast
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, NotRequired, TypedDict, cast
 
-from jose import JWTError, jwt
+TOKEN_LIFETIME_SECONDS = 24 * 60 * 60
 
 
 class InvalidJwtTokenException(Exception):
@@ -11,28 +20,159 @@ class InvalidJwtTokenException(Exception):
 class JwtPayload(TypedDict):
     username: str
     exp: int
+    # Tokens issued before the claims were introduced don't have them
+    jti: NotRequired[str]
+    gen: NotRequired[int]
 
 
-def generate_jwt(username: str, jwt_secret: str) -> str:
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class Hs256Codec:
+    """
+    HS256-only JWT encoder/decoder.
+
+    The HMAC key schedule and the encoded header are computed once per
+    secret, so encoding and decoding only hash the signing input and
+    (de)serialize the claims. Produced tokens are byte-identical to
+    `jose.jwt.encode(claims, secret, algorithm="HS256")`.
+    """
+
+    HEADER = _b64encode(
+        json.dumps(
+            {"alg": "HS256", "typ": "JWT"},
+            separators=(",", ":"),
+            sort_keys=True,
+        ).encode()
+    )
+
+    def __init__(self, secret: str) -> None:
+        self._hmac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        self._header = self.HEADER.decode()
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._hmac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: Mapping[str, Any]) -> str:
+        signing_input = b".".join(
+            (
+                self.HEADER,
+                _b64encode(json.dumps(claims, separators=(",", ":")).encode()),
+            )
+        )
+        signature = _b64encode(self._sign(signing_input))
+        return b".".join((signing_input, signature)).decode()
+
+    def decode(self, token: str) -> dict[str, Any]:
+        """Verify the signature and the time claims, returning the claims"""
+
+        if token.count(".") != 2:
+            raise InvalidJwtTokenException("Invalid JWT token")
+
+        signing_input, _, crypto_segment = token.rpartition(".")
+        header_segment, _, claims_segment = signing_input.partition(".")
+        try:
+            if header_segment != self._header:
+                header = json.loads(_b64decode(header_segment))
+                if not isinstance(header, dict) or header.get("alg") != "HS256":
+                    raise InvalidJwtTokenException("Invalid JWT token")
+
+            signature = _b64decode(crypto_segment)
+            if not hmac.compare_digest(signature, self._sign(signing_input.encode())):
+                raise InvalidJwtTokenException("Invalid JWT token")
+
+            claims = json.loads(_b64decode(claims_segment))
+            if not isinstance(claims, dict):
+                raise InvalidJwtTokenException("Invalid JWT token")
+
+            exp = int(claims["exp"])
+            nbf = int(claims.get("nbf", 0))
+        except (KeyError, TypeError, ValueError, binascii.Error) as e:
+            raise InvalidJwtTokenException("Invalid JWT token") from e
+
+        now = int(time.time())
+        if exp < now:
+            raise InvalidJwtTokenException("JWT token has expired")
+        if nbf > now:
+            raise InvalidJwtTokenException("JWT token is not yet valid")
+
+        return claims
+
+
+@lru_cache(maxsize=8)
+def get_codec(jwt_secret: str) -> Hs256Codec:
+    return Hs256Codec(jwt_secret)
+
+
+def generate_jwt(username: str, jwt_secret: str, generation: int = 0) -> str:
     payload: JwtPayload = {
         "username": username,
-        "exp": int((datetime.now(timezone.utc) + timedelta(days=1)).timestamp()),
+        "exp": int(time.time()) + TOKEN_LIFETIME_SECONDS,
+        "jti": secrets.token_urlsafe(12),
+        "gen": generation,
     }
-    return jwt.encode(claims=payload, key=jwt_secret, algorithm="HS256")  # type: ignore[reportArgumentType]
+    return get_codec(jwt_secret).encode(payload)
 
 
 def validate_jwt_token(token: str, jwt_secret: str) -> JwtPayload:
-    try:
-        payload = cast(
-            JwtPayload,
-            jwt.decode(token=token, key=jwt_secret, algorithms=["HS256"]),
-        )
-    except JWTError as e:
-        raise InvalidJwtTokenException("Invalid JWT token") from e
+    return cast(JwtPayload, get_codec(jwt_secret).decode(token))
+
+
+def get_token_id(token: str, payload: JwtPayload) -> str:
+    """
+    Short identifier of the token used for revocation. Legacy tokens without
+    `jti` claim are identified by the whole token.
+    """
+
+    return payload.get("jti", token)
+
+
+class JwtValidationCache:
+    """
+    Bounded LRU cache of validated JWT payloads.
+
+    Entries are keyed by a digest of the token and are dropped once the
+    token's `exp` is reached. Only the signature and expiry validation is
+    cached, callers still have to check whether the token is revoked.
+    """
+
+    def __init__(self, jwt_secret: str, maxsize: int = 10_000) -> None:
+        self.jwt_secret = jwt_secret
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, JwtPayload] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def validate(self, token: str) -> JwtPayload:
+        key = self._key(token)
+        payload = self._entries.get(key)
+        if payload is not None:
+            if payload["exp"] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+            del self._entries[key]
 
-    if payload["exp"] <= int(
-        (datetime.now(timezone.utc) - timedelta(days=1)).timestamp()
-    ):
-        raise InvalidJwtTokenException("JWT token has expired")
+        self.misses += 1
+        payload = validate_jwt_token(token=token, jwt_secret=self.jwt_secret)
+        self._entries[key] = payload
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return payload
 
-    return payload
+    def evict(self, token: str) -> None:
+        self._entries.pop(self._key(token), None)
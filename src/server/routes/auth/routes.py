@@ -1,15 +1,18 @@
-import hashlib
-
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from sqlalchemy import sql
 from starlette import status
 
+from server.authentication.revocation import (
+    get_token_generation,
+    revoke_token,
+    revoke_user_tokens,
+)
 from server.authentication.utils import User, protected_route
 from server.config import settings
 from server.db import DbSession
 from server.db.models import User as UserTable
-from server.state import redis
+from server.state import jwt_cache, password_hashing, redis, revocations
 
 from .jwt import generate_jwt
 from .schemas import LoginBody, LoginResponse
@@ -33,12 +36,21 @@ async def login(db_session: DbSession, body: LoginBody):
         )
 
     (password, role) = data
-    if hashlib.sha256(body.password.encode()).hexdigest() != password:
+    is_valid, needs_rehash = await password_hashing.verify(body.password, password)
+    if not is_valid:
         return JSONResponse(
             {"detail": "Invalid password"},
             status_code=status.HTTP_401_UNAUTHORIZED,
         )
 
+    if needs_rehash:
+        await db_session.execute(
+            sql.update(UserTable)
+            .where(UserTable.username == body.username)
+            .values(password=await password_hashing.hash(body.password))
+        )
+        await db_session.commit()
+
     if role != "editor":
         return JSONResponse(
             {"detail": "Only editors are allowed to login"},
@@ -49,6 +61,11 @@ async def login(db_session: DbSession, body: LoginBody):
         access_token=generate_jwt(
             username=body.username,
             jwt_secret=settings.JWT_SECRET,
+            generation=await get_token_generation(
+                redis,
+                body.username,
+                revocations,
+            ),
         )
     )
 
@@ -56,4 +73,15 @@ async def login(db_session: DbSession, body: LoginBody):
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
 @protected_route
 async def logout(user: User):
-    await redis.set(name=f"revoked:{user.token}", value="1", ex=86400)
+    await revoke_token(
+        redis=redis,
+        token_id=user.token_id,
+        expires_at=user.expires_at,
+    )
+    jwt_cache.evict(user.token)
+
+
+@router.post("/logout_all", status_code=status.HTTP_204_NO_CONTENT)
+@protected_route
+async def logout_all(user: User):
+    await revoke_user_tokens(redis=redis, username=user.username)
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+
+from server.authentication.utils import protected_route
+
+from . import services
+from .schemas import Metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_model=Metrics)
+@protected_route
+async def get_metrics():
+    return services.get_metrics()
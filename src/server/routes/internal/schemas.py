@@ -0,0 +1,60 @@
+from pydantic import BaseModel
+
+
+class JwtCacheStats(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+
+
+class RevocationMirrorStats(BaseModel):
+    ready: bool
+    size: int
+
+
+class PasswordHashingStats(BaseModel):
+    max_workers: int
+    waiting: int
+    in_progress: int
+    completed: int
+    queue_time_total_sec: float
+    queue_time_max_sec: float
+
+
+class ReplicaStats(BaseModel):
+    name: str
+    lag_sec: float | None
+    available: bool
+
+
+class DbPoolStats(BaseModel):
+    name: str
+    size: int
+    in_use: int
+    idle: int
+    overflow: int
+    checkouts: int
+    checkout_wait_total_sec: float
+    checkout_wait_max_sec: float
+    connects: int
+    invalidations: int
+    soft_invalidations: int
+    statement_cache_hits: int
+    statement_cache_misses: int
+
+
+class ConnectionHoldStats(BaseModel):
+    route: str
+    count: int
+    total_sec: float
+    max_sec: float
+
+
+class Metrics(BaseModel):
+    jwt_cache: JwtCacheStats
+    revocation_mirror: RevocationMirrorStats
+    password_hashing: PasswordHashingStats
+    replicas: list[ReplicaStats]
+    db_pools: list[DbPoolStats]
+    db_connection_hold: list[ConnectionHoldStats]
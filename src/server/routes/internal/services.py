@@ -0,0 +1,80 @@
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from server.db import get_engines, replicas
+from server.db.pool import InstrumentedPool
+from server.db.sessions import connection_hold_times
+from server.state import jwt_cache, password_hashing, revocations
+
+from .schemas import (
+    ConnectionHoldStats,
+    DbPoolStats,
+    JwtCacheStats,
+    Metrics,
+    PasswordHashingStats,
+    ReplicaStats,
+    RevocationMirrorStats,
+)
+
+
+def get_pool_stats(name: str, db_engine: AsyncEngine) -> DbPoolStats:
+    pool = db_engine.pool
+    assert isinstance(pool, InstrumentedPool)
+    return DbPoolStats(
+        name=name,
+        size=pool.size(),
+        in_use=pool.checkedout(),
+        idle=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        checkouts=pool.stats.checkouts,
+        checkout_wait_total_sec=pool.stats.checkout_wait_total,
+        checkout_wait_max_sec=pool.stats.checkout_wait_max,
+        connects=pool.stats.connects,
+        invalidations=pool.stats.invalidations,
+        soft_invalidations=pool.stats.soft_invalidations,
+        statement_cache_hits=pool.stats.statement_cache_hits,
+        statement_cache_misses=pool.stats.statement_cache_misses,
+    )
+
+
+def get_metrics() -> Metrics:
+    available = replicas.get_available()
+    return Metrics(
+        jwt_cache=JwtCacheStats(
+            size=len(jwt_cache),
+            maxsize=jwt_cache.maxsize,
+            hits=jwt_cache.hits,
+            misses=jwt_cache.misses,
+        ),
+        revocation_mirror=RevocationMirrorStats(
+            ready=revocations.ready,
+            size=len(revocations),
+        ),
+        password_hashing=PasswordHashingStats(
+            max_workers=password_hashing.max_workers,
+            waiting=password_hashing.waiting,
+            in_progress=password_hashing.in_progress,
+            completed=password_hashing.completed,
+            queue_time_total_sec=password_hashing.queue_time_total,
+            queue_time_max_sec=password_hashing.queue_time_max,
+        ),
+        replicas=[
+            ReplicaStats(
+                name=replica.name,
+                lag_sec=replica.lag,
+                available=replica in available,
+            )
+            for replica in replicas.replicas
+        ],
+        db_pools=[
+            get_pool_stats(name, db_engine) for name, db_engine in get_engines().items()
+        ],
+        db_connection_hold=[
+            ConnectionHoldStats(
+                route=route,
+                count=stats.count,
+                total_sec=stats.total,
+                max_sec=stats.max,
+            )
+            for route, stats in connection_hold_times.routes.items()
+        ],
+    )
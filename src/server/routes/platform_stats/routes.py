@@ -5,7 +5,7 @@ from starlette import status
 from starlette.responses import JSONResponse
 
 from server.authentication.utils import protected_route
-from server.db import DbSession
+from server.db import ReadOnlyDbSession, shards
 
 from . import services
 from .schemas import DailyPlatformStats, PlatformStats
@@ -15,14 +15,14 @@ router = APIRouter()
 
 @router.get("")
 @protected_route
-async def get_platform_stats(db_session: DbSession) -> PlatformStats:
-    return await services.get_platform_stats(db_session)
+async def get_platform_stats(db_session: ReadOnlyDbSession) -> PlatformStats:
+    return await services.get_platform_stats(db_session, shards)
 
 
 @router.get("/daily_distribution", response_model=list[DailyPlatformStats])
 @protected_route
 async def get_daily_platform_stats_distribution(
-    db_session: DbSession,
+    db_session: ReadOnlyDbSession,
     start_date: date,
     end_date: date,
     limit: int = 50,
@@ -40,4 +40,5 @@ async def get_daily_platform_stats_distribution(
         end_date=end_date,
         limit=limit,
         offset=offset,
+        shards=shards,
     )
@@ -4,7 +4,7 @@ from pydantic import BaseModel
 
 
 class PlatformStats(BaseModel):
-    most_popular_page: str
+    most_popular_page: str | None
     monthly_active_users_count: int
     current_online_users_count: int
 
@@ -1,34 +1,109 @@
+from collections import Counter
+from collections.abc import Sequence
 from datetime import date, datetime, timedelta
 
-from pydantic import TypeAdapter
-from sqlalchemy import func, select, sql
+from sqlalchemy import Select, desc, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from server.db.models import PageView
+from server.db.shards import UNSHARDED, ShardSet
 
 from .schemas import DailyPlatformStats, PlatformStats
 
 
-async def get_platform_stats(db_session: AsyncSession) -> PlatformStats:
-    query = sql.select(
-        (
-            sql.select(PageView.url)
-            .group_by(PageView.url)
-            .order_by(func.count(PageView.id).desc())
-            .limit(1)
-            .subquery()
-        ),
-        (
-            sql.select(func.count(func.distinct(PageView.user_id)))
-            .where(PageView.created_at >= datetime.now() - timedelta(days=30))
-            .subquery()
-        ),
+# Most viewed urls each shard sends for the most popular page, usually
+# enough to tell it without counting every url
+TOP_URLS_PER_SHARD = 10
+
+
+def views_per_url_query(limit: int | None) -> Select:
+    """The `limit` most viewed urls with their views, all of them when None"""
+    views = func.count(PageView.id).label("views")
+    return (
+        select(PageView.url, views)
+        .group_by(PageView.url)
+        # Ties go to the first url, whatever the order of the shards
+        .order_by(desc(views), PageView.url)
+        .limit(limit)
     )
-    cursor_result = await db_session.execute(query)
-    most_popular_page, monthly_active_users = cursor_result.tuples().one()
+
+
+def get_most_popular_page(
+    views_per_shard: Sequence[Sequence[tuple[str, int]]],
+    limit: int | None,
+) -> str | None:
+    """
+    The most viewed url given the `views_per_url_query(limit)` of every
+    shard. A url missing from a full list has at most the views of its
+    last url there. `LookupError` when those bounds let another url, listed
+    or not, reach the views of the first one.
+    """
+    if len(views_per_shard) == 1:
+        # Ranked by the query already
+        [views_per_url] = views_per_shard
+        return views_per_url[0][0] if views_per_url else None
+
+    listed = [dict(views_per_url) for views_per_url in views_per_shard]
+    views = Counter[str]()
+    for shard_views in listed:
+        views.update(shard_views)
+    most_popular_page = min(views, key=lambda url: (-views[url], url), default=None)
+    if most_popular_page is None:
+        return None
+
+    bounds = [
+        views_per_url[-1][1] if limit is not None and len(views_per_url) == limit else 0
+        for views_per_url in views_per_shard
+    ]
+    most_views = views[most_popular_page]
+    if sum(bounds) >= most_views:
+        raise LookupError("A url left out may have the most views")
+    for url in views.keys() - {most_popular_page}:
+        max_views = views[url] + sum(
+            bound
+            for bound, shard_views in zip(bounds, listed)
+            if url not in shard_views
+        )
+        if (-max_views, url) < (-most_views, most_popular_page):
+            raise LookupError(f"{url} may have the most views")
+    return most_popular_page
+
+
+async def get_platform_stats(
+    db_session: AsyncSession,
+    shards: ShardSet = UNSHARDED,
+) -> PlatformStats:
+    since = datetime.now() - timedelta(days=30)
+    # Without shards, SQL finds the most popular page alone
+    limit = TOP_URLS_PER_SHARD if shards.enabled else 1
+
+    async def get_partial(session: AsyncSession) -> tuple[list[tuple[str, int]], int]:
+        views_per_url = await session.execute(views_per_url_query(limit))
+        monthly_active_users = await session.scalar(
+            select(func.count(func.distinct(PageView.user_id))).where(
+                PageView.created_at >= since
+            )
+        )
+        return views_per_url.tuples().all(), monthly_active_users or 0
+
+    async def get_views_per_url(session: AsyncSession) -> list[tuple[str, int]]:
+        return (await session.execute(views_per_url_query(None))).tuples().all()
+
+    partials = await shards.scatter(db_session, get_partial)
+    try:
+        most_popular_page = get_most_popular_page(
+            [views_per_url for views_per_url, _ in partials], limit
+        )
+    except LookupError:
+        # Too close to tell from the top urls, count them all
+        most_popular_page = get_most_popular_page(
+            await shards.scatter(db_session, get_views_per_url), None
+        )
+
     return PlatformStats(
         most_popular_page=most_popular_page,
-        monthly_active_users_count=monthly_active_users,
+        # A user's page views are all on one shard
+        monthly_active_users_count=sum(active for _, active in partials),
         current_online_users_count=1,
     )
 
@@ -39,20 +114,43 @@ async def get_daily_platform_stats_distribution(
     end_date: date,
     limit: int = 50,
     offset: int = 0,
+    shards: ShardSet = UNSHARDED,
 ) -> list[DailyPlatformStats]:
+    created_day = func.date(PageView.created_at)
     query = (
         select(
-            func.date(PageView.created_at).label("day"),
+            created_day.label("day"),
             func.count(PageView.id).label("page_views"),
             func.count(func.distinct(PageView.user_id)).label("active_users"),
         )
-        .where(PageView.created_at.between(start_date, end_date))
-        .group_by(func.date(PageView.created_at))
-        .order_by(func.date(PageView.created_at))
-        .limit(limit)
-        .offset(offset)
+        # Half-open, so end_date is counted in full. Plain comparisons on
+        # created_at let the planner skip the partitions out of range.
+        .where(
+            PageView.created_at >= start_date,
+            PageView.created_at < end_date + timedelta(days=1),
+        )
+        .group_by(created_day)
+        .order_by(created_day)
+        # The first days overall are among the first days of every shard
+        .limit(offset + limit)
     )
 
-    cursor_result = await db_session.execute(query)
-    ta = TypeAdapter(list[DailyPlatformStats])
-    return ta.validate_python(cursor_result.mappings().all())
+    async def get_partial(session: AsyncSession) -> list[tuple[date, int, int]]:
+        return (await session.execute(query)).tuples().all()
+
+    page_views = Counter[date]()
+    active_users = Counter[date]()
+    for partial in await shards.scatter(db_session, get_partial):
+        for partial_day, views, users in partial:
+            page_views[partial_day] += views
+            # A user's page views are all on one shard
+            active_users[partial_day] += users
+
+    return [
+        DailyPlatformStats(
+            day=day,
+            page_views=page_views[day],
+            active_users=active_users[day],
+        )
+        for day in sorted(page_views)[offset : offset + limit]
+    ]
@@ -1,48 +1,104 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Path
+from fastapi import APIRouter, Path, Query, Response
 from starlette import status
 from starlette.responses import JSONResponse
 
 from server.authentication.utils import protected_route
-from server.db import DbSession
+from server.db import ReadOnlyDbSession, shards
+from server.fields import Fields, select_fields
+from server.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from server.schemas import SuccessThreshold
+from server.state import item_analysis_pool
 
 from . import services
-from .schemas import QuizDetailSchema, QuizSchema, QuizStats
+from .schemas import (
+    QuizDetailSchema,
+    QuizItemAnalysis,
+    QuizSchema,
+    QuizScoreDistribution,
+    QuizStats,
+)
 
 router = APIRouter()
 
 
-@router.get("", response_model=list[QuizSchema])
+@router.get("", response_model=list[QuizSchema], response_model_exclude_unset=True)
 @protected_route
 async def list_quizes(
-    db_session: DbSession,
+    db_session: ReadOnlyDbSession,
+    response: Response,
     limit: int = 20,
     offset: int = 0,
+    cursor: str | None = None,
+    success_threshold: SuccessThreshold = 0.2,
+    fields: Fields = None,
 ):
-    return await services.list_quizes(
+    try:
+        after = decode_cursor(cursor, 3) if cursor else None
+        selected_fields = select_fields(fields, QuizSchema)
+    except ValueError as error:
+        return JSONResponse(
+            {"detail": str(error)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    quizes = await services.list_quizes(
         db_session=db_session,
+        success_threshold=success_threshold,
         limit=limit,
         offset=offset,
+        after=after,
+        fields=selected_fields,
+        shards=shards,
     )
 
+    if quizes and len(quizes) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            services.sort_key(quizes[-1])
+        )
+
+    return quizes
+
 
 @router.get("/stats", response_model=QuizStats)
 @protected_route
 async def get_quiz_stats(
-    db_session: DbSession,
-    ids: list[int] | None = None,
+    db_session: ReadOnlyDbSession,
+    ids: Annotated[list[int] | None, Query()] = None,
+    success_threshold: SuccessThreshold = 0.2,
 ):
-    return await services.get_quiz_stats(db_session=db_session, ids=ids)
+    return await services.get_quiz_stats(
+        db_session=db_session,
+        ids=ids,
+        success_threshold=success_threshold,
+        shards=shards,
+    )
 
 
-@router.get("/{id}", response_model=QuizDetailSchema)
+@router.get("/{id}", response_model=QuizDetailSchema, response_model_exclude_unset=True)
 @protected_route
-async def get_quiz(db_session: DbSession, id: Annotated[int, Path()]):
+async def get_quiz(
+    db_session: ReadOnlyDbSession,
+    id: Annotated[int, Path()],
+    success_threshold: SuccessThreshold = 0.2,
+    fields: Fields = None,
+):
+    try:
+        selected_fields = select_fields(fields, QuizDetailSchema)
+    except ValueError as error:
+        return JSONResponse(
+            {"detail": str(error)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
     quizes = await services.list_quizes(
         db_session=db_session,
         ids=[id],
+        success_threshold=success_threshold,
         out_type=QuizDetailSchema,
+        fields=selected_fields,
+        shards=shards,
     )
 
     if not quizes:
@@ -52,3 +108,46 @@ async def get_quiz(db_session: DbSession, id: Annotated[int, Path()]):
         )
 
     return quizes[0]
+
+
+@router.get("/{id}/score_distribution", response_model=QuizScoreDistribution)
+@protected_route
+async def get_score_distribution(
+    db_session: ReadOnlyDbSession,
+    id: Annotated[int, Path()],
+):
+    distribution = await services.get_score_distribution(
+        db_session=db_session,
+        quiz_id=id,
+        shards=shards,
+    )
+
+    if distribution is None:
+        return JSONResponse(
+            {"detail": "No quiz matches given ID"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+
+    return distribution
+
+
+@router.get("/{id}/item_analysis", response_model=QuizItemAnalysis)
+@protected_route
+async def get_item_analysis(
+    db_session: ReadOnlyDbSession,
+    id: Annotated[int, Path()],
+):
+    analysis = await services.get_item_analysis(
+        db_session=db_session,
+        quiz_id=id,
+        executor=item_analysis_pool,
+        shards=shards,
+    )
+
+    if analysis is None:
+        return JSONResponse(
+            {"detail": "No quiz matches given ID"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+
+    return analysis
@@ -9,10 +9,11 @@ class QuizSchema(BaseModel):
     description: str
     image: str | None
     created_at: datetime
-    questions_count: int
+    # Aggregates are left out unless requested, see `server.fields`
+    questions_count: int | None = None
     total_submissions_count: int
     successful_submissions_count: int
-    avg_time_spent_sec: float
+    avg_time_spent_sec: float | None = None
 
 
 class QuizQuestionSchema(BaseModel):
@@ -27,7 +28,7 @@ class QuizQuestionSchema(BaseModel):
 
 
 class QuizDetailSchema(QuizSchema):
-    questions: list[QuizQuestionSchema]
+    questions: list[QuizQuestionSchema] | None = None
 
 
 class QuizStats(BaseModel):
@@ -35,3 +36,45 @@ class QuizStats(BaseModel):
     submissions_count: int
     successful_submissions_count: int
     avg_time_spent_sec: float
+
+
+class ScoreBin(BaseModel):
+    # Submissions with a ratio of correct answers in (min_ratio, max_ratio],
+    # or of exactly 0 for the first bin
+    min_ratio: float
+    max_ratio: float
+    submissions: int
+
+
+class QuizScoreDistribution(BaseModel):
+    quiz_id: int
+    total_submissions: int
+    bins: list[ScoreBin]
+
+
+class OptionSelection(BaseModel):
+    id: int
+    text: str | None
+    is_correct: bool
+    selections: int
+    # Share of the answers to the question
+    selection_rate: float | None
+
+
+class QuestionItemAnalysis(BaseModel):
+    id: int
+    title: str
+    answers: int
+    # Share of correct answers
+    difficulty: float | None
+    # Point-biserial correlations of a correct answer with the rest score
+    # of the submission, and with the time spent on the question
+    discrimination: float | None
+    time_correlation: float | None
+    options: list[OptionSelection]
+
+
+class QuizItemAnalysis(BaseModel):
+    quiz_id: int
+    submissions: int
+    questions: list[QuestionItemAnalysis]
@@ -1,17 +1,246 @@
-from pydantic import TypeAdapter
-from sqlalchemy import Float, case, cast, desc, func, select, sql, true
+import asyncio
+import math
+from collections import Counter
+from collections.abc import Mapping, Sequence
+from concurrent.futures import Executor
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy import (
+    Float,
+    Integer,
+    Row,
+    RowMapping,
+    Select,
+    any_,
+    bindparam,
+    case,
+    cast,
+    desc,
+    func,
+    literal,
+    select,
+    sql,
+    true,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from server.db.models import (
     Quiz,
     QuizQuestion,
     QuizQuestionOption,
+    QuizScoreHistogram,
     QuizSubmission,
     QuizSubmissionAnswer,
 )
+from server.db.scores import SCORE_BINS, is_successful_bin, score_bin
+from server.db.sessions import ReleasingAsyncSession
+from server.db.shards import (
+    UNSHARDED,
+    ShardSet,
+    fetch_mappings,
+    fetch_scalars,
+    get_correct_option_ids,
+    int_array_param,
+    select_per_submission,
+)
 from server.db.utils import empty_array, json_build_object
+from server.fields import deferred_fields
+from server.schemas import get_list_adapter
+
+from .item_analysis import analyze_items
+from .schemas import (
+    OptionSelection,
+    QuestionItemAnalysis,
+    QuizDetailSchema,
+    QuizItemAnalysis,
+    QuizSchema,
+    QuizScoreDistribution,
+    QuizStats,
+    ScoreBin,
+)
+
+
+QUIZ_FIELDS = deferred_fields(QuizDetailSchema)
+
+
+@lru_cache
+def list_quizes_query(
+    filter_by_ids: bool,
+    seek: bool = False,
+    fields: frozenset[str] = QUIZ_FIELDS,
+) -> Select:
+    """
+    Built once per shape, the filters and pagination are bound parameters:
+    `success_threshold`, `limit`, `offset`, `ids` when `filter_by_ids` and,
+    when `seek`, the sort key of the last quiz of the previous page:
+    `after_total`, `after_successful` and `after_id`.
+
+    The page is ranked on the histogram sums alone, the questions are only
+    aggregated for its quizes. The ids filter goes into every aggregation,
+    so a single quiz costs its own answers only. Of the aggregates, only
+    `fields` are selected, the sort key always is.
+    """
+
+    success_threshold_param = bindparam("success_threshold", type_=Float)
+    ids_param = bindparam("ids", expanding=True)
+
+    quiz_correct_submissions = sql.select(
+        QuizScoreHistogram.quiz_id,
+        func.sum(QuizScoreHistogram.submissions).label("total_submissions_count"),
+        func.sum(QuizScoreHistogram.submissions)
+        .filter(is_successful_bin(QuizScoreHistogram.bin, success_threshold_param))
+        .label("successful_submissions_count"),
+        (
+            func.sum(QuizScoreHistogram.spent_time_seconds)
+            / cast(func.nullif(func.sum(QuizScoreHistogram.answers), 0), Float)
+        ).label("avg_time_spent_sec"),
+    ).group_by(QuizScoreHistogram.quiz_id)
+
+    if filter_by_ids:
+        quiz_correct_submissions = quiz_correct_submissions.where(
+            QuizScoreHistogram.quiz_id.in_(ids_param)
+        )
+
+    quiz_correct_submissions = quiz_correct_submissions.subquery()
+
+    total_submissions_count = func.coalesce(
+        quiz_correct_submissions.c.total_submissions_count, 0
+    )
+    successful_submissions_count = func.coalesce(
+        quiz_correct_submissions.c.successful_submissions_count, 0
+    )
+    page = (
+        sql.select(
+            Quiz.id,
+            total_submissions_count.label("total_submissions_count"),
+            successful_submissions_count.label("successful_submissions_count"),
+        )
+        .join(
+            quiz_correct_submissions,
+            quiz_correct_submissions.c.quiz_id == Quiz.id,
+            isouter=True,
+        )
+        .order_by(
+            desc(total_submissions_count),
+            desc(successful_submissions_count),
+            Quiz.id,
+        )
+        .limit(bindparam("limit"))
+        .offset(bindparam("offset"))
+    )
+
+    if filter_by_ids:
+        page = page.where(Quiz.id.in_(ids_param))
+
+    if "avg_time_spent_sec" in fields:
+        page = page.add_columns(
+            func.coalesce(quiz_correct_submissions.c.avg_time_spent_sec, 0).label(
+                "avg_time_spent_sec"
+            )
+        )
 
-from .schemas import QuizSchema, QuizStats
+    if seek:
+        # Descending counts, then ascending ids
+        page = page.where(
+            tuple_(-total_submissions_count, -successful_submissions_count, Quiz.id)
+            > tuple_(
+                -bindparam("after_total", type_=Integer),
+                -bindparam("after_successful", type_=Integer),
+                bindparam("after_id", type_=Integer),
+            )
+        )
+
+    page = page.subquery()
+
+    columns = [Quiz.id, Quiz.title, Quiz.description, Quiz.image, Quiz.created_at]
+    if "questions_count" in fields:
+        columns.append(
+            sql.select(func.count(QuizQuestion.id))
+            .where(QuizQuestion.quiz_id == page.c.id)
+            .scalar_subquery()
+            .label("questions_count")
+        )
+    columns += [page.c.total_submissions_count, page.c.successful_submissions_count]
+    if "avg_time_spent_sec" in fields:
+        columns.append(page.c.avg_time_spent_sec)
+
+    query = (
+        sql.select(*columns)
+        .select_from(page)
+        .join(Quiz, Quiz.id == page.c.id)
+        .order_by(
+            desc(page.c.total_submissions_count),
+            desc(page.c.successful_submissions_count),
+            page.c.id,
+        )
+    )
+
+    if "questions" in fields:
+        quiz_questions = (
+            sql.select(
+                QuizQuestion.quiz_id,
+                QuizQuestion.id,
+                json_build_object(
+                    {
+                        "id": QuizQuestion.id,
+                        "title": QuizQuestion.title,
+                        "description": QuizQuestion.description,
+                        "image": QuizQuestion.image,
+                        "created_at": QuizQuestion.created_at,
+                        "total_answers": func.count("*"),
+                        "correct_answers": func.sum(
+                            case(
+                                (QuizQuestionOption.is_correct.is_(True), 1),
+                                else_=0,
+                            )
+                        ),
+                        "avg_time_spent_sec": func.avg(
+                            QuizSubmissionAnswer.spent_time_seconds
+                        ),
+                    }
+                ).label("question"),
+            )
+            .join(
+                QuizSubmissionAnswer,
+                QuizQuestion.id == QuizSubmissionAnswer.question_id,
+            )
+            .join(
+                QuizQuestionOption,
+                QuizSubmissionAnswer.selected_option_id == QuizQuestionOption.id,
+            )
+            .group_by(QuizQuestion.id)
+        )
+        if filter_by_ids:
+            quiz_questions = quiz_questions.where(QuizQuestion.quiz_id.in_(ids_param))
+        quiz_questions = quiz_questions.subquery()
+
+        quiz_questions_list = (
+            sql.select(
+                quiz_questions.c.quiz_id,
+                func.array_agg(
+                    aggregate_order_by(quiz_questions.c.question, quiz_questions.c.id)
+                ).label("questions"),
+            )
+            .where(quiz_questions.c.quiz_id == page.c.id)
+            .group_by(quiz_questions.c.quiz_id)
+            .subquery()
+            .lateral()
+        )
+        query = query.add_columns(
+            func.coalesce(quiz_questions_list.c.questions, empty_array()).label(
+                "questions"
+            )
+        ).join(quiz_questions_list, true(), isouter=True)
+
+    return query
+
+
+def sort_key(quiz: QuizSchema) -> tuple[int, int, int]:
+    """Where `quiz` stands in the list, the cursor of the page after it"""
+    return quiz.total_submissions_count, quiz.successful_submissions_count, quiz.id
 
 
 async def list_quizes(
@@ -21,210 +250,559 @@ async def list_quizes(
     limit: int = 20,
     offset: int = 0,
     out_type: type[QuizSchema] = QuizSchema,
+    after: tuple[int, int, int] | None = None,
+    fields: frozenset[str] | None = None,
+    shards: ShardSet = UNSHARDED,
 ):
-    quiz_question_answers = (
-        select(
-            QuizSubmission.quiz_id,
-            QuizSubmissionAnswer.submission_id,
-            (
-                func.count(QuizQuestionOption.id)
-                .filter(QuizQuestionOption.is_correct)
-                .label("correct_count")
+    """
+    Most submitted quizes first. `after` is the `sort_key` of the last quiz
+    of the previous page, `offset` counts from there. Only the `fields`
+    aggregates are computed, all those of `out_type` when None.
+    """
+    if fields is None:
+        fields = deferred_fields(out_type)
+
+    if shards.enabled:
+        return await list_sharded_quizes(
+            db_session,
+            shards,
+            ids,
+            success_threshold,
+            limit,
+            offset,
+            out_type,
+            after,
+            fields,
+        )
+
+    params = {
+        "success_threshold": success_threshold,
+        "limit": limit,
+        "offset": offset,
+    }
+    if ids:
+        params["ids"] = ids
+    if after is not None:
+        params["after_total"], params["after_successful"], params["after_id"] = after
+
+    cursor_result = await db_session.execute(
+        list_quizes_query(
+            filter_by_ids=bool(ids), seek=after is not None, fields=fields
+        ),
+        params,
+    )
+    return get_list_adapter(out_type).validate_python(cursor_result.mappings().all())
+
+
+@lru_cache
+def quiz_stats_query(filter_by_ids: bool) -> Select:
+    """
+    Built once per shape, with the `success_threshold` and, when
+    `filter_by_ids`, the `ids` bound parameters. Every count is scoped to
+    the ids.
+    """
+
+    success_threshold_param = bindparam("success_threshold", type_=Float)
+    ids_param = bindparam("ids", expanding=True)
+
+    quizzes_count = sql.select(func.count(Quiz.id))
+    submissions_count = sql.select(func.count(QuizSubmission.id))
+    histogram_sums = sql.select(
+        func.coalesce(
+            func.sum(QuizScoreHistogram.submissions).filter(
+                is_successful_bin(QuizScoreHistogram.bin, success_threshold_param)
             ),
-            func.count(QuizQuestionOption.id).label("total_count"),
+            0,
+        ).label("successful_submissions_count"),
+        func.coalesce(
+            func.sum(QuizScoreHistogram.spent_time_seconds)
+            / cast(func.nullif(func.sum(QuizScoreHistogram.answers), 0), Float),
+            0,
+        ).label("avg_time_spent_sec"),
+    )
+
+    if filter_by_ids:
+        quizzes_count = quizzes_count.where(Quiz.id.in_(ids_param))
+        submissions_count = submissions_count.where(
+            QuizSubmission.quiz_id.in_(ids_param)
         )
-        .join(
-            QuizQuestionOption,
-            QuizSubmissionAnswer.selected_option_id == QuizQuestionOption.id,
+        histogram_sums = histogram_sums.where(QuizScoreHistogram.quiz_id.in_(ids_param))
+
+    histogram_sums = histogram_sums.subquery()
+    return select(
+        quizzes_count.scalar_subquery().label("quizzes_count"),
+        submissions_count.scalar_subquery().label("submissions_count"),
+        histogram_sums.c.successful_submissions_count,
+        histogram_sums.c.avg_time_spent_sec,
+    ).select_from(histogram_sums)
+
+
+async def get_quiz_stats(
+    db_session: AsyncSession,
+    ids: list[int] | None = None,
+    success_threshold: float = 0.2,
+    shards: ShardSet = UNSHARDED,
+) -> QuizStats:
+    if shards.enabled:
+        return await get_sharded_quiz_stats(db_session, shards, ids, success_threshold)
+
+    params = {"success_threshold": success_threshold}
+    if ids:
+        params["ids"] = ids
+
+    result = await db_session.execute(
+        quiz_stats_query(filter_by_ids=bool(ids)),
+        params,
+    )
+    stats = result.mappings().one()
+    return QuizStats.model_validate(stats)
+
+
+async def get_score_distribution(
+    db_session: AsyncSession,
+    quiz_id: int,
+    shards: ShardSet = UNSHARDED,
+) -> QuizScoreDistribution | None:
+    quiz_exists = await db_session.scalar(
+        select(sql.exists().where(Quiz.id == quiz_id))
+    )
+    if not quiz_exists:
+        return None
+
+    if shards.enabled:
+        submissions = await get_sharded_score_bins(db_session, shards, quiz_id)
+    else:
+        result = await db_session.execute(
+            select(QuizScoreHistogram.bin, QuizScoreHistogram.submissions).where(
+                QuizScoreHistogram.quiz_id == quiz_id
+            )
         )
-        .join(
-            QuizSubmission,
-            QuizSubmissionAnswer.submission_id == QuizSubmission.id,
+        submissions = dict(result.tuples().all())
+    bins = [
+        ScoreBin(
+            min_ratio=max(index - 1, 0) / SCORE_BINS,
+            max_ratio=index / SCORE_BINS,
+            submissions=submissions.get(index, 0),
         )
-        .group_by(QuizSubmission.quiz_id, QuizSubmissionAnswer.submission_id)
-        .subquery()
+        for index in range(SCORE_BINS + 1)
+    ]
+    return QuizScoreDistribution(
+        quiz_id=quiz_id,
+        total_submissions=sum(score_bin.submissions for score_bin in bins),
+        bins=bins,
     )
 
-    quiz_correct_submissions = (
-        sql.select(
-            quiz_question_answers.c.quiz_id,
-            func.count("*").label("total_submissions_count"),
-            func.sum(
-                case(
-                    (
-                        quiz_question_answers.c.correct_count
-                        / cast(quiz_question_answers.c.total_count, Float)
-                        > success_threshold,
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("successful_submissions_count"),
-        )
-        .group_by(quiz_question_answers.c.quiz_id)
-        .subquery()
+
+def finite_or_none(value: float) -> float | None:
+    return value if math.isfinite(value) else None
+
+
+@lru_cache
+def item_answers_query() -> Select:
+    """
+    The answers to the `question_ids` questions as packed int4 columns, see
+    `item_analysis`. Runs on the primary and on the shards alike.
+    """
+
+    def packed(column):
+        return func.string_agg(func.int4send(column), literal(b""))
+
+    return select(
+        packed(QuizSubmissionAnswer.submission_id),
+        packed(QuizSubmissionAnswer.selected_option_id),
+        packed(QuizSubmissionAnswer.spent_time_seconds),
+    ).where(
+        QuizSubmissionAnswer.question_id
+        == any_(bindparam("question_ids", type_=ARRAY(Integer)))
     )
 
-    quiz_questions = (
-        sql.select(
-            QuizQuestion.quiz_id,
-            json_build_object(
-                {
-                    "id": QuizQuestion.id,
-                    "title": QuizQuestion.title,
-                    "description": QuizQuestion.description,
-                    "image": QuizQuestion.image,
-                    "created_at": QuizQuestion.created_at,
-                    "total_answers": func.count("*"),
-                    "correct_answers": func.sum(
-                        case(
-                            (QuizQuestionOption.is_correct.is_(True), 1),
-                            else_=0,
-                        )
-                    ),
-                    "avg_time_spent_sec": func.avg(
-                        QuizSubmissionAnswer.spent_time_seconds
-                    ),
-                }
-            ).label("question"),
+
+async def get_item_analysis(
+    db_session: AsyncSession,
+    quiz_id: int,
+    executor: Executor | None = None,
+    shards: ShardSet = UNSHARDED,
+) -> QuizItemAnalysis | None:
+    """
+    Item analysis of the questions of a quiz. Its answers are fetched in one
+    row per shard, and analyzed in `executor` (the loop's default one when
+    None).
+    """
+    quiz_exists = await db_session.scalar(
+        select(sql.exists().where(Quiz.id == quiz_id))
+    )
+    if not quiz_exists:
+        return None
+
+    questions_result = await db_session.execute(
+        select(QuizQuestion.id, QuizQuestion.title)
+        .where(QuizQuestion.quiz_id == quiz_id)
+        .order_by(QuizQuestion.id)
+    )
+    questions = questions_result.all()
+    question_indexes = {question.id: index for index, question in enumerate(questions)}
+
+    options_result = await db_session.execute(
+        select(
+            QuizQuestionOption.id,
+            QuizQuestionOption.question_id,
+            QuizQuestionOption.text,
+            QuizQuestionOption.is_correct,
         )
-        .join(
-            QuizSubmissionAnswer,
-            QuizQuestion.id == QuizSubmissionAnswer.question_id,
+        .join(QuizQuestion, QuizQuestionOption.question_id == QuizQuestion.id)
+        .where(QuizQuestion.quiz_id == quiz_id)
+        .order_by(QuizQuestionOption.id)
+    )
+    options = options_result.all()
+
+    async def fetch_answers(session: AsyncSession) -> Row:
+        result = await session.execute(
+            item_answers_query(),
+            {"question_ids": list(question_indexes)},
         )
-        .join(
-            QuizQuestionOption,
-            QuizSubmissionAnswer.selected_option_id == QuizQuestionOption.id,
+        return result.one()
+
+    partials = await shards.scatter(db_session, fetch_answers)
+    # Done with the database, don't hold a connection during the analysis
+    if isinstance(db_session, ReleasingAsyncSession):
+        await db_session.release()
+
+    statistics = await asyncio.get_running_loop().run_in_executor(
+        executor,
+        analyze_items,
+        [option.id for option in options],
+        [question_indexes[option.question_id] for option in options],
+        [bool(option.is_correct) for option in options],
+        len(questions),
+        # Packed columns concatenate
+        *(b"".join(column or b"" for column in columns) for columns in zip(*partials)),
+    )
+    question_options: list[list[OptionSelection]] = [[] for _ in questions]
+    for index, option in enumerate(options):
+        question_index = question_indexes[option.question_id]
+        answers = int(statistics.answers[question_index])
+        selections = int(statistics.selections[index])
+        question_options[question_index].append(
+            OptionSelection(
+                id=option.id,
+                text=option.text,
+                is_correct=bool(option.is_correct),
+                selections=selections,
+                selection_rate=selections / answers if answers else None,
+            )
         )
-        .group_by(QuizQuestion.id)
-        .subquery()
+
+    return QuizItemAnalysis(
+        quiz_id=quiz_id,
+        submissions=statistics.submissions,
+        questions=[
+            QuestionItemAnalysis(
+                id=question.id,
+                title=question.title,
+                answers=int(statistics.answers[index]),
+                difficulty=finite_or_none(statistics.difficulty[index]),
+                discrimination=finite_or_none(statistics.discrimination[index]),
+                time_correlation=finite_or_none(statistics.time_correlation[index]),
+                options=question_options[index],
+            )
+            for index, question in enumerate(questions)
+        ],
     )
 
-    quiz_questions_list = (
-        sql.select(
-            quiz_questions.c.quiz_id,
-            func.array_agg(quiz_questions.c.question).label("questions"),
+
+# Sharded, the scores and their histograms on the primary are empty: the
+# shards bin their submissions themselves, with the correct option ids as a
+# parameter. A quiz's submissions are spread over every shard, its totals
+# are the sums of theirs.
+
+
+@lru_cache
+def shard_quizes_query(filter_by_ids: bool) -> Select:
+    """
+    Submission totals per quiz on one shard. Bound parameters:
+    `success_threshold`, `correct_option_ids` and `ids` when `filter_by_ids`.
+    """
+    per_submission = select_per_submission(QuizSubmission.quiz_id)
+    if filter_by_ids:
+        per_submission = per_submission.where(
+            QuizSubmission.quiz_id == any_(int_array_param("ids"))
+        )
+    per_submission = per_submission.subquery()
+    submission_bin = score_bin(
+        per_submission.c.correct_count, per_submission.c.total_count
+    )
+
+    return select(
+        per_submission.c.quiz_id,
+        func.count().label("total_submissions_count"),
+        func.count()
+        .filter(
+            is_successful_bin(
+                submission_bin, bindparam("success_threshold", type_=Float)
+            )
         )
-        .where(quiz_questions.c.quiz_id == Quiz.id)
-        .group_by(quiz_questions.c.quiz_id)
+        .label("successful_submissions_count"),
+        func.sum(per_submission.c.total_count).label("answers"),
+        func.sum(per_submission.c.spent_time_seconds).label("spent_time_seconds"),
+    ).group_by(per_submission.c.quiz_id)
+
+
+@lru_cache
+def shard_submissions_count_query(filter_by_ids: bool) -> Select:
+    """Submissions on one shard, of the `ids` quizes when `filter_by_ids`"""
+    query = select(func.count(QuizSubmission.id))
+    if filter_by_ids:
+        query = query.where(QuizSubmission.quiz_id == any_(int_array_param("ids")))
+    return query
+
+
+@lru_cache
+def shard_score_bins_query() -> Select:
+    """
+    Submissions per bin of the `quiz_id` quiz on one shard, with the
+    `correct_option_ids` bound parameter.
+    """
+    per_submission = (
+        select_per_submission(QuizSubmission.quiz_id)
+        .where(QuizSubmission.quiz_id == bindparam("quiz_id", type_=Integer))
         .subquery()
-        .lateral()
+    )
+    submission_bin = score_bin(
+        per_submission.c.correct_count, per_submission.c.total_count
+    ).label("bin")
+    return select(submission_bin, func.count().label("submissions")).group_by(
+        submission_bin
     )
 
-    query = (
-        sql.select(
-            Quiz.id,
-            Quiz.title,
-            Quiz.description,
-            Quiz.image,
-            Quiz.created_at,
-            (
-                sql.select(func.count(QuizQuestion.id))
-                .where(QuizQuestion.quiz_id == Quiz.id)
-                .scalar_subquery()
-                .label("questions_count")
-            ),
-            func.coalesce(quiz_correct_submissions.c.total_submissions_count, 0).label(
-                "total_submissions_count"
-            ),
-            func.coalesce(
-                quiz_correct_submissions.c.successful_submissions_count, 0
-            ).label("successful_submissions_count"),
-            (
-                sql.select(
-                    func.coalesce(func.avg(QuizSubmissionAnswer.spent_time_seconds), 0)
-                )
-                .join(
-                    QuizSubmission,
-                    QuizSubmissionAnswer.submission_id == QuizSubmission.id,
-                )
-                .where(QuizSubmission.quiz_id == Quiz.id)
-                .scalar_subquery()
-                .label("avg_time_spent_sec")
-            ),
-            func.coalesce(quiz_questions_list.c.questions, empty_array()).label(
-                "questions"
+
+@lru_cache
+def shard_questions_query() -> Select:
+    """
+    Answer totals of the `question_ids` questions on one shard, with the
+    `correct_option_ids` bound parameter.
+    """
+    is_correct = QuizSubmissionAnswer.selected_option_id == any_(
+        int_array_param("correct_option_ids")
+    )
+    return (
+        select(
+            QuizSubmissionAnswer.question_id,
+            func.count().label("total_answers"),
+            func.count().filter(is_correct).label("correct_answers"),
+            func.sum(QuizSubmissionAnswer.spent_time_seconds).label(
+                "spent_time_seconds"
             ),
         )
-        .select_from(Quiz)
-        .join(
-            quiz_correct_submissions,
-            quiz_correct_submissions.c.quiz_id == Quiz.id,
-            isouter=True,
-        )
-        .join(quiz_questions_list, true(), isouter=True)
-        .order_by(
-            desc("total_submissions_count"),
-            desc("successful_submissions_count"),
+        .where(
+            QuizSubmissionAnswer.question_id == any_(int_array_param("question_ids"))
         )
-        .limit(limit)
-        .offset(offset)
+        .group_by(QuizSubmissionAnswer.question_id)
     )
 
-    if ids:
-        query = query.where(Quiz.id.in_(ids))
 
-    cursor_result = await db_session.execute(query)
-    return TypeAdapter(list[out_type]).validate_python(cursor_result.mappings().all())
+def ranking_key(quiz: Mapping[str, Any]) -> tuple[int, int, int]:
+    """Most submitted first, like `list_quizes_query` sorts"""
+    return (
+        -quiz.get("total_submissions_count", 0),
+        -quiz.get("successful_submissions_count", 0),
+        quiz["id"],
+    )
 
 
-async def get_quiz_stats(
+def avg_time_spent(totals: Mapping[str, int]) -> float:
+    if not totals.get("answers"):
+        return 0
+    return totals["spent_time_seconds"] / totals["answers"]
+
+
+def sum_partials(
+    partials: list[Sequence[RowMapping]], key: str
+) -> dict[int, Counter[str]]:
+    """The other columns of the shard rows summed per `key`"""
+    totals: dict[int, Counter[str]] = {}
+    for partial in partials:
+        for row in partial:
+            totals.setdefault(row[key], Counter()).update(
+                {name: value for name, value in row.items() if name != key}
+            )
+    return totals
+
+
+async def get_sharded_quiz_totals(
     db_session: AsyncSession,
-    ids: list[int] | None = None,
-    success_threshold: float = 0.2,
-) -> QuizStats:
-    quiz_question_answers = (
+    shards: ShardSet,
+    params: dict[str, Any],
+) -> dict[int, Counter[str]]:
+    """Submission totals per quiz, summed over the shards"""
+    partials = await shards.scatter(
+        db_session, fetch_mappings(shard_quizes_query("ids" in params), params)
+    )
+    return sum_partials(partials, "quiz_id")
+
+
+async def get_sharded_questions(
+    db_session: AsyncSession,
+    shards: ShardSet,
+    params: dict[str, Any],
+    quiz_ids: list[int],
+) -> dict[int, list[dict[str, Any]]]:
+    """The answered questions of `quiz_ids`, with their totals"""
+    result = await db_session.execute(
         select(
-            QuizSubmissionAnswer.submission_id,
-            (
-                func.count(QuizQuestionOption.id)
-                .filter(QuizQuestionOption.is_correct)
-                .label("correct_count")
-            ),
-            func.count(QuizQuestionOption.id).label("total_count"),
-        )
-        .join(
-            QuizQuestionOption,
-            QuizSubmissionAnswer.selected_option_id == QuizQuestionOption.id,
+            QuizQuestion.id,
+            QuizQuestion.quiz_id,
+            QuizQuestion.title,
+            QuizQuestion.description,
+            QuizQuestion.image,
+            QuizQuestion.created_at,
         )
-        .group_by(QuizSubmissionAnswer.submission_id)
-        .subquery()
+        .where(QuizQuestion.quiz_id.in_(quiz_ids))
+        .order_by(QuizQuestion.id)
     )
+    questions = result.mappings().all()
 
-    query = select(
-        sql.select(func.count(Quiz.id)).scalar_subquery().label("quizzes_count"),
-        (
-            sql.select(func.count(QuizSubmission.id))
-            .scalar_subquery()
-            .label("submissions_count")
-        ),
-        (
-            sql.select(
-                func.sum(
-                    case(
-                        (
-                            quiz_question_answers.c.correct_count
-                            / cast(quiz_question_answers.c.total_count, Float)
-                            > success_threshold,
-                            1,
-                        ),
-                        else_=0,
-                    )
-                )
-            )
-            .scalar_subquery()
-            .label("successful_submissions_count")
+    partials = await shards.scatter(
+        db_session,
+        fetch_mappings(
+            shard_questions_query(),
+            {
+                "correct_option_ids": params["correct_option_ids"],
+                "question_ids": [question["id"] for question in questions],
+            },
         ),
+    )
+    totals = sum_partials(partials, "question_id")
+
+    quiz_questions: dict[int, list[dict[str, Any]]] = {
+        quiz_id: [] for quiz_id in quiz_ids
+    }
+    for question in questions:
+        if question["id"] not in totals:
+            continue
+
+        question_totals = totals[question["id"]]
+        quiz_questions[question["quiz_id"]].append(
+            dict(question)
+            | {
+                "total_answers": question_totals["total_answers"],
+                "correct_answers": question_totals["correct_answers"],
+                "avg_time_spent_sec": question_totals["spent_time_seconds"]
+                / question_totals["total_answers"],
+            }
+        )
+    return quiz_questions
+
+
+async def list_sharded_quizes(
+    db_session: AsyncSession,
+    shards: ShardSet,
+    ids: list[int] | None,
+    success_threshold: float,
+    limit: int,
+    offset: int,
+    out_type: type[QuizSchema],
+    after: tuple[int, int, int] | None,
+    fields: frozenset[str],
+):
+    params: dict[str, Any] = {
+        "success_threshold": success_threshold,
+        "correct_option_ids": await get_correct_option_ids(db_session),
+    }
+    quiz_ids_query = select(Quiz.id)
+    if ids:
+        params["ids"] = ids
+        quiz_ids_query = quiz_ids_query.where(Quiz.id.in_(ids))
+
+    totals = await get_sharded_quiz_totals(db_session, shards, params)
+    # Every quiz is ranked here, those without submissions too: unlike
+    # students, there are few enough of them
+    ranked = sorted(
         (
-            sql.select(func.avg(QuizSubmissionAnswer.spent_time_seconds))
-            .scalar_subquery()
-            .label("avg_time_spent_sec")
+            {"id": quiz_id, **totals.get(quiz_id, Counter())}
+            for quiz_id in await db_session.scalars(quiz_ids_query)
         ),
+        key=ranking_key,
     )
+    if after is not None:
+        after_key = (-after[0], -after[1], after[2])
+        ranked = [quiz for quiz in ranked if ranking_key(quiz) > after_key]
+    page = ranked[offset : offset + limit]
+
+    quiz_ids = [quiz["id"] for quiz in page]
+    columns = [Quiz.id, Quiz.title, Quiz.description, Quiz.image, Quiz.created_at]
+    if "questions_count" in fields:
+        columns.append(
+            sql.select(func.count(QuizQuestion.id))
+            .where(QuizQuestion.quiz_id == Quiz.id)
+            .scalar_subquery()
+            .label("questions_count")
+        )
+    result = await db_session.execute(select(*columns).where(Quiz.id.in_(quiz_ids)))
+    details = {row["id"]: row for row in result.mappings()}
+    if "questions" in fields:
+        questions = await get_sharded_questions(db_session, shards, params, quiz_ids)
+
+    quizes = []
+    for quiz in page:
+        quiz_details = dict(details[quiz["id"]]) | {
+            "total_submissions_count": quiz.get("total_submissions_count", 0),
+            "successful_submissions_count": quiz.get("successful_submissions_count", 0),
+        }
+        if "avg_time_spent_sec" in fields:
+            quiz_details["avg_time_spent_sec"] = avg_time_spent(quiz)
+        if "questions" in fields:
+            quiz_details["questions"] = questions[quiz["id"]]
+        quizes.append(quiz_details)
 
+    return get_list_adapter(out_type).validate_python(quizes)
+
+
+async def get_sharded_quiz_stats(
+    db_session: AsyncSession,
+    shards: ShardSet,
+    ids: list[int] | None,
+    success_threshold: float,
+) -> QuizStats:
+    params: dict[str, Any] = {
+        "success_threshold": success_threshold,
+        "correct_option_ids": await get_correct_option_ids(db_session),
+    }
+    quizzes_count_query = select(func.count(Quiz.id))
     if ids:
-        query = query.where(Quiz.id.in_(ids))
+        params["ids"] = ids
+        quizzes_count_query = quizzes_count_query.where(Quiz.id.in_(ids))
 
-    result = await db_session.execute(query)
-    stats = result.mappings().one()
-    return QuizStats.model_validate(stats)
+    submissions_counts = await shards.scatter(
+        db_session, fetch_scalars(shard_submissions_count_query(bool(ids)), params)
+    )
+    totals = Counter[str]()
+    for quiz_totals in (
+        await get_sharded_quiz_totals(db_session, shards, params)
+    ).values():
+        totals.update(quiz_totals)
+
+    return QuizStats(
+        quizzes_count=await db_session.scalar(quizzes_count_query),
+        submissions_count=sum(count for [count] in submissions_counts),
+        successful_submissions_count=totals["successful_submissions_count"],
+        avg_time_spent_sec=avg_time_spent(totals),
+    )
+
+
+async def get_sharded_score_bins(
+    db_session: AsyncSession,
+    shards: ShardSet,
+    quiz_id: int,
+) -> Counter[int]:
+    """Submissions of `quiz_id` per bin, summed over the shards"""
+    params = {
+        "quiz_id": quiz_id,
+        "correct_option_ids": await get_correct_option_ids(db_session),
+    }
+    partials = await shards.scatter(
+        db_session, fetch_mappings(shard_score_bins_query(), params)
+    )
+    submissions = Counter[int]()
+    for partial in partials:
+        submissions.update({row["bin"]: row["submissions"] for row in partial})
+    return submissions
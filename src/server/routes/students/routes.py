@@ -1,11 +1,14 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Path
+from fastapi import APIRouter, Path, Response
 from starlette import status
 from starlette.responses import JSONResponse
 
 from server.authentication.utils import protected_route
-from server.db import DbSession
+from server.db import ReadOnlyDbSession, shards
+from server.fields import Fields, select_fields
+from server.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from server.schemas import SuccessThreshold
 
 from . import services
 from .schemas import StudentDetailSchema, StudentSchema, StudentStats
@@ -13,33 +16,84 @@ from .schemas import StudentDetailSchema, StudentSchema, StudentStats
 router = APIRouter()
 
 
-@router.get("", response_model=list[StudentSchema])
+@router.get("", response_model=list[StudentSchema], response_model_exclude_unset=True)
 @protected_route
 async def list_students(
-    db_session: DbSession,
+    db_session: ReadOnlyDbSession,
+    response: Response,
     limit: int = 20,
     offset: int = 0,
+    cursor: str | None = None,
+    success_threshold: SuccessThreshold = 0.2,
+    fields: Fields = None,
 ):
-    return await services.list_students(
+    try:
+        after = decode_cursor(cursor, 3) if cursor else None
+        selected_fields = select_fields(fields, StudentSchema)
+    except ValueError as error:
+        return JSONResponse(
+            {"detail": str(error)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    students = await services.list_students(
         db_session=db_session,
+        success_threshold=success_threshold,
         limit=limit,
         offset=offset,
+        shards=shards,
+        after=after,
+        fields=selected_fields,
     )
 
+    if students and len(students) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            services.sort_key(students[-1])
+        )
+
+    return students
+
 
 @router.get("/stats", response_model=StudentStats)
 @protected_route
-async def get_student_stats(db_session: DbSession):
-    return await services.get_student_stats(db_session=db_session)
+async def get_student_stats(
+    db_session: ReadOnlyDbSession,
+    success_threshold: SuccessThreshold = 0.2,
+):
+    return await services.get_student_stats(
+        db_session=db_session,
+        success_threshold=success_threshold,
+        shards=shards,
+    )
 
 
-@router.get("/{username}", response_model=StudentDetailSchema)
+@router.get(
+    "/{username}",
+    response_model=StudentDetailSchema,
+    response_model_exclude_unset=True,
+)
 # @protected_route
-async def get_student(db_session: DbSession, username: Annotated[str, Path()]):
+async def get_student(
+    db_session: ReadOnlyDbSession,
+    username: Annotated[str, Path()],
+    success_threshold: SuccessThreshold = 0.2,
+    fields: Fields = None,
+):
+    try:
+        selected_fields = select_fields(fields, StudentDetailSchema)
+    except ValueError as error:
+        return JSONResponse(
+            {"detail": str(error)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
     students = await services.list_students(
         db_session=db_session,
         usernames=[username],
+        success_threshold=success_threshold,
         out_type=StudentDetailSchema,
+        fields=selected_fields,
+        shards=shards,
     )
 
     if not students:
@@ -23,12 +23,14 @@ class StudentQuiz(BaseModel):
 
 
 class StudentSchema(BaseModel):
+    id: int
     username: str
     name: str
     successful_submissions: int
     total_submissions: int
-    total_time_spent_sec: int
+    # Aggregates are left out unless requested, see `server.fields`
+    total_time_spent_sec: int | None = None
 
 
 class StudentDetailSchema(StudentSchema):
-    quizes: list[StudentQuiz]
+    quizes: list[StudentQuiz] | None = None
@@ -1,238 +1,299 @@
-from pydantic import TypeAdapter
-from sqlalchemy import Float, case, cast, desc, func, select, sql, true
+import heapq
+from collections.abc import Mapping
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Any
+
+from sqlalchemy import (
+    ColumnElement,
+    Float,
+    Integer,
+    Select,
+    Subquery,
+    all_,
+    any_,
+    bindparam,
+    desc,
+    func,
+    select,
+    sql,
+    true,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from server.db.models import (
     Quiz,
-    QuizQuestionOption,
     QuizSubmission,
     QuizSubmissionAnswer,
+    QuizSubmissionScore,
+    StudentScoreHistogram,
     User,
 )
+from server.db.scores import is_successful_bin, score_bin
+from server.db.shards import (
+    UNSHARDED,
+    ShardSet,
+    fetch_mappings,
+    fetch_scalars,
+    get_correct_option_ids,
+    int_array_param,
+    select_per_submission,
+)
 from server.db.utils import empty_array, json_build_object
+from server.fields import deferred_fields
+from server.schemas import get_list_adapter
 
-from .schemas import StudentSchema, StudentStats
+from .schemas import StudentDetailSchema, StudentSchema, StudentStats, TopStudent
 
+TOP_STUDENTS_COUNT = 3
 
-async def list_students(
-    db_session: AsyncSession,
-    usernames: list[str] | None = None,
-    success_threshold: float = 0.2,
-    limit: int = 20,
-    offset: int = 0,
-    out_type: type[StudentSchema] = StudentSchema,
-) -> list[StudentSchema]:
-    correct_answers_per_submission = (
-        select(
-            QuizSubmission.user_id,
-            func.sum(
-                case(
-                    (QuizQuestionOption.is_correct.is_(True), 1),
-                    else_=0,
-                )
-            ).label("correct_count"),
-            func.count(QuizQuestionOption.id).label("total_count"),
-        )
-        .join(User, QuizSubmission.user_id == User.id)
-        .join(
-            QuizSubmissionAnswer,
-            QuizSubmission.id == QuizSubmissionAnswer.submission_id,
-        )
-        .join(
-            QuizQuestionOption,
-            QuizSubmissionAnswer.selected_option_id == QuizQuestionOption.id,
-        )
-        .group_by(QuizSubmission.user_id, QuizSubmission.id)
-        .subquery()
-    )
+STUDENT_FIELDS = deferred_fields(StudentDetailSchema)
+
+
+@lru_cache
+def list_students_query(
+    filter_by_usernames: bool,
+    seek: bool = False,
+    fields: frozenset[str] = STUDENT_FIELDS,
+) -> Select:
+    """
+    Built once per shape, the filters and pagination are bound parameters:
+    `success_threshold`, `limit`, `offset`, `usernames` when
+    `filter_by_usernames` and, when `seek`, the sort key of the last student
+    of the previous page: `after_successful`, `after_total` and `after_id`.
+
+    The page is ranked on the histograms alone, the per-quiz breakdown is
+    only aggregated for its students. Of the aggregates, only `fields` are
+    selected, the sort key always is.
+    """
+
+    success_threshold_param = bindparam("success_threshold", type_=Float)
 
     submission_stats = (
         select(
-            func.count().label("total_submissions"),
-            func.count()
+            func.sum(StudentScoreHistogram.submissions).label("total_submissions"),
+            func.sum(StudentScoreHistogram.submissions)
             .filter(
-                (
-                    correct_answers_per_submission.c.correct_count.cast(Float)
-                    / correct_answers_per_submission.c.total_count.cast(Float)
-                )
-                > success_threshold
+                is_successful_bin(StudentScoreHistogram.bin, success_threshold_param)
             )
             .label("successful_submissions"),
+            func.sum(StudentScoreHistogram.spent_time_seconds).label(
+                "total_time_spent_sec"
+            ),
         )
-        .where(correct_answers_per_submission.c.user_id == User.id)
-        .group_by(correct_answers_per_submission.c.user_id)
+        .where(StudentScoreHistogram.user_id == User.id)
+        .group_by(StudentScoreHistogram.user_id)
         .scalar_subquery()
         .lateral()
     )
 
-    quiz_question_answers = (
+    successful_submissions = func.coalesce(submission_stats.c.successful_submissions, 0)
+    total_submissions = func.coalesce(submission_stats.c.total_submissions, 0)
+    page = (
         select(
-            QuizSubmission.quiz_id,
-            QuizSubmission.user_id,
-            (
-                func.count(QuizQuestionOption.id)
-                .filter(QuizQuestionOption.is_correct)
-                .label("correct_count")
-            ),
-            func.count(QuizQuestionOption.id).label("total_count"),
-            func.sum(QuizSubmissionAnswer.spent_time_seconds).label(
-                "spent_time_seconds"
-            ),
-        )
-        .select_from(QuizSubmissionAnswer)
-        .join(
-            QuizQuestionOption,
-            QuizSubmissionAnswer.selected_option_id == QuizQuestionOption.id,
+            User.id,
+            successful_submissions.label("successful_submissions"),
+            total_submissions.label("total_submissions"),
         )
-        .join(
-            QuizSubmission,
-            QuizSubmissionAnswer.submission_id == QuizSubmission.id,
-        )
-        .group_by(
-            QuizSubmission.quiz_id,
-            QuizSubmission.user_id,
-            QuizSubmissionAnswer.submission_id,
-        )
-        .subquery()
+        .join(submission_stats, true(), isouter=True)
+        .where(User.role == "student")
+        .order_by(desc(successful_submissions), desc(total_submissions), User.id)
+        .limit(bindparam("limit"))
+        .offset(bindparam("offset"))
     )
 
-    quiz_correct_submissions = (
-        select(
-            quiz_question_answers.c.quiz_id,
-            quiz_question_answers.c.user_id,
-            func.count("*").label("total_submissions_count"),
-            func.sum(
-                case(
-                    (
-                        quiz_question_answers.c.correct_count
-                        / cast(quiz_question_answers.c.total_count, Float)
-                        > success_threshold,
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("successful_submissions_count"),
-            func.avg(quiz_question_answers.c.spent_time_seconds).label(
-                "avg_spent_time_seconds"
-            ),
+    if filter_by_usernames:
+        page = page.where(User.username.in_(bindparam("usernames", expanding=True)))
+
+    if "total_time_spent_sec" in fields:
+        page = page.add_columns(
+            func.coalesce(submission_stats.c.total_time_spent_sec, 0).label(
+                "total_time_spent_sec"
+            )
         )
-        .group_by(
-            quiz_question_answers.c.quiz_id,
-            quiz_question_answers.c.user_id,
+
+    if seek:
+        # Descending counts, then ascending ids
+        page = page.where(
+            tuple_(-successful_submissions, -total_submissions, User.id)
+            > tuple_(
+                -bindparam("after_successful", type_=Integer),
+                -bindparam("after_total", type_=Integer),
+                bindparam("after_id", type_=Integer),
+            )
         )
-        .subquery()
-    )
+
+    page = page.subquery()
 
     query = (
         select(
+            page.c.id,
             User.username,
             User.name,
-            func.coalesce(submission_stats.c.successful_submissions, 0).label(
-                "successful_submissions"
-            ),
-            func.coalesce(submission_stats.c.total_submissions, 0).label(
-                "total_submissions"
-            ),
-            (
-                select(
-                    func.coalesce(
-                        func.sum(QuizSubmissionAnswer.spent_time_seconds),
-                        0,
-                    ).label("spent_time_seconds")
-                )
-                .select_from(QuizSubmission)
-                .join(
-                    QuizSubmissionAnswer,
-                    QuizSubmission.id == QuizSubmissionAnswer.submission_id,
-                )
-                .where(QuizSubmission.user_id == User.id)
-                .scalar_subquery()
-                .label("total_time_spent_sec")
+            page.c.successful_submissions,
+            page.c.total_submissions,
+        )
+        .select_from(page)
+        .join(User, User.id == page.c.id)
+        .order_by(
+            desc(page.c.successful_submissions),
+            desc(page.c.total_submissions),
+            page.c.id,
+        )
+    )
+
+    if "total_time_spent_sec" in fields:
+        query = query.add_columns(page.c.total_time_spent_sec)
+
+    if "quizes" in fields:
+        # Binned like the histograms, so the quizes add up to the totals
+        is_successful = is_successful_bin(
+            score_bin(
+                QuizSubmissionScore.correct_count, QuizSubmissionScore.total_count
             ),
-            (
-                sql.select(
-                    func.coalesce(
-                        func.array_agg(
-                            json_build_object(
-                                {
-                                    "id": quiz_correct_submissions.c.quiz_id,
-                                    "title": Quiz.title,
-                                    "successful_submissions_count": quiz_correct_submissions.c.successful_submissions_count,
-                                    "total_submissions_count": quiz_correct_submissions.c.total_submissions_count,
-                                    "avg_spent_time_seconds": quiz_correct_submissions.c.avg_spent_time_seconds,
-                                }
-                            )
-                        ),
-                        empty_array(),
-                    )
+            success_threshold_param,
+        )
+        quiz_correct_submissions = (
+            select(
+                QuizSubmissionScore.quiz_id,
+                QuizSubmissionScore.user_id,
+                func.count("*").label("total_submissions_count"),
+                func.count()
+                .filter(is_successful)
+                .label("successful_submissions_count"),
+                func.avg(QuizSubmissionScore.spent_time_seconds).label(
+                    "avg_spent_time_seconds"
+                ),
+            )
+            .group_by(QuizSubmissionScore.quiz_id, QuizSubmissionScore.user_id)
+            .subquery()
+        )
+        quiz = json_build_object(
+            {
+                "id": quiz_correct_submissions.c.quiz_id,
+                "title": Quiz.title,
+                "successful_submissions_count": (
+                    quiz_correct_submissions.c.successful_submissions_count
+                ),
+                "total_submissions_count": (
+                    quiz_correct_submissions.c.total_submissions_count
+                ),
+                "avg_spent_time_seconds": (
+                    quiz_correct_submissions.c.avg_spent_time_seconds
+                ),
+            }
+        )
+        query = query.add_columns(
+            sql.select(
+                func.coalesce(
+                    func.array_agg(
+                        aggregate_order_by(quiz, quiz_correct_submissions.c.quiz_id)
+                    ),
+                    empty_array(),
                 )
-                .select_from(quiz_correct_submissions)
-                .join(Quiz, quiz_correct_submissions.c.quiz_id == Quiz.id)
-                .where(quiz_correct_submissions.c.user_id == User.id)
-                .scalar_subquery()
-                .label("quizes")
-            ),
+            )
+            .select_from(quiz_correct_submissions)
+            .join(Quiz, quiz_correct_submissions.c.quiz_id == Quiz.id)
+            .where(quiz_correct_submissions.c.user_id == page.c.id)
+            .scalar_subquery()
+            .label("quizes")
         )
-        .join(submission_stats, true(), isouter=True)
-        .where(User.role == "student")
-        .order_by(desc("successful_submissions"))
-        .limit(limit)
-        .offset(offset)
-    )
 
+    return query
+
+
+def sort_key(student: StudentSchema) -> tuple[int, int, int]:
+    """Where `student` stands in the list, the cursor of the page after it"""
+    return student.successful_submissions, student.total_submissions, student.id
+
+
+async def list_students(
+    db_session: AsyncSession,
+    usernames: list[str] | None = None,
+    success_threshold: float = 0.2,
+    limit: int = 20,
+    offset: int = 0,
+    out_type: type[StudentSchema] = StudentSchema,
+    shards: ShardSet = UNSHARDED,
+    after: tuple[int, int, int] | None = None,
+    fields: frozenset[str] | None = None,
+) -> list[StudentSchema]:
+    """
+    Most successful students first. `after` is the `sort_key` of the last
+    student of the previous page, `offset` counts from there. Only the
+    `fields` aggregates are computed, all those of `out_type` when None.
+    """
+    if fields is None:
+        fields = deferred_fields(out_type)
+
+    if shards.enabled:
+        return await list_sharded_students(
+            db_session,
+            shards,
+            usernames,
+            success_threshold,
+            limit,
+            offset,
+            out_type,
+            after,
+            fields,
+        )
+
+    params = {
+        "success_threshold": success_threshold,
+        "limit": limit,
+        "offset": offset,
+    }
     if usernames:
-        query = query.where(User.username.in_(usernames))
+        params["usernames"] = usernames
+    if after is not None:
+        params["after_successful"], params["after_total"], params["after_id"] = after
 
-    result = await db_session.execute(query)
-    ta = TypeAdapter(list[out_type])
+    result = await db_session.execute(
+        list_students_query(
+            filter_by_usernames=bool(usernames),
+            seek=after is not None,
+            fields=fields,
+        ),
+        params,
+    )
+    ta = get_list_adapter(out_type)
     return ta.validate_python(result.mappings().all())
 
 
 async def get_student_stats(
     db_session: AsyncSession,
     success_threshold: float = 0.2,
+    shards: ShardSet = UNSHARDED,
 ) -> StudentStats:
-    correct_answers_per_submission = (
-        select(
-            QuizSubmission.user_id,
-            func.sum(
-                case(
-                    (QuizQuestionOption.is_correct.is_(True), 1),
-                    else_=0,
-                )
-            ).label("correct_count"),
-            func.count(QuizQuestionOption.id).label("total_count"),
-        )
-        .join(User, QuizSubmission.user_id == User.id)
-        .join(
-            QuizSubmissionAnswer,
-            QuizSubmission.id == QuizSubmissionAnswer.submission_id,
-        )
-        .join(
-            QuizQuestionOption,
-            QuizSubmissionAnswer.selected_option_id == QuizQuestionOption.id,
-        )
-        .group_by(QuizSubmission.user_id, QuizSubmission.id)
-        .subquery()
-    )
+    if shards.enabled:
+        return await get_sharded_student_stats(db_session, shards, success_threshold)
 
     top_students = (
         select(
-            correct_answers_per_submission.c.user_id,
-            func.count().label("total_submissions"),
-            func.count()
-            .filter(
-                (
-                    correct_answers_per_submission.c.correct_count.cast(Float)
-                    / correct_answers_per_submission.c.total_count.cast(Float)
-                )
-                > success_threshold
-            )
-            .label("successful_submissions"),
+            StudentScoreHistogram.user_id,
+            func.sum(StudentScoreHistogram.submissions).label("total_submissions"),
+            func.coalesce(
+                func.sum(StudentScoreHistogram.submissions).filter(
+                    is_successful_bin(StudentScoreHistogram.bin, success_threshold)
+                ),
+                0,
+            ).label("successful_submissions"),
         )
-        .group_by(correct_answers_per_submission.c.user_id)
-        .order_by(desc("successful_submissions"))
-        .limit(3)
+        # Editors take quizes too, they aren't ranked among the students
+        .join(User, User.id == StudentScoreHistogram.user_id)
+        .where(User.role == "student")
+        .group_by(StudentScoreHistogram.user_id)
+        # Emptied histograms keep their rows
+        .having(func.sum(StudentScoreHistogram.submissions) > 0)
+        .order_by(
+            desc("successful_submissions"),
+            desc("total_submissions"),
+            StudentScoreHistogram.user_id,
+        )
+        .limit(TOP_STUDENTS_COUNT)
         .subquery()
     )
 
@@ -246,14 +307,21 @@ async def get_student_stats(
         (
             select(
                 func.array_agg(
-                    json_build_object(
-                        {
-                            "id": User.id,
-                            "username": User.username,
-                            "name": User.name,
-                            "successful_submissions": top_students.c.successful_submissions,
-                            "total_submissions": top_students.c.total_submissions,
-                        }
+                    aggregate_order_by(
+                        json_build_object(
+                            {
+                                "id": User.id,
+                                "username": User.username,
+                                "name": User.name,
+                                "successful_submissions": (
+                                    top_students.c.successful_submissions
+                                ),
+                                "total_submissions": top_students.c.total_submissions,
+                            }
+                        ),
+                        top_students.c.successful_submissions.desc(),
+                        top_students.c.total_submissions.desc(),
+                        User.id,
                     )
                 )
             )
@@ -266,3 +334,336 @@ async def get_student_stats(
 
     result = await db_session.execute(query)
     return StudentStats.model_validate(result.mappings().one())
+
+
+# With sharding, submissions and answers are on the shards while users,
+# quizes and options stay on the primary. The shards get the ids of the
+# correct options and of the users to leave out as parameters and return
+# per-user totals, merged here. A user's submissions are all on one shard,
+# so those totals are complete.
+
+# Students checked against the shards at once when looking for the ones
+# without submissions
+INACTIVE_STUDENTS_BATCH_SIZE = 500
+
+
+def count_successful(per_submission: Subquery) -> ColumnElement[int]:
+    """Successful submissions, binned like the histograms of the primary"""
+    return func.count().filter(
+        is_successful_bin(
+            score_bin(per_submission.c.correct_count, per_submission.c.total_count),
+            bindparam("success_threshold", type_=Float),
+        )
+    )
+
+
+@lru_cache
+def shard_students_query(filter_by_user_ids: bool, seek: bool = False) -> Select:
+    """
+    Submission totals per user on one shard, best first. Bound parameters:
+    `success_threshold`, `correct_option_ids`, `limit`, `user_ids` when
+    `filter_by_user_ids`, `excluded_user_ids` otherwise, and the
+    `after_successful`, `after_total` and `after_id` sort key when `seek`.
+    """
+    per_submission = select_per_submission(QuizSubmission.user_id)
+    if filter_by_user_ids:
+        per_submission = per_submission.where(
+            QuizSubmission.user_id == any_(int_array_param("user_ids"))
+        )
+    else:
+        per_submission = per_submission.where(
+            QuizSubmission.user_id != all_(int_array_param("excluded_user_ids"))
+        )
+    per_submission = per_submission.subquery()
+    successful_submissions = count_successful(per_submission)
+
+    query = (
+        select(
+            per_submission.c.user_id,
+            successful_submissions.label("successful_submissions"),
+            func.count().label("total_submissions"),
+            func.sum(per_submission.c.spent_time_seconds).label("total_time_spent_sec"),
+            # Users with submissions on the shard, before the limit
+            func.count().over().label("users_count"),
+        )
+        .group_by(per_submission.c.user_id)
+        .order_by(
+            desc("successful_submissions"),
+            desc("total_submissions"),
+            per_submission.c.user_id,
+        )
+        .limit(bindparam("limit"))
+    )
+
+    if seek:
+        query = query.having(
+            tuple_(-successful_submissions, -func.count(), per_submission.c.user_id)
+            > tuple_(
+                -bindparam("after_successful", type_=Integer),
+                -bindparam("after_total", type_=Integer),
+                bindparam("after_id", type_=Integer),
+            )
+        )
+
+    return query
+
+
+@lru_cache
+def shard_student_quizes_query() -> Select:
+    """
+    Submission totals per quiz of the `user_ids` users on one shard. Bound
+    parameters: `success_threshold`, `correct_option_ids` and `user_ids`.
+    """
+    per_submission = (
+        select_per_submission(QuizSubmission.user_id, QuizSubmission.quiz_id)
+        .where(QuizSubmission.user_id == any_(int_array_param("user_ids")))
+        .subquery()
+    )
+    return (
+        select(
+            per_submission.c.user_id,
+            per_submission.c.quiz_id,
+            count_successful(per_submission).label("successful_submissions_count"),
+            func.count().label("total_submissions_count"),
+            func.avg(per_submission.c.spent_time_seconds).label(
+                "avg_spent_time_seconds"
+            ),
+        )
+        .group_by(per_submission.c.user_id, per_submission.c.quiz_id)
+        .order_by(per_submission.c.user_id, per_submission.c.quiz_id)
+    )
+
+
+@lru_cache
+def shard_active_users_query() -> Select:
+    """The `user_ids` users with submissions on one shard"""
+    return (
+        select(QuizSubmission.user_id)
+        .join(
+            QuizSubmissionAnswer,
+            QuizSubmission.id == QuizSubmissionAnswer.submission_id,
+        )
+        .where(QuizSubmission.user_id == any_(int_array_param("user_ids")))
+        .distinct()
+    )
+
+
+def ranking_key(row: Mapping[str, int]) -> tuple[int, int, int]:
+    """
+    Most successful first, then most active. Shard results are sorted the
+    same way, and students without submissions come last, by id.
+    """
+    return -row["successful_submissions"], -row["total_submissions"], row["user_id"]
+
+
+async def get_users(
+    db_session: AsyncSession, user_ids: list[int]
+) -> dict[int, dict[str, Any]]:
+    result = await db_session.execute(
+        select(User.id, User.username, User.name).where(User.id.in_(user_ids))
+    )
+    return {row.id: {"username": row.username, "name": row.name} for row in result}
+
+
+async def get_non_student_ids(db_session: AsyncSession) -> list[int]:
+    """Editors, left out of the rankings by the shards"""
+    return list(await db_session.scalars(select(User.id).where(User.role != "student")))
+
+
+async def list_inactive_students(
+    db_session: AsyncSession,
+    shards: ShardSet,
+    usernames: list[str] | None,
+    limit: int,
+    offset: int,
+    after_id: int | None = None,
+) -> list[int]:
+    """
+    Ids of the students without submissions, in id order from `after_id`.
+    They rank after the others, which come from the shards.
+    """
+    query = (
+        select(User.id)
+        .where(User.role == "student")
+        .order_by(User.id)
+        .limit(INACTIVE_STUDENTS_BATCH_SIZE)
+    )
+    if usernames:
+        query = query.where(User.username.in_(usernames))
+
+    inactive: list[int] = []
+    last_id = after_id
+    while len(inactive) < offset + limit:
+        batch_query = query if last_id is None else query.where(User.id > last_id)
+        user_ids = list(await db_session.scalars(batch_query))
+        if not user_ids:
+            break
+
+        last_id = user_ids[-1]
+        active = set()
+        for partial in await shards.scatter(
+            db_session,
+            fetch_scalars(shard_active_users_query(), {"user_ids": user_ids}),
+        ):
+            active.update(partial)
+        inactive += [user_id for user_id in user_ids if user_id not in active]
+
+    return inactive[offset : offset + limit]
+
+
+async def get_student_quizes(
+    db_session: AsyncSession,
+    shards: ShardSet,
+    params: dict[str, Any],
+    user_ids: list[int],
+) -> dict[int, list[dict[str, Any]]]:
+    partials = await shards.scatter(
+        db_session,
+        fetch_mappings(shard_student_quizes_query(), params | {"user_ids": user_ids}),
+    )
+    rows = list(chain.from_iterable(partials))
+
+    result = await db_session.execute(
+        select(Quiz.id, Quiz.title).where(Quiz.id.in_({row["quiz_id"] for row in rows}))
+    )
+    titles = dict(result.tuples().all())
+
+    quizes: dict[int, list[dict[str, Any]]] = {user_id: [] for user_id in user_ids}
+    for row in rows:
+        if row["quiz_id"] not in titles:
+            continue
+
+        quizes[row["user_id"]].append(
+            {
+                "id": row["quiz_id"],
+                "title": titles[row["quiz_id"]],
+                "successful_submissions_count": row["successful_submissions_count"],
+                "total_submissions_count": row["total_submissions_count"],
+                "avg_spent_time_seconds": row["avg_spent_time_seconds"],
+            }
+        )
+    return quizes
+
+
+async def list_sharded_students(
+    db_session: AsyncSession,
+    shards: ShardSet,
+    usernames: list[str] | None,
+    success_threshold: float,
+    limit: int,
+    offset: int,
+    out_type: type[StudentSchema],
+    after: tuple[int, int, int] | None,
+    fields: frozenset[str],
+) -> list[StudentSchema]:
+    params: dict[str, Any] = {
+        "success_threshold": success_threshold,
+        "correct_option_ids": await get_correct_option_ids(db_session),
+        # The first students overall are among the first ones of every shard
+        "limit": offset + limit,
+    }
+    if usernames:
+        params["user_ids"] = list(
+            await db_session.scalars(
+                select(User.id).where(
+                    User.role == "student",
+                    User.username.in_(usernames),
+                )
+            )
+        )
+    else:
+        params["excluded_user_ids"] = await get_non_student_ids(db_session)
+    if after is not None:
+        params["after_successful"], params["after_total"], params["after_id"] = after
+
+    partials = await shards.scatter(
+        db_session,
+        fetch_mappings(
+            shard_students_query(bool(usernames), seek=after is not None), params
+        ),
+    )
+    students = [
+        dict(row)
+        for row in islice(
+            heapq.merge(*partials, key=ranking_key), offset, offset + limit
+        )
+    ]
+
+    if len(students) < limit:
+        active_count = sum(partial[0]["users_count"] for partial in partials if partial)
+        # Every student with submissions ranks before a (0, 0, id) cursor
+        inactive = await list_inactive_students(
+            db_session,
+            shards,
+            usernames,
+            limit=limit - len(students),
+            offset=max(offset - active_count, 0),
+            after_id=after[2] if after is not None and after[1] == 0 else None,
+        )
+        students += [
+            {
+                "user_id": user_id,
+                "successful_submissions": 0,
+                "total_submissions": 0,
+                "total_time_spent_sec": 0,
+            }
+            for user_id in inactive
+        ]
+
+    user_ids = [student["user_id"] for student in students]
+    users = await get_users(db_session, user_ids)
+    if "quizes" in fields:
+        quizes = await get_student_quizes(db_session, shards, params, user_ids)
+        for student in students:
+            student["quizes"] = quizes[student["user_id"]]
+    if "total_time_spent_sec" not in fields:
+        # Summed on the shards anyway, along with the sort key
+        for student in students:
+            del student["total_time_spent_sec"]
+
+    ta = get_list_adapter(out_type)
+    return ta.validate_python(
+        [
+            {"id": student["user_id"]} | student | users[student["user_id"]]
+            for student in students
+            if student["user_id"] in users
+        ]
+    )
+
+
+async def get_sharded_student_stats(
+    db_session: AsyncSession,
+    shards: ShardSet,
+    success_threshold: float,
+) -> StudentStats:
+    params = {
+        "success_threshold": success_threshold,
+        "correct_option_ids": await get_correct_option_ids(db_session),
+        "excluded_user_ids": await get_non_student_ids(db_session),
+        "limit": TOP_STUDENTS_COUNT,
+    }
+    partials = await shards.scatter(
+        db_session,
+        fetch_mappings(shard_students_query(filter_by_user_ids=False), params),
+    )
+    top_students = list(
+        islice(heapq.merge(*partials, key=ranking_key), TOP_STUDENTS_COUNT)
+    )
+    users = await get_users(db_session, [row["user_id"] for row in top_students])
+    total_students = await db_session.scalar(
+        select(func.count("*")).where(User.role == "student")
+    )
+
+    return StudentStats(
+        total_students=total_students,
+        top_students=[
+            TopStudent(
+                id=row["user_id"],
+                successful_submissions=row["successful_submissions"],
+                total_submissions=row["total_submissions"],
+                **users[row["user_id"]],
+            )
+            for row in top_students
+            if row["user_id"] in users
+        ],
+    )
@@ -0,0 +1,84 @@
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterable, AsyncIterator
+from enum import Enum
+
+from pydantic import ValidationError
+
+from .schemas import UserImportRow
+
+
+class ImportFormat(Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+CONTENT_TYPES = {
+    "text/csv": ImportFormat.CSV,
+    "application/x-ndjson": ImportFormat.NDJSON,
+    "application/ndjson": ImportFormat.NDJSON,
+    "application/jsonl": ImportFormat.NDJSON,
+}
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a stream of utf-8 encoded chunks into lines"""
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.removesuffix("\r")
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.removesuffix("\r")
+
+
+def _format_error(e: ValueError | csv.Error) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(
+            f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+            for error in e.errors()
+        )
+    return str(e)
+
+
+async def parse_rows(
+    chunks: AsyncIterable[bytes],
+    import_format: ImportFormat,
+) -> AsyncIterator[tuple[int, UserImportRow | str]]:
+    """
+    Parse users from CSV (with a header row) or NDJSON, one line at a time.
+    Yields the 1-based row number with either the parsed row or an error.
+    Quoted CSV values spanning several lines aren't supported.
+    """
+
+    lines = iter_lines(chunks)
+    header: list[str] = []
+    if import_format is ImportFormat.CSV:
+        async for line in lines:
+            if line.strip():
+                header = next(csv.reader([line]))
+                break
+
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+
+        row_number += 1
+        try:
+            if import_format is ImportFormat.CSV:
+                data = dict(zip(header, next(csv.reader([line]))))
+            else:
+                data = json.loads(line)
+            row = UserImportRow.model_validate(data)
+        except (ValueError, csv.Error) as e:
+            yield row_number, _format_error(e)
+            continue
+
+        yield row_number, row
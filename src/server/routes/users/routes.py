@@ -1,10 +1,15 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from starlette import status
+from starlette.responses import JSONResponse
 
 from server.authentication.utils import User, protected_route
 from server.db import DbSession
+from server.schemas import UserRole
+from server.state import import_password_hashing
 
 from . import services
-from .schemas import UserSchema
+from .importing import CONTENT_TYPES, parse_rows
+from .schemas import UserImportResult, UserSchema
 
 router = APIRouter()
 
@@ -13,3 +18,35 @@ router = APIRouter()
 @protected_route
 async def get_me(db_session: DbSession, user: User):
     return await services.get_user(db_session=db_session, username=user.username)
+
+
+@router.post("/import", response_model=UserImportResult)
+@protected_route
+async def import_users(request: Request, db_session: DbSession, user: User):
+    """
+    Create users from a CSV (`text/csv`, with a header row) or NDJSON
+    (`application/x-ndjson`) request body with `username`, `name`,
+    `password` and optional `role` fields. The body is processed as it
+    streams in.
+    """
+
+    content_type = request.headers.get("Content-Type", "").split(";")[0].strip()
+    import_format = CONTENT_TYPES.get(content_type)
+    if import_format is None:
+        return JSONResponse(
+            {"detail": "Expected a text/csv or application/x-ndjson body"},
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+
+    me = await services.get_user(db_session=db_session, username=user.username)
+    if me.role != UserRole.EDITOR.value:
+        return JSONResponse(
+            {"detail": "Only editors are allowed to import users"},
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+
+    return await services.import_users(
+        db_session=db_session,
+        password_hashing=import_password_hashing,
+        rows=parse_rows(request.stream(), import_format),
+    )
@@ -1,6 +1,8 @@
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from server.schemas import UserRole
 
 
 class UserSchema(BaseModel):
@@ -9,3 +11,21 @@ class UserSchema(BaseModel):
     name: str
     role: str
     created_at: datetime
+
+
+class UserImportRow(BaseModel):
+    username: str = Field(min_length=1, max_length=256)
+    name: str = Field(min_length=1, max_length=256)
+    password: str = Field(min_length=1)
+    role: UserRole = UserRole.STUDENT
+
+
+class UserImportError(BaseModel):
+    row: int
+    username: str | None = None
+    detail: str
+
+
+class UserImportResult(BaseModel):
+    imported: int = 0
+    errors: list[UserImportError] = []
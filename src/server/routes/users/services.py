@@ -1,9 +1,17 @@
+import asyncio
+from collections.abc import AsyncIterable
+from datetime import datetime
+
 from sqlalchemy import sql
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from server.authentication.passwords import PasswordHashing
 from server.db.models import User as UserTable
+from server.db.sessions import ReleasingAsyncSession
+
+from .schemas import UserImportError, UserImportResult, UserImportRow, UserSchema
 
-from .schemas import UserSchema
+IMPORT_BATCH_SIZE = 1000
 
 
 async def get_user(db_session: AsyncSession, username: str) -> UserSchema:
@@ -20,3 +28,115 @@ async def get_user(db_session: AsyncSession, username: str) -> UserSchema:
     )
     cursor_result = await db_session.execute(query)
     return UserSchema.model_validate(cursor_result.mappings().one())
+
+
+async def hash_passwords(
+    password_hashing: PasswordHashing, passwords: list[str]
+) -> list[str]:
+    """
+    Hashed as many at once as `password_hashing` has workers, a large batch
+    doesn't queue up all of its passwords ahead of other callers
+    """
+    hashed: list[str] = []
+    chunk_size = password_hashing.max_workers
+    for start in range(0, len(passwords), chunk_size):
+        hashed += await asyncio.gather(
+            *(
+                password_hashing.hash(password)
+                for password in passwords[start : start + chunk_size]
+            )
+        )
+    return hashed
+
+
+async def _import_users_batch(
+    db_session: AsyncSession,
+    password_hashing: PasswordHashing,
+    batch: list[tuple[int, UserImportRow]],
+    result: UserImportResult,
+) -> None:
+    passwords = await hash_passwords(
+        password_hashing, [row.password for _, row in batch]
+    )
+    created_at = datetime.utcnow()
+
+    # Executing through the session first makes the driver open the
+    # transaction the COPY below runs in
+    await db_session.execute(
+        sql.text(
+            "CREATE TEMP TABLE users_import ("
+            "row_number integer, username varchar(256), name varchar(256), "
+            "password varchar(256), role varchar(50), created_at timestamp"
+            ") ON COMMIT DROP"
+        )
+    )
+    connection = await db_session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        "users_import",
+        records=[
+            (row_number, row.username, row.name, password, row.role.value, created_at)
+            for (row_number, row), password in zip(batch, passwords)
+        ],
+        columns=["row_number", "username", "name", "password", "role", "created_at"],
+    )
+    cursor_result = await db_session.execute(
+        sql.text(
+            "INSERT INTO users (username, name, password, role, created_at) "
+            "SELECT DISTINCT ON (username) username, name, password, role, created_at "
+            "FROM users_import ORDER BY username, row_number "
+            "ON CONFLICT (username) DO NOTHING "
+            "RETURNING username"
+        )
+    )
+    inserted = set(cursor_result.scalars())
+    await db_session.commit()
+
+    for row_number, row in batch:
+        if row.username in inserted:
+            inserted.remove(row.username)
+            result.imported += 1
+        else:
+            result.errors.append(
+                UserImportError(
+                    row=row_number,
+                    username=row.username,
+                    detail="Username already exists",
+                )
+            )
+
+
+async def import_users(
+    db_session: AsyncSession,
+    password_hashing: PasswordHashing,
+    rows: AsyncIterable[tuple[int, UserImportRow | str]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> UserImportResult:
+    """
+    Insert users in batches loaded with COPY. Rows that fail to parse or
+    whose username is already taken are reported instead of aborting the
+    import.
+    """
+
+    # Rows stream in and get hashed before each batch is written: don't keep
+    # the transaction of the caller's reads (e.g. its role check) open meanwhile
+    if isinstance(db_session, ReleasingAsyncSession):
+        await db_session.release()
+
+    result = UserImportResult()
+    batch: list[tuple[int, UserImportRow]] = []
+
+    async for row_number, row in rows:
+        if isinstance(row, str):
+            result.errors.append(UserImportError(row=row_number, detail=row))
+            continue
+
+        batch.append((row_number, row))
+        if len(batch) >= batch_size:
+            await _import_users_batch(db_session, password_hashing, batch, result)
+            batch = []
+
+    if batch:
+        await _import_users_batch(db_session, password_hashing, batch, result)
+
+    return result
@@ -1,6 +1,23 @@
 from enum import Enum
+from functools import lru_cache
+from typing import Annotated
+
+from fastapi import Query
+from pydantic import TypeAdapter
 
 
 class UserRole(Enum):
-    EDITOR = 'editor'
-    STUDENT = 'student'
+    EDITOR = "editor"
+    STUDENT = "student"
+
+
+@lru_cache
+def get_list_adapter[T](item_type: type[T]) -> TypeAdapter[list[T]]:
+    """Building an adapter takes longer than most validations, reuse them"""
+    return TypeAdapter(list[item_type])
+
+
+# Ratio of correct answers above which a submission counts as successful.
+# Ratios are compared by their score bin (`server.db.scores`), rounded up to
+# a multiple of 1 / SCORE_BINS: thresholds in between are binned too.
+SuccessThreshold = Annotated[float, Query(ge=0, le=1)]
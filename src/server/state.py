@@ -1,5 +1,38 @@
-from redis.asyncio import Redis
+from concurrent.futures import ThreadPoolExecutor
 
+from .authentication.passwords import PasswordHashing, Pbkdf2Hasher, Sha256Hasher
+from .authentication.protection import RouteProtectionIndex
+from .authentication.revocation import RevocationMirror
 from .config import settings
+from .redis_sharding import create_redis
+from .routes.auth.jwt import JwtValidationCache
 
-redis = Redis.from_url(settings.REDIS_URL)
+redis = create_redis(
+    urls=settings.REDIS_URLS or [settings.REDIS_URL],
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+)
+route_protection = RouteProtectionIndex()
+jwt_cache = JwtValidationCache(
+    jwt_secret=settings.JWT_SECRET,
+    maxsize=settings.JWT_CACHE_SIZE,
+)
+revocations = RevocationMirror(redis)
+password_hashing = PasswordHashing(
+    hasher=Pbkdf2Hasher(iterations=settings.PASSWORD_HASH_ITERATIONS),
+    legacy_hashers=[Sha256Hasher()],
+    max_workers=settings.PASSWORD_HASHING_CONCURRENCY,
+)
+# Imports hash thousands of passwords, in their own pool so that logins
+# don't queue behind them
+import_password_hashing = PasswordHashing(
+    hasher=password_hashing.hasher,
+    max_workers=settings.IMPORT_HASHING_CONCURRENCY,
+)
+
+# Item analyses of large quizes take a core each, at most this many at once
+item_analysis_pool = ThreadPoolExecutor(
+    max_workers=settings.ITEM_ANALYSIS_CONCURRENCY,
+    thread_name_prefix="item-analysis",
+)
@@ -0,0 +1,116 @@
+import operator
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.requests import Request
+
+from server.db.warmup import warm_up_engine
+from server.fields import select_fields
+from server.main import (
+    QUIZ_WARMUP_QUERIES,
+    STUDENT_WARMUP_QUERIES,
+    create_app,
+    db_error_handler,
+)
+from server.routes.quizes.schemas import QuizDetailSchema, QuizSchema
+from server.routes.quizes.services import list_quizes_query
+from server.routes.students.schemas import StudentDetailSchema, StudentSchema
+from server.routes.students.services import list_students_query
+from server.schemas import get_list_adapter
+
+# Nothing listens there, engines only connect when used
+UNREACHABLE_URL = "postgresql+asyncpg://postgres:1@127.0.0.1:1/politeh"
+
+
+def test_create_app_builds_the_routes():
+    first, second = create_app(), create_app()
+    assert first is not second
+
+    paths = {route.path for route in first.routes}
+    assert {"/quizes", "/students", "/auth/login"} <= paths
+    assert paths == {route.path for route in second.routes}
+
+
+def test_list_adapter_is_reused():
+    assert get_list_adapter(QuizSchema) is get_list_adapter(QuizSchema)
+    assert get_list_adapter(QuizSchema).validate_python([]) == []
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement, params):
+        self.statements.append(statement)
+        return self
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return []
+
+
+@pytest.mark.asyncio
+async def test_warm_up_runs_the_route_statements():
+    session = RecordingSession()
+    for query in QUIZ_WARMUP_QUERIES + STUDENT_WARMUP_QUERIES:
+        await query(session)
+
+    # The very statements of the routes, so they hit the compiled cache
+    def quizes(filter_by_ids, seek, schema):
+        fields = select_fields(None, schema)
+        return list_quizes_query(filter_by_ids=filter_by_ids, seek=seek, fields=fields)
+
+    def students(filter_by_usernames, seek, schema):
+        return list_students_query(
+            filter_by_usernames=filter_by_usernames,
+            seek=seek,
+            fields=select_fields(None, schema),
+        )
+
+    expected = [
+        quizes(False, False, QuizSchema),
+        quizes(False, True, QuizSchema),
+        quizes(True, False, QuizDetailSchema),
+        students(False, False, StudentSchema),
+        students(False, True, StudentSchema),
+        students(True, False, StudentDetailSchema),
+    ]
+    assert len(session.statements) == len(expected)
+    assert all(map(operator.is_, session.statements, expected))
+
+
+@pytest.mark.asyncio
+async def test_warm_up_unreachable_database():
+    engine = create_async_engine(UNREACHABLE_URL, pool_size=3)
+
+    async def query(session):
+        raise AssertionError("No connection to run it on")
+
+    assert await warm_up_engine("primary", engine, 10, [query]) == 0
+    assert engine.pool.checkedout() == 0
+
+
+@pytest.mark.asyncio
+async def test_warm_up_disabled():
+    engine = create_async_engine(UNREACHABLE_URL)
+    assert await warm_up_engine("primary", engine, 0) == 0
+    assert engine.pool.checkedin() == 0
+
+
+class QueryCanceled(Exception):
+    sqlstate = "57014"
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_is_gateway_timeout():
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    exc = DBAPIError("SELECT 1", {}, QueryCanceled())
+
+    response = await db_error_handler(request, exc)
+    assert response.status_code == 504
+
+    with pytest.raises(DBAPIError):
+        await db_error_handler(request, DBAPIError("SELECT 1", {}, Exception()))
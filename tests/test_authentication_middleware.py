@@ -1,10 +1,14 @@
+import time
+
 import pytest
 import pytest_asyncio
 from fakeredis.aioredis import FakeRedis
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from httpx import ASGITransport, AsyncClient
+from jose import jwt
 
-from server.authentication.utils import protected_route
+from server.authentication.utils import User, protected_route
 from server.config import settings
 from server.middlewares import AuthenticationMiddleware
 from server.routes.auth.jwt import generate_jwt
@@ -14,9 +18,13 @@ from .settings import BASE_URL
 pytestmark = pytest.mark.asyncio
 
 
+@pytest_asyncio.fixture(scope="function", name="redis")
+async def redis():
+    return FakeRedis()
+
+
 @pytest_asyncio.fixture(scope="function", name="client")
-async def client():
-    redis = FakeRedis()
+async def client(redis: FakeRedis):
     app = FastAPI()
     app.add_middleware(AuthenticationMiddleware, redis=redis)
 
@@ -29,6 +37,15 @@ async def client():
     def protected_endpoint():
         return "hello world"
 
+    @app.get("/me")
+    @protected_route
+    def me_endpoint(user: User):
+        return user.username
+
+    @app.get("/stream")
+    def stream_endpoint():
+        return StreamingResponse(iter([b"hello ", b"world"]))
+
     async with AsyncClient(
         transport=ASGITransport(app),
         base_url=BASE_URL,
@@ -59,3 +76,77 @@ async def test_authentication_middleware_protected_endpoint_authorized(
     )
     assert response.status_code == 200
     assert response.json() == "hello world"
+
+
+async def test_authentication_middleware_protected_endpoint_revoked(
+    client: AsyncClient,
+    redis: FakeRedis,
+):
+    jwt_token = generate_jwt(username="abc", jwt_secret=settings.JWT_SECRET)
+    payload = jwt.decode(token=jwt_token, key=settings.JWT_SECRET)
+    await redis.set(f"revoked:{payload['jti']}", "1")
+    response = await client.get(
+        f"{BASE_URL}/protected",
+        headers={"Authorization": f"Bearer {jwt_token}"},
+    )
+    assert response.status_code == 401
+    assert response.json() == {"detail": "JWT token is revoked"}
+
+
+async def test_authentication_middleware_legacy_token_revoked(
+    client: AsyncClient,
+    redis: FakeRedis,
+):
+    jwt_token = jwt.encode(
+        {"username": "abc", "exp": int(time.time()) + 60},
+        key=settings.JWT_SECRET,
+    )
+    await redis.set(f"revoked:{jwt_token}", "1")
+    response = await client.get(
+        f"{BASE_URL}/protected",
+        headers={"Authorization": f"Bearer {jwt_token}"},
+    )
+    assert response.status_code == 401
+    assert response.json() == {"detail": "JWT token is revoked"}
+
+
+async def test_authentication_middleware_stale_token_generation(
+    client: AsyncClient,
+    redis: FakeRedis,
+):
+    stale_token = generate_jwt(username="abc", jwt_secret=settings.JWT_SECRET)
+    await redis.set("token_generation:abc", 1)
+    current_token = generate_jwt(
+        username="abc",
+        jwt_secret=settings.JWT_SECRET,
+        generation=1,
+    )
+
+    response = await client.get(
+        f"{BASE_URL}/protected",
+        headers={"Authorization": f"Bearer {stale_token}"},
+    )
+    assert response.status_code == 401
+    assert response.json() == {"detail": "JWT token is revoked"}
+
+    response = await client.get(
+        f"{BASE_URL}/protected",
+        headers={"Authorization": f"Bearer {current_token}"},
+    )
+    assert response.status_code == 200
+
+
+async def test_authentication_middleware_sets_user(client: AsyncClient):
+    jwt_token = generate_jwt(username="abc", jwt_secret=settings.JWT_SECRET)
+    response = await client.get(
+        f"{BASE_URL}/me",
+        headers={"Authorization": f"Bearer {jwt_token}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == "abc"
+
+
+async def test_authentication_middleware_streaming_response(client: AsyncClient):
+    response = await client.get(f"{BASE_URL}/stream")
+    assert response.status_code == 200
+    assert response.text == "hello world"
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from fastapi import BackgroundTasks, FastAPI, Request
+
+from server.middlewares import CancelOnDisconnectMiddleware
+
+pytestmark = pytest.mark.asyncio
+
+
+class Client:
+    """Minimal ASGI server side: sends one request, disconnects on demand"""
+
+    def __init__(self, body: list[bytes] | None = None) -> None:
+        self.messages: asyncio.Queue = asyncio.Queue()
+        chunks = body or [b""]
+        for i, chunk in enumerate(chunks):
+            self.messages.put_nowait(
+                {
+                    "type": "http.request",
+                    "body": chunk,
+                    "more_body": i < len(chunks) - 1,
+                }
+            )
+        self.sent: list[dict] = []
+
+    def disconnect(self) -> None:
+        self.messages.put_nowait({"type": "http.disconnect"})
+
+    async def receive(self) -> dict:
+        return await self.messages.get()
+
+    async def send(self, message: dict) -> None:
+        self.sent.append(message)
+
+    async def request(self, app, method: str, path: str):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "headers": [],
+            "scheme": "http",
+            "server": ("test", 80),
+        }
+        await app(scope, self.receive, self.send)
+
+
+@pytest.fixture(name="events")
+def events():
+    return []
+
+
+@pytest.fixture(name="app")
+def app(events: list[str]):
+    app = FastAPI()
+    app.add_middleware(CancelOnDisconnectMiddleware)
+
+    @app.get("/slow")
+    async def slow_endpoint():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+        return "done"
+
+    @app.get("/background")
+    async def background_endpoint(background_tasks: BackgroundTasks):
+        async def task():
+            await asyncio.sleep(0.05)
+            events.append("background done")
+
+        background_tasks.add_task(task)
+        return "done"
+
+    @app.post("/echo")
+    async def echo_endpoint(request: Request):
+        return (await request.body()).decode()
+
+    return app
+
+
+async def test_cancels_handler_on_disconnect(app: FastAPI, events: list[str]):
+    client = Client()
+    request = asyncio.create_task(client.request(app, "GET", "/slow"))
+    await asyncio.sleep(0.05)
+
+    client.disconnect()
+    async with asyncio.timeout(1):
+        await request
+
+    assert events == ["cancelled"]
+    assert client.sent == []
+
+
+async def test_keeps_background_tasks_after_response(
+    app: FastAPI,
+    events: list[str],
+):
+    client = Client()
+    request = asyncio.create_task(client.request(app, "GET", "/background"))
+    while not any(message["type"] == "http.response.body" for message in client.sent):
+        await asyncio.sleep(0.01)
+
+    client.disconnect()
+    await request
+    assert events == ["background done"]
+
+
+async def test_passes_request_body(app: FastAPI):
+    client = Client(body=[b"hello ", b"world"])
+    await client.request(app, "POST", "/echo")
+
+    assert client.sent[0]["status"] == 200
+    assert client.sent[1]["body"] == b'"hello world"'
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.util import greenlet_spawn
+
+from server.db import engine
+from server.db.pool import CountingLRUCache, InstrumentedPool, PoolStats
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self._prepared_statement_cache = CountingLRUCache(10, PoolStats())
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def test_engine_uses_instrumented_pool():
+    assert isinstance(engine.pool, InstrumentedPool)
+
+
+def test_instrumented_pool_counts_checkouts():
+    pool = InstrumentedPool(FakeConnection, pool_size=1, max_overflow=1)
+
+    first, second = pool.connect(), pool.connect()
+    assert (pool.checkedout(), pool.overflow()) == (2, 1)
+    assert pool.stats.checkouts == 2
+    assert pool.stats.connects == 2
+
+    first.invalidate()
+    second.close()
+    assert pool.stats.invalidations == 1
+    assert pool.checkedout() == 0
+
+
+def test_instrumented_pool_counts_statement_cache_hits():
+    pool = InstrumentedPool(FakeConnection, pool_size=1)
+    connection = pool.connect()
+    cache = connection.dbapi_connection._prepared_statement_cache
+
+    assert "SELECT 1" not in cache
+    cache["SELECT 1"] = "statement"
+    assert "SELECT 1" in cache
+    assert pool.stats.statement_cache_hits == 1
+    assert pool.stats.statement_cache_misses == 1
+    connection.close()
+
+
+def test_instrumented_pool_keeps_stats_when_recreated():
+    pool = InstrumentedPool(FakeConnection, pool_size=1)
+    pool.connect().close()
+
+    recreated = pool.recreate()
+    recreated.connect().close()
+    assert recreated.stats is pool.stats
+    assert pool.stats.checkouts == 2
+    assert pool.stats.connects == 2
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool_records_checkout_wait():
+    pool = InstrumentedPool(FakeConnection, pool_size=1, max_overflow=0, timeout=0.1)
+    connection = await greenlet_spawn(pool.connect)
+
+    with pytest.raises(TimeoutError):
+        await greenlet_spawn(pool.connect)
+    assert pool.stats.checkout_wait_max >= 0.1
+
+    await greenlet_spawn(connection.close)
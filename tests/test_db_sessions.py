@@ -0,0 +1,122 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine, event, func, literal, select, text, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from server.config import settings
+from server.db import engine, get_statement_timeout
+from server.db.models import User
+from server.db.sessions import (
+    ROUTE_KEY,
+    STATEMENT_TIMEOUT_KEY,
+    TrackedSession,
+    connection_hold_times,
+    create_session_maker,
+    is_read_only,
+)
+
+
+def test_is_read_only():
+    assert is_read_only(select(User))
+    assert not is_read_only(select(User).with_for_update())
+    assert not is_read_only(update(User).values(name="abc"))
+    assert not is_read_only(text("SELECT 1"))
+
+
+def test_tracked_session_records_connection_hold_time():
+    session = TrackedSession(bind=create_engine("sqlite://"))
+    session.info[ROUTE_KEY] = "GET /tracked"
+
+    session.close()
+    assert "GET /tracked" not in connection_hold_times.routes
+
+    session.execute(select(literal(1)))
+    session.commit()
+    session.execute(select(literal(1)))
+    session.close()
+
+    stats = connection_hold_times.routes["GET /tracked"]
+    assert stats.count == 2
+    assert 0 < stats.max <= stats.total
+
+
+def test_get_statement_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT", 1)
+    monkeypatch.setattr(
+        settings,
+        "DB_STATEMENT_TIMEOUTS",
+        {"/quizes": 10, "/quizes/stats": 30, "GET /quizes/{quiz_id}": 2},
+    )
+    get_statement_timeout.cache_clear()
+
+    assert get_statement_timeout("GET /quizes") == 10
+    assert get_statement_timeout("GET /quizes/stats/scores") == 30
+    assert get_statement_timeout("GET /quizes/{quiz_id}") == 2
+    assert get_statement_timeout("GET /quizesque") == 1
+    assert get_statement_timeout("POST /auth/login") == 1
+    get_statement_timeout.cache_clear()
+
+
+@pytest_asyncio.fixture(scope="function", name="pooled")
+async def pooled():
+    """
+    A session maker on a pool of one connection, and the statements it
+    runs. Needs the test database, skipped when it isn't running.
+    """
+    db_engine = create_async_engine(engine.url, pool_size=1, max_overflow=0)
+    statements: list[str] = []
+
+    @event.listens_for(db_engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    try:
+        async with db_engine.connect():
+            pass
+    except OSError:
+        pytest.skip("The test database isn't running")
+
+    yield create_session_maker(db_engine), statements
+    await db_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_is_local_to_the_transaction(pooled):
+    session_maker, statements = pooled
+    current_timeout = select(func.current_setting("statement_timeout"))
+
+    async def read_timeout(timeout: float) -> str:
+        async with session_maker() as session:
+            session.info[STATEMENT_TIMEOUT_KEY] = timeout
+            assert await session.scalar(current_timeout) == await session.scalar(
+                current_timeout
+            )
+            return await session.scalar(current_timeout)
+
+    assert [await read_timeout(10) for _ in range(3)] == ["10s"] * 3
+    assert await read_timeout(0.05) == "50ms"
+    # Once per transaction
+    assert sum(statement.startswith("SET ") for statement in statements) == 4
+
+    # Code outside of the sessions gets the same pooled connection, without it
+    async with session_maker() as session:
+        assert await session.scalar(current_timeout) == "0"
+
+    with pytest.raises(DBAPIError):
+        async with session_maker() as session:
+            session.info[STATEMENT_TIMEOUT_KEY] = 0.05
+            await session.scalar(select(func.pg_sleep(1)))
+
+
+@pytest.mark.asyncio
+async def test_session_reads_in_one_transaction_until_released(pooled):
+    session_maker, _ = pooled
+
+    async with session_maker() as session:
+        began_at = await session.scalar(select(func.now()))
+        assert await session.scalar(select(func.now())) == began_at
+
+        await session.release()
+        assert not session.in_transaction()
+        assert await session.scalar(select(func.now())) > began_at
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from server.fields import Fields, deferred_fields, select_fields
+from server.routes.quizes.schemas import QuizDetailSchema, QuizSchema
+from server.routes.students.schemas import StudentDetailSchema, StudentSchema
+from server.schemas import get_list_adapter
+
+from .settings import BASE_URL
+
+
+def test_deferred_fields():
+    assert deferred_fields(QuizSchema) == {"questions_count", "avg_time_spent_sec"}
+    assert deferred_fields(QuizDetailSchema) == {
+        "questions_count",
+        "avg_time_spent_sec",
+        "questions",
+    }
+    assert deferred_fields(StudentSchema) == {"total_time_spent_sec"}
+    assert deferred_fields(StudentDetailSchema) == {"total_time_spent_sec", "quizes"}
+
+
+def test_select_fields():
+    assert select_fields(None, QuizSchema) == deferred_fields(QuizSchema)
+    assert select_fields([], QuizSchema) == set()
+    # Always returned fields can be asked for, they don't count
+    assert select_fields(["title,questions_count"], QuizSchema) == {"questions_count"}
+    assert select_fields(["title", " questions ", ""], QuizDetailSchema) == {
+        "questions"
+    }
+
+
+@pytest.mark.parametrize(
+    ("fields", "model"),
+    [
+        (["title,votes"], QuizSchema),
+        (["questions"], QuizSchema),
+        (["quizes"], StudentSchema),
+    ],
+)
+def test_select_unknown_fields(fields: list[str], model):
+    with pytest.raises(ValueError, match="Unknown fields"):
+        select_fields(fields, model)
+
+
+@pytest.mark.asyncio
+async def test_fields_left_out_of_response():
+    app = FastAPI()
+
+    @app.get(
+        "/quizes", response_model=list[QuizSchema], response_model_exclude_unset=True
+    )
+    async def list_quizes(fields: Fields = None):
+        row = {
+            "id": 1,
+            "title": "Quiz",
+            "description": "",
+            "image": None,
+            "created_at": datetime(2024, 1, 1),
+            "questions_count": 3,
+            "total_submissions_count": 5,
+            "successful_submissions_count": 2,
+            "avg_time_spent_sec": 12.5,
+        }
+        selected = select_fields(fields, QuizSchema)
+        omitted = deferred_fields(QuizSchema) - selected
+        return get_list_adapter(QuizSchema).validate_python(
+            [{key: value for key, value in row.items() if key not in omitted}]
+        )
+
+    async with AsyncClient(transport=ASGITransport(app), base_url=BASE_URL) as client:
+        response = await client.get("/quizes", params={"fields": "title"})
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "id": 1,
+                "title": "Quiz",
+                "description": "",
+                "image": None,
+                "created_at": "2024-01-01T00:00:00",
+                "total_submissions_count": 5,
+                "successful_submissions_count": 2,
+            }
+        ]
+
+        response = await client.get("/quizes")
+        assert response.json()[0]["questions_count"] == 3
+        assert response.json()[0]["avg_time_spent_sec"] == 12.5
@@ -0,0 +1,169 @@
+import numpy as np
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from server.db import engine
+from server.db.models import (
+    Quiz,
+    QuizQuestion,
+    QuizQuestionOption,
+    QuizSubmission,
+    QuizSubmissionAnswer,
+    User,
+)
+from server.routes.quizes import services as quizes_services
+from server.routes.quizes.item_analysis import analyze_items
+
+
+@pytest_asyncio.fixture(scope="function", name="db_session")
+async def db_session():
+    """
+    A session in a transaction rolled back at the end. Needs the migrated
+    test database, skipped when it isn't running.
+    """
+    db_engine = create_async_engine(engine.url, poolclass=NullPool)
+    try:
+        async with db_engine.connect() as conn:
+            async with AsyncSession(bind=conn) as session:
+                yield session
+            await conn.rollback()
+    except OSError:
+        pytest.skip("The test database isn't running")
+    finally:
+        await db_engine.dispose()
+
+
+def pack(values) -> bytes:
+    """A packed int4 column, like `string_agg(int4send(column), '')`"""
+    return np.asarray(values, dtype=">i4").tobytes()
+
+
+def test_analyze_items_matches_per_question_statistics():
+    rng = np.random.default_rng(7)
+    question_count, submission_count = 4, 300
+    # Three options per question, the first one correct
+    option_ids = np.arange(100, 100 + question_count * 3)
+    option_questions = np.repeat(np.arange(question_count), 3)
+    option_is_correct = np.tile([True, False, False], question_count)
+
+    ability = rng.random(submission_count)
+    chosen = np.where(
+        rng.random((submission_count, question_count)) < ability[:, None],
+        0,
+        rng.integers(1, 3, (submission_count, question_count)),
+    )
+    selected = option_ids[np.arange(question_count) * 3 + chosen]
+    spent_time = rng.integers(5, 120, (submission_count, question_count))
+    submission_ids = np.repeat(np.arange(submission_count) * 2, question_count)
+
+    statistics = analyze_items(
+        option_ids,
+        option_questions,
+        option_is_correct,
+        question_count,
+        pack(submission_ids),
+        pack(selected.ravel()),
+        pack(spent_time.ravel()),
+    )
+
+    is_correct = (chosen == 0).astype(float)
+    assert statistics.submissions == submission_count
+    assert list(statistics.answers) == [submission_count] * question_count
+    np.testing.assert_allclose(statistics.difficulty, is_correct.mean(axis=0))
+    for question in range(question_count):
+        rest_score = is_correct.sum(axis=1) - is_correct[:, question]
+        assert statistics.discrimination[question] == pytest.approx(
+            np.corrcoef(is_correct[:, question], rest_score)[0, 1]
+        )
+        assert statistics.time_correlation[question] == pytest.approx(
+            np.corrcoef(is_correct[:, question], spent_time[:, question])[0, 1]
+        )
+    assert list(statistics.selections) == list(
+        np.bincount((np.arange(question_count) * 3 + chosen).ravel(), minlength=12)
+    )
+
+
+def test_analyze_items_undefined_statistics():
+    # The second question has no answers, the first one is always correct.
+    # Option 7 isn't one of the quiz.
+    statistics = analyze_items(
+        [1, 2, 3, 4],
+        [0, 0, 1, 1],
+        [True, False, True, False],
+        2,
+        pack([10, 11, 12]),
+        pack([1, 1, 7]),
+        pack([5, 9, 3]),
+    )
+    assert statistics.submissions == 2
+    assert list(statistics.answers) == [2, 0]
+    assert statistics.difficulty[0] == 1
+    assert np.isnan(statistics.difficulty[1])
+    assert np.isnan(statistics.discrimination).all()
+    assert np.isnan(statistics.time_correlation).all()
+    assert list(statistics.selections) == [2, 0, 0, 0]
+
+
+@pytest.mark.asyncio
+async def test_get_item_analysis(db_session: AsyncSession):
+    quiz = Quiz(title="Items", description="")
+    users = [
+        User(username=f"items-{i}", name="Items", password="", role="student")
+        for i in range(3)
+    ]
+    db_session.add_all([quiz, *users])
+    await db_session.flush()
+
+    questions = [QuizQuestion(quiz_id=quiz.id, title=f"Q{i}") for i in range(2)]
+    db_session.add_all(questions)
+    await db_session.flush()
+
+    options = [
+        [
+            QuizQuestionOption(question_id=question.id, text=str(i), is_correct=i == 0)
+            for i in range(2)
+        ]
+        for question in questions
+    ]
+    db_session.add_all([option for pair in options for option in pair])
+    await db_session.flush()
+
+    submissions = [QuizSubmission(user_id=user.id, quiz_id=quiz.id) for user in users]
+    db_session.add_all(submissions)
+    await db_session.flush()
+
+    # Both right, the first one right, both wrong
+    choices = [(0, 0), (0, 1), (1, 1)]
+    db_session.add_all(
+        [
+            QuizSubmissionAnswer(
+                submission_id=submission.id,
+                question_id=question.id,
+                selected_option_id=options[index][choice].id,
+                spent_time_seconds=10 * (choice + 1),
+            )
+            for submission, submission_choices in zip(submissions, choices)
+            for index, (question, choice) in enumerate(
+                zip(questions, submission_choices)
+            )
+        ]
+    )
+    await db_session.flush()
+
+    analysis = await quizes_services.get_item_analysis(db_session, quiz.id)
+    assert analysis.submissions == 3
+    first, second = analysis.questions
+    assert (first.answers, second.answers) == (3, 3)
+    assert first.difficulty == pytest.approx(2 / 3)
+    assert second.difficulty == pytest.approx(1 / 3)
+    assert first.discrimination == pytest.approx(0.5)
+    # Correct answers took 10 seconds, wrong ones 20
+    assert first.time_correlation == pytest.approx(-1)
+    assert [
+        (option.text, option.selections, option.selection_rate)
+        for option in first.options
+    ] == [("0", 2, pytest.approx(2 / 3)), ("1", 1, pytest.approx(1 / 3))]
+
+    assert await quizes_services.get_item_analysis(db_session, -1) is None
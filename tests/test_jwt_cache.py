@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+import time_machine
+
+from server.config import settings
+from server.routes.auth.jwt import (
+    InvalidJwtTokenException,
+    JwtValidationCache,
+    generate_jwt,
+)
+
+
+def test_jwt_cache_hits_and_misses():
+    cache = JwtValidationCache(jwt_secret=settings.JWT_SECRET)
+    token = generate_jwt(username="abc", jwt_secret=settings.JWT_SECRET)
+
+    first = cache.validate(token)
+    second = cache.validate(token)
+
+    assert first == second
+    assert first["username"] == "abc"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_jwt_cache_is_bounded():
+    cache = JwtValidationCache(jwt_secret=settings.JWT_SECRET, maxsize=2)
+    tokens = [
+        generate_jwt(username=username, jwt_secret=settings.JWT_SECRET)
+        for username in ("a", "b", "c")
+    ]
+
+    for token in tokens:
+        cache.validate(token)
+
+    assert len(cache) == 2
+    cache.validate(tokens[0])
+    assert cache.hits == 0
+
+
+def test_jwt_cache_expires_at_token_exp():
+    now = datetime.now()
+    cache = JwtValidationCache(jwt_secret=settings.JWT_SECRET)
+
+    with time_machine.travel(now, tick=False):
+        token = generate_jwt(username="abc", jwt_secret=settings.JWT_SECRET)
+        cache.validate(token)
+
+    with time_machine.travel(now + timedelta(days=1, seconds=1), tick=False):
+        with pytest.raises(InvalidJwtTokenException):
+            cache.validate(token)
+
+    assert cache.hits == 0
+
+
+def test_jwt_cache_evict():
+    cache = JwtValidationCache(jwt_secret=settings.JWT_SECRET)
+    token = generate_jwt(username="abc", jwt_secret=settings.JWT_SECRET)
+
+    cache.validate(token)
+    cache.evict(token)
+    cache.validate(token)
+
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_jwt_cache_rejects_invalid_token():
+    cache = JwtValidationCache(jwt_secret=settings.JWT_SECRET)
+
+    with pytest.raises(InvalidJwtTokenException):
+        cache.validate("abcd")
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+from jose import jwt
+
+from server.routes.auth.jwt import Hs256Codec, InvalidJwtTokenException
+
+SECRET = "12345678"
+
+
+def exp_in(seconds: int) -> int:
+    return int(time.time()) + seconds
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"username": "abc", "exp": 1731884462},
+        {"username": "abc", "exp": 1731884462, "jti": "Zm9vYmFyYmF6cXV4", "gen": 3},
+        {"username": "Олександр 🎓", "exp": 1731884462},
+        {"exp": 1731884462, "roles": ["editor"], "nested": {"a": None, "b": 1.5}},
+    ],
+)
+def test_hs256_codec_encode_matches_jose(claims: dict):
+    assert Hs256Codec(SECRET).encode(claims) == jwt.encode(
+        claims, key=SECRET, algorithm="HS256"
+    )
+
+
+def test_hs256_codec_decodes_jose_tokens():
+    claims = {"username": "abc", "exp": exp_in(60), "jti": "x"}
+    token = jwt.encode(claims, key=SECRET, algorithm="HS256")
+
+    assert Hs256Codec(SECRET).decode(token) == claims
+
+
+def test_hs256_codec_decodes_foreign_header():
+    claims = {"username": "abc", "exp": exp_in(60)}
+    token = jwt.encode(claims, key=SECRET, algorithm="HS256", headers={"kid": "1"})
+
+    assert Hs256Codec(SECRET).decode(token) == claims
+
+
+def test_jose_decodes_hs256_codec_tokens():
+    claims = {"username": "abc", "exp": exp_in(60)}
+    token = Hs256Codec(SECRET).encode(claims)
+
+    assert jwt.decode(token, key=SECRET, algorithms=["HS256"]) == claims
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "",
+        "abcd",
+        "a.b",
+        "a.b.c.d",
+        "!!!.###.$$$",
+        jwt.encode({"username": "abc", "exp": exp_in(60)}, key="other"),
+        jwt.encode(
+            {"username": "abc", "exp": exp_in(60)}, key=SECRET, algorithm="HS512"
+        ),
+        jwt.encode({"username": "abc", "exp": exp_in(-60)}, key=SECRET),
+        jwt.encode({"username": "abc", "exp": "soon"}, key=SECRET),
+        jwt.encode({"username": "abc"}, key=SECRET),
+        jwt.encode(
+            {"username": "abc", "exp": exp_in(60), "nbf": exp_in(30)}, key=SECRET
+        ),
+    ],
+)
+def test_hs256_codec_rejects_invalid_tokens(token: str):
+    with pytest.raises(InvalidJwtTokenException):
+        Hs256Codec(SECRET).decode(token)
+
+
+def test_hs256_codec_rejects_tampered_claims():
+    codec = Hs256Codec(SECRET)
+    header, _, signature = codec.encode({"username": "abc", "exp": exp_in(60)}).split(
+        "."
+    )
+    _, claims, _ = codec.encode({"username": "root", "exp": exp_in(60)}).split(".")
+
+    with pytest.raises(InvalidJwtTokenException):
+        codec.decode(f"{header}.{claims}.{signature}")
+
+
+def test_hs256_codec_rejects_none_algorithm():
+    codec = Hs256Codec(SECRET)
+    _, claims, signature = codec.encode({"username": "abc", "exp": exp_in(60)}).split(
+        "."
+    )
+    header = "eyJhbGciOiJub25lIiwidHlwIjoiSldUIn0"  # {"alg":"none","typ":"JWT"}
+
+    with pytest.raises(InvalidJwtTokenException):
+        codec.decode(f"{header}.{claims}.{signature}")
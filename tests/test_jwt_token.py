@@ -5,7 +5,7 @@ import time_machine
 from jose import jwt
 
 from server.config import settings
-from server.routes.auth.jwt import generate_jwt, validate_jwt_token
+from server.routes.auth.jwt import generate_jwt, get_token_id, validate_jwt_token
 
 
 def test_generate_jwt_token():
@@ -14,10 +14,30 @@ def test_generate_jwt_token():
 
     with time_machine.travel(now):
         jwt_token = generate_jwt(username=username, jwt_secret=settings.JWT_SECRET)
-        assert jwt.decode(token=jwt_token, key=settings.JWT_SECRET) == {
+        payload = jwt.decode(token=jwt_token, key=settings.JWT_SECRET)
+        assert payload == {
             "username": username,
             "exp": now + int(timedelta(days=1).total_seconds()),
+            "jti": payload["jti"],
+            "gen": 0,
         }
+        assert len(payload["jti"]) == 16
+
+
+def test_generate_jwt_token_unique_id():
+    tokens = [
+        generate_jwt(username="abc", jwt_secret=settings.JWT_SECRET) for _ in range(2)
+    ]
+    token_ids = {
+        get_token_id(token, validate_jwt_token(token, settings.JWT_SECRET))
+        for token in tokens
+    }
+    assert len(token_ids) == 2
+
+
+def test_get_token_id_legacy_token():
+    token = jwt.encode({"username": "abc", "exp": 0}, key=settings.JWT_SECRET)
+    assert get_token_id(token, {"username": "abc", "exp": 0}) == token
 
 
 @pytest.mark.parametrize(
@@ -39,10 +59,10 @@ def test_generate_validate_jwt_token_valid_token():
 
     with time_machine.travel(now):
         jwt_token = generate_jwt(username=username, jwt_secret=settings.JWT_SECRET)
-        assert validate_jwt_token(
-            token=jwt_token,
-            jwt_secret=settings.JWT_SECRET,
-        ) == {
+        payload = validate_jwt_token(token=jwt_token, jwt_secret=settings.JWT_SECRET)
+        assert payload == {
             "username": username,
             "exp": now + int(timedelta(days=1).total_seconds()),
+            "jti": payload["jti"],
+            "gen": 0,
         }
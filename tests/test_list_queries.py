@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+
+from server.routes.quizes.services import list_quizes_query, quiz_stats_query
+from server.routes.students.services import list_students_query
+
+
+@pytest.mark.parametrize(
+    ("build", "filter_param"),
+    [
+        (lambda filtered: list_quizes_query(filter_by_ids=filtered), "ids"),
+        (
+            lambda filtered: list_students_query(filter_by_usernames=filtered),
+            "usernames",
+        ),
+    ],
+)
+def test_list_query_is_built_once_per_shape(build, filter_param: str):
+    assert build(True) is build(True)
+    assert build(False) is not build(True)
+
+    params = build(True).compile(dialect=asyncpg_dialect()).params
+    for name in ("success_threshold", "limit", "offset", filter_param):
+        assert name in params
+    assert filter_param not in build(False).compile(dialect=asyncpg_dialect()).params
+
+
+@pytest.mark.parametrize("build", [list_quizes_query, quiz_stats_query])
+def test_quiz_ids_filter_every_aggregation(build):
+    # The quizes, the submission scores and the answers (or submissions)
+    statement = str(build(filter_by_ids=True).compile(dialect=asyncpg_dialect()))
+    assert statement.count("IN (__[POSTCOMPILE_ids])") == 3
+
+    assert build(filter_by_ids=True) is build(filter_by_ids=True)
+    params = build(filter_by_ids=False).compile(dialect=asyncpg_dialect()).params
+    assert "ids" not in params
+
+
+@pytest.mark.parametrize("build", [list_quizes_query, list_students_query])
+def test_list_query_seeks_after_cursor(build):
+    assert build(False, seek=True) is build(False, seek=True)
+    assert build(False, seek=True) is not build(False)
+
+    params = build(False, seek=True).compile(dialect=asyncpg_dialect()).params
+    for name in ("after_successful", "after_total", "after_id"):
+        assert name in params
+    assert "after_id" not in build(False).compile(dialect=asyncpg_dialect()).params
+
+
+@pytest.mark.parametrize(
+    ("build", "aggregates"),
+    [
+        (list_quizes_query, {"questions_count", "avg_time_spent_sec", "questions"}),
+        (list_students_query, {"total_time_spent_sec", "quizes"}),
+    ],
+)
+def test_list_query_selects_requested_aggregates(build, aggregates: set[str]):
+    full = build(False)
+    assert set(full.selected_columns.keys()) >= aggregates
+    assert "json_build_object" in str(full.compile(dialect=asyncpg_dialect()))
+
+    counts_only = build(False, fields=frozenset())
+    assert counts_only is build(False, fields=frozenset())
+    assert not set(counts_only.selected_columns.keys()) & aggregates
+    statement = str(counts_only.compile(dialect=asyncpg_dialect()))
+    for omitted in ("json_build_object", "array_agg", "quiz_submission_answer"):
+        assert omitted not in statement
@@ -0,0 +1,173 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from server.db import engine
+from server.db.partitions import (
+    add_months,
+    create_partition_sql,
+    create_partitions,
+    iter_months,
+    list_partitions,
+    month_start,
+    parse_partition_name,
+    partition_name,
+    remove_expired_partitions,
+)
+from server.routes.platform_stats import services
+
+# page_views as created by the migrations, in a schema of its own
+SCRATCH_SCHEMA = "test_page_view_partitions"
+PARENT_DDL = """
+    CREATE TABLE page_views (
+        id SERIAL,
+        user_id INTEGER NOT NULL,
+        url VARCHAR(256) NOT NULL,
+        duration INTEGER,
+        created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+"""
+
+
+def test_months():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert list(iter_months(date(2024, 11, 20), date(2025, 1, 1))) == [
+        date(2024, 11, 1),
+        date(2024, 12, 1),
+    ]
+
+
+def test_partition_names():
+    assert partition_name(date(2024, 3, 1)) == "page_views_2024_03"
+    assert parse_partition_name("page_views_2024_03") == date(2024, 3, 1)
+    assert parse_partition_name("page_views_unpartitioned") is None
+    assert create_partition_sql(date(2024, 12, 1)) == (
+        "CREATE TABLE page_views_2024_12 PARTITION OF page_views"
+        " FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')"
+    )
+
+
+def get_current_month() -> date:
+    return month_start(datetime.now().date())
+
+
+@pytest_asyncio.fixture(scope="function", name="conn")
+async def conn():
+    """
+    A transaction with a partitioned page_views covering the last year and
+    the next three months, rolled back at the end. Needs the test
+    database, skipped when it isn't running.
+    """
+    current_month = get_current_month()
+    db_engine = create_async_engine(engine.url, poolclass=NullPool)
+    try:
+        async with db_engine.connect() as conn:
+            await conn.exec_driver_sql(f"CREATE SCHEMA {SCRATCH_SCHEMA}")
+            await conn.exec_driver_sql(f"SET LOCAL search_path TO {SCRATCH_SCHEMA}")
+            await conn.exec_driver_sql(PARENT_DDL)
+            await conn.run_sync(
+                create_partitions,
+                add_months(current_month, -12),
+                add_months(current_month, 4),
+            )
+            yield conn
+            await conn.rollback()
+    except OSError:
+        pytest.skip("The test database isn't running")
+    finally:
+        await db_engine.dispose()
+
+
+async def get_scanned_partitions(conn: AsyncConnection, call) -> list[list[str]]:
+    """Run the service call, then list the scans in the plan of every query"""
+    statements = []
+
+    def capture(_conn, _cursor, statement, parameters, _context, _executemany):
+        statements.append((statement, parameters))
+
+    event.listen(conn.sync_connection, "before_cursor_execute", capture)
+    try:
+        async with AsyncSession(bind=conn) as session:
+            await call(session)
+    finally:
+        event.remove(conn.sync_connection, "before_cursor_execute", capture)
+
+    scanned = []
+    for statement, parameters in statements:
+        plan = await conn.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}",
+            tuple(parameters),
+        )
+        scanned.append(sorted(iter_relations(plan.scalar()[0]["Plan"])))
+    return scanned
+
+
+def iter_relations(node: dict):
+    if "Relation Name" in node:
+        yield node["Relation Name"]
+    for child in node.get("Plans", []):
+        yield from iter_relations(child)
+
+
+def get_partition_names(start: date, end: date) -> list[str]:
+    return [partition_name(month) for month in iter_months(start, end)]
+
+
+@pytest.mark.asyncio
+async def test_partition_maintenance(conn: AsyncConnection):
+    current_month = get_current_month()
+    assert len(await conn.run_sync(list_partitions)) == 16
+
+    removed = await conn.run_sync(remove_expired_partitions, current_month, 3)
+    assert removed == get_partition_names(
+        add_months(current_month, -12),
+        add_months(current_month, -3),
+    )
+    assert sorted(await conn.run_sync(list_partitions)) == get_partition_names(
+        add_months(current_month, -3),
+        add_months(current_month, 4),
+    )
+
+
+@pytest.mark.asyncio
+async def test_daily_stats_scan_requested_months(conn: AsyncConnection):
+    current_month = get_current_month()
+    [scanned] = await get_scanned_partitions(
+        conn,
+        lambda session: services.get_daily_platform_stats_distribution(
+            session,
+            start_date=add_months(current_month, -6) + timedelta(days=9),
+            end_date=add_months(current_month, -4) - timedelta(days=1),
+        ),
+    )
+    assert scanned == get_partition_names(
+        add_months(current_month, -6),
+        add_months(current_month, -4),
+    )
+
+
+@pytest.mark.asyncio
+async def test_platform_stats_scans(conn: AsyncConnection):
+    current_month = get_current_month()
+    await conn.exec_driver_sql(
+        "INSERT INTO page_views (user_id, url, created_at) VALUES (1, '/quiz/1', now())"
+    )
+    views_per_url, monthly_active_users = await get_scanned_partitions(
+        conn, services.get_platform_stats
+    )
+
+    # The most popular page is over all time, monthly active users are not
+    assert views_per_url == get_partition_names(
+        add_months(current_month, -12),
+        add_months(current_month, 4),
+    )
+    assert monthly_active_users == get_partition_names(
+        datetime.now().date() - timedelta(days=30),
+        add_months(current_month, 4),
+    )
@@ -0,0 +1,29 @@
+import base64
+
+import pytest
+
+from server.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor([12, 0, 345])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 3) == (12, 0, 345)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not a cursor",
+        base64.urlsafe_b64encode(b"\xff").decode(),
+        base64.urlsafe_b64encode(b'{"id": 1}').decode(),
+        base64.urlsafe_b64encode(b"[1, 2]").decode(),
+        base64.urlsafe_b64encode(b"[1, 2.5, 3]").decode(),
+        base64.urlsafe_b64encode(b'[1, "2", 3]').decode(),
+        base64.urlsafe_b64encode(b"[true, 2, 3]").decode(),
+    ],
+)
+def test_invalid_cursor(cursor: str):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 3)
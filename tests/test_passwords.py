@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from server.authentication.passwords import (
+    PasswordHashing,
+    Pbkdf2Hasher,
+    Sha256Hasher,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(name="password_hashing")
+def password_hashing():
+    password_hashing = PasswordHashing(
+        hasher=Pbkdf2Hasher(iterations=1000),
+        legacy_hashers=[Sha256Hasher()],
+        max_workers=2,
+    )
+    yield password_hashing
+    password_hashing.shutdown()
+
+
+async def test_password_hashing_roundtrip(password_hashing: PasswordHashing):
+    hashed = await password_hashing.hash("secret")
+
+    assert hashed.startswith("pbkdf2_sha256$1000$")
+    assert await password_hashing.verify("secret", hashed) == (True, False)
+    assert await password_hashing.verify("wrong", hashed) == (False, False)
+
+
+async def test_password_hashing_legacy_sha256(password_hashing: PasswordHashing):
+    hashed = hashlib.sha256(b"secret").hexdigest()
+
+    assert await password_hashing.verify("secret", hashed) == (True, True)
+    assert await password_hashing.verify("wrong", hashed) == (False, False)
+
+
+async def test_password_hashing_weaker_hash_needs_rehash(
+    password_hashing: PasswordHashing,
+):
+    hashed = Pbkdf2Hasher(iterations=10).hash("secret")
+    assert await password_hashing.verify("secret", hashed) == (True, True)
+
+
+@pytest.mark.parametrize("hashed", ["", "plain", "pbkdf2_sha256$x$y"])
+async def test_password_hashing_unknown_hash(
+    password_hashing: PasswordHashing,
+    hashed: str,
+):
+    assert await password_hashing.verify("secret", hashed) == (False, False)
+
+
+async def test_password_hashing_concurrency_cap(password_hashing: PasswordHashing):
+    await asyncio.gather(*(password_hashing.hash("secret") for _ in range(6)))
+
+    assert password_hashing.completed == 6
+    assert password_hashing.waiting == password_hashing.in_progress == 0
+    assert password_hashing.queue_time_max > 0
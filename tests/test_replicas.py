@@ -0,0 +1,83 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.requests import Request
+
+import server.db
+from server.db import get_read_only_session
+from server.db.replicas import Replica, ReplicaSet
+
+pytestmark = pytest.mark.asyncio
+
+# Nothing listens there, engines only connect when used
+UNREACHABLE_URL = "postgresql+asyncpg://postgres:1@127.0.0.1:1/politeh"
+
+
+def make_replica(name: str, lag: float | None) -> Replica:
+    replica = Replica(name=name, engine=create_async_engine(UNREACHABLE_URL))
+    replica.lag = lag
+    return replica
+
+
+@pytest_asyncio.fixture(scope="function", name="primary")
+async def primary():
+    return async_sessionmaker(create_async_engine(UNREACHABLE_URL))
+
+
+def make_replica_set(primary, replicas: list[Replica]) -> ReplicaSet:
+    return ReplicaSet(
+        primary=primary,
+        primary_engine=primary.kw["bind"],
+        replicas=replicas,
+        max_lag_seconds=5,
+    )
+
+
+async def test_replica_set_without_replicas_uses_primary(primary):
+    replicas = make_replica_set(primary, [])
+    assert replicas.get_session_maker() is primary
+
+
+async def test_replica_set_balances_replicas(primary):
+    first, second = make_replica("first", 0), make_replica("second", 1.5)
+    replicas = make_replica_set(primary, [first, second])
+
+    session_makers = {replicas.get_session_maker() for _ in range(4)}
+    assert session_makers == {first.session_maker, second.session_maker}
+
+
+async def test_replica_set_skips_lagging_replicas(primary):
+    lagging, unchecked = make_replica("lagging", 30), make_replica("unchecked", None)
+    replicas = make_replica_set(primary, [lagging, unchecked])
+
+    assert replicas.get_available() == []
+    assert replicas.get_session_maker() is primary
+
+
+async def test_replica_set_read_your_writes(primary):
+    replicas = make_replica_set(primary, [make_replica("replica", 0)])
+    assert replicas.get_session_maker(read_your_writes=True) is primary
+
+
+async def test_replica_set_unreachable_replica(primary):
+    replica = make_replica("replica", 0)
+    replicas = make_replica_set(primary, [replica])
+
+    await replicas.check_lag()
+    assert replica.lag is None
+    assert replicas.get_session_maker() is primary
+
+
+async def test_read_only_session_read_your_writes_header(primary, monkeypatch):
+    replica = make_replica("replica", 0)
+    monkeypatch.setattr(server.db, "replicas", make_replica_set(primary, [replica]))
+
+    async def get_bind(headers: list[tuple[bytes, bytes]]):
+        request = Request(
+            {"type": "http", "method": "GET", "path": "/", "headers": headers}
+        )
+        async for session in get_read_only_session(request):
+            return session.bind
+
+    assert await get_bind([]) is replica.engine
+    assert await get_bind([(b"x-read-your-writes", b"1")]) is primary.kw["bind"]
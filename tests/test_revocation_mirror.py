@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+
+from server.authentication.revocation import (
+    RevocationMirror,
+    revoke_token,
+    revoke_user_tokens,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def wait_for(predicate) -> None:
+    async with asyncio.timeout(2):
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+
+@pytest_asyncio.fixture(scope="function", name="redis")
+async def redis():
+    return FakeRedis()
+
+
+@pytest_asyncio.fixture(scope="function", name="mirror")
+async def mirror(redis: FakeRedis):
+    await redis.set("revoked:old", "1", ex=60)
+    await redis.set("token_generation:abc", 2)
+
+    mirror = RevocationMirror(redis)
+    assert mirror.is_revoked("old") is None
+
+    await mirror.start()
+    await wait_for(lambda: mirror.ready)
+    yield mirror
+    await mirror.stop()
+
+
+async def test_revocation_mirror_loads_existing_keys(mirror: RevocationMirror):
+    assert mirror.is_revoked("old") is True
+    assert mirror.is_revoked("other") is False
+
+
+async def test_revocation_mirror_receives_revocations(
+    redis: FakeRedis,
+    mirror: RevocationMirror,
+):
+    expires_at = int(time.time()) + 60
+    await revoke_token(redis=redis, token_id="new", expires_at=expires_at)
+
+    await wait_for(lambda: mirror.is_revoked("new"))
+    assert 0 < await redis.ttl("revoked:new") <= 60
+
+
+async def test_revocation_mirror_loads_token_generations(mirror: RevocationMirror):
+    assert mirror.get_generation("abc") == 2
+    assert mirror.get_generation("other") == 0
+
+
+async def test_revocation_mirror_receives_token_generations(
+    redis: FakeRedis,
+    mirror: RevocationMirror,
+):
+    assert await revoke_user_tokens(redis=redis, username="abc") == 3
+
+    await wait_for(lambda: mirror.get_generation("abc") == 3)
+
+
+async def test_revocation_mirror_drops_expired_tokens(mirror: RevocationMirror):
+    mirror.add("expired", expires_at=0)
+    assert mirror.is_revoked("expired") is False
+
+
+async def test_revocation_mirror_not_ready_after_stop(mirror: RevocationMirror):
+    await mirror.stop()
+    assert mirror.is_revoked("old") is None
+    assert mirror.get_generation("abc") is None
@@ -0,0 +1,76 @@
+import pytest
+from fastapi import APIRouter, FastAPI
+
+from server.authentication.protection import RouteProtectionIndex
+from server.authentication.utils import protected_route
+
+
+def endpoint():
+    pass
+
+
+@protected_route
+def protected_endpoint():
+    pass
+
+
+@pytest.fixture(name="app")
+def app():
+    router = APIRouter()
+    router.add_api_route("", protected_endpoint, methods=["GET"])
+    router.add_api_route("/stats", protected_endpoint, methods=["GET"])
+    router.add_api_route("/{id}", endpoint, methods=["GET"])
+    router.add_api_route("/{id}", protected_endpoint, methods=["DELETE"])
+
+    app = FastAPI()
+    app.include_router(router, prefix="/quizes")
+    app.add_api_route("/{page}", endpoint, methods=["GET"])
+
+    sub_app = FastAPI()
+    sub_app.add_api_route("/items/{id}", protected_endpoint, methods=["GET"])
+    app.mount("/sub", sub_app)
+    return app
+
+
+def scope(method: str, path: str) -> dict:
+    return {"type": "http", "method": method, "path": path, "root_path": ""}
+
+
+@pytest.mark.parametrize(
+    "method, path, protected",
+    [
+        ("GET", "/quizes", True),
+        ("GET", "/quizes/stats", True),
+        ("GET", "/quizes/1", False),
+        ("DELETE", "/quizes/1", True),
+        ("POST", "/quizes/1", False),
+        ("GET", "/about", False),
+        ("GET", "/sub/items/1", True),
+        ("GET", "/missing/path/here", False),
+    ],
+)
+def test_route_protection_index(app: FastAPI, method: str, path: str, protected: bool):
+    index = RouteProtectionIndex()
+    assert index.is_protected(app.routes, scope(method, path)) is protected
+
+
+def test_route_protection_index_first_match_wins():
+    app = FastAPI()
+    app.add_api_route("/users/{username}", endpoint, methods=["GET"])
+    app.add_api_route("/users/me", protected_endpoint, methods=["GET"])
+
+    index = RouteProtectionIndex()
+    assert not index.is_protected(app.routes, scope("GET", "/users/me"))
+
+
+def test_route_protection_index_invalidation(app: FastAPI):
+    index = RouteProtectionIndex()
+    index.build(app.routes)
+    assert not index.is_stale(app.routes)
+
+    app.add_api_route("/late/route", protected_endpoint, methods=["GET"])
+    assert index.is_stale(app.routes)
+    assert index.is_protected(app.routes, scope("GET", "/late/route"))
+
+    index.invalidate()
+    assert index.is_stale(app.routes)
@@ -0,0 +1,335 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from redis.exceptions import ConnectionError
+
+from server.authentication import revocation
+from server.authentication.revocation import (
+    RevocationMirror,
+    revoke_token,
+    revoke_user_tokens,
+)
+from server.authentication.utils import protected_route
+from server.config import settings
+from server.middlewares import AuthenticationMiddleware
+from server.redis_sharding import (
+    HashRing,
+    RedisNodeUnavailable,
+    ShardedRedis,
+    create_redis,
+)
+from server.routes.auth.jwt import generate_jwt, get_token_id, validate_jwt_token
+
+from .settings import BASE_URL
+
+NODE_NAMES = ["redis://node-a", "redis://node-b", "redis://node-c"]
+
+
+@pytest_asyncio.fixture(scope="function", name="servers")
+async def servers():
+    return {name: FakeServer() for name in NODE_NAMES}
+
+
+@pytest_asyncio.fixture(scope="function", name="redis")
+async def redis(servers: dict[str, FakeServer]):
+    return ShardedRedis(
+        {name: FakeRedis(server=server) for name, server in servers.items()}
+    )
+
+
+@pytest_asyncio.fixture(scope="function", name="idle_server")
+async def idle_server():
+    """
+    A Redis server over TCP that never publishes anything, unlike FakeRedis
+    its clients honor their socket timeout. Empty, records the commands it
+    gets.
+    """
+    commands: list[bytes] = []
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed = False
+        while line := await reader.readline():
+            args = []
+            for _ in range(int(line[1:])):
+                length = int((await reader.readline())[1:])
+                args.append((await reader.readexactly(length + 2))[:-2])
+
+            command = args[0].upper()
+            commands.append(command)
+            if command == b"SUBSCRIBE":
+                subscribed = True
+                writer.write(
+                    b"*3\r\n$9\r\nsubscribe\r\n"
+                    b"$%d\r\n%s\r\n:1\r\n" % (len(args[1]), args[1])
+                )
+            elif command == b"PING" and subscribed:
+                message = args[1] if len(args) > 1 else b""
+                writer.write(
+                    b"*2\r\n$4\r\npong\r\n$%d\r\n%s\r\n" % (len(message), message)
+                )
+            elif command == b"PING":
+                writer.write(b"+PONG\r\n")
+            elif command == b"SCAN":
+                writer.write(b"*2\r\n$1\r\n0\r\n*0\r\n")
+            else:
+                writer.write(b"+OK\r\n")
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    yield f"redis://127.0.0.1:{port}", commands
+    server.close()
+
+
+def test_hash_ring_spreads_keys():
+    ring = HashRing(NODE_NAMES)
+    owners = [ring.get(f"revoked:{i}") for i in range(3000)]
+
+    for name in NODE_NAMES:
+        assert 700 < owners.count(name) < 1300
+
+
+def test_hash_ring_moves_few_keys_when_a_node_is_added():
+    ring = HashRing(NODE_NAMES)
+    grown_ring = HashRing([*NODE_NAMES, "redis://node-d"])
+    keys = [f"revoked:{i}" for i in range(3000)]
+
+    moved = [key for key in keys if ring.get(key) != grown_ring.get(key)]
+    assert all(grown_ring.get(key) == "redis://node-d" for key in moved)
+    assert len(moved) < len(keys) / 3
+
+
+@pytest.mark.asyncio
+async def test_sharded_redis_spreads_keys_over_nodes(redis: ShardedRedis):
+    keys = [f"token_generation:{i}" for i in range(30)]
+    for i, key in enumerate(keys):
+        await redis.set(key, i)
+
+    assert all([await node.dbsize() > 0 for node in redis.nodes])
+    assert await redis.mget(keys) == [str(i).encode() for i in range(30)]
+    assert sorted([key async for key in redis.scan_iter("token_generation:*")]) == (
+        sorted(key.encode() for key in keys)
+    )
+
+
+@pytest.mark.asyncio
+async def test_sharded_redis_node_failure(
+    redis: ShardedRedis,
+    servers: dict[str, FakeServer],
+):
+    ring = HashRing(NODE_NAMES)
+    keys = [f"revoked:{i}" for i in range(100)]
+    key = next(key for key in keys if ring.get(key) == NODE_NAMES[0])
+    other_key = next(key for key in keys if ring.get(key) != NODE_NAMES[0])
+
+    servers[NODE_NAMES[0]].connected = False
+    with pytest.raises(ConnectionError):
+        await redis.get(key)
+    assert not redis.is_healthy(NODE_NAMES[0])
+
+    # Known to be down, fails without touching the connection
+    with pytest.raises(RedisNodeUnavailable):
+        await redis.get(key)
+    assert await redis.get(other_key) is None
+
+    servers[NODE_NAMES[0]].connected = True
+    await redis.check_health()
+    assert redis.is_healthy(NODE_NAMES[0])
+    assert await redis.get(key) is None
+
+
+@pytest.mark.asyncio
+async def test_sharded_redis_pubsub_fails_over(
+    redis: ShardedRedis,
+    servers: dict[str, FakeServer],
+):
+    servers[NODE_NAMES[0]].connected = False
+    await redis.check_health()
+
+    async with redis.pubsub() as pubsub:
+        await pubsub.subscribe("channel")
+        assert await redis.publish("channel", "hello") == 1
+
+
+@pytest.mark.asyncio
+async def test_sharded_redis_publishes_on_every_healthy_node(
+    redis: ShardedRedis,
+    servers: dict[str, FakeServer],
+):
+    servers[NODE_NAMES[0]].connected = False
+    await redis.check_health()
+    async with redis.pubsub() as pubsub:
+        await pubsub.subscribe("channel")
+
+        # Subscribed on the second node, which isn't the first healthy one
+        # anymore
+        servers[NODE_NAMES[0]].connected = True
+        await redis.check_health()
+        assert redis.pubsub_node_name() == NODE_NAMES[0]
+        assert await redis.publish("channel", "hello") == 1
+
+    for server in servers.values():
+        server.connected = False
+    await redis.check_health()
+    with pytest.raises(RedisNodeUnavailable):
+        await redis.publish("channel", "hello")
+
+
+async def wait_for_ready(mirror: RevocationMirror) -> None:
+    async with asyncio.timeout(2):
+        while not mirror.ready:
+            await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_revocation_mirror_follows_node_recovery(
+    redis: ShardedRedis,
+    servers: dict[str, FakeServer],
+):
+    # Back up, but not checked yet: the mirror subscribes on the second node
+    servers[NODE_NAMES[0]].connected = False
+    await redis.check_health()
+    servers[NODE_NAMES[0]].connected = True
+
+    mirror = RevocationMirror(redis)
+    await mirror.start()
+    try:
+        await wait_for_ready(mirror)
+        await redis.check_health()
+        assert redis.pubsub_node_name() == NODE_NAMES[0]
+
+        expires_at = int(time.time()) + 60
+        await revoke_token(redis=redis, token_id="recovered", expires_at=expires_at)
+        async with asyncio.timeout(2):
+            while not mirror.is_revoked("recovered"):
+                await asyncio.sleep(0.01)
+    finally:
+        await mirror.stop()
+
+
+@pytest.mark.asyncio
+async def test_revocation_mirror_leaves_node_marked_down(
+    redis: ShardedRedis,
+    servers: dict[str, FakeServer],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(revocation, "LISTEN_TIMEOUT_SECONDS", 0.01)
+    mirror = RevocationMirror(redis)
+    await mirror.start()
+    try:
+        await wait_for_ready(mirror)
+        # The node answers the mirror but the health checks failed, messages
+        # aren't published there anymore
+        redis._set_health(NODE_NAMES[0], False)
+        async with asyncio.timeout(2):
+            while mirror.ready:
+                await asyncio.sleep(0.01)
+        await wait_for_ready(mirror)
+
+        await revoke_user_tokens(redis=redis, username="moved")
+        async with asyncio.timeout(2):
+            while mirror.get_generation("moved") != 1:
+                await asyncio.sleep(0.01)
+    finally:
+        await mirror.stop()
+
+
+@pytest.mark.asyncio
+async def test_revocation_mirror_stays_ready_when_idle(
+    idle_server: tuple[str, list[bytes]],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    url, commands = idle_server
+    monkeypatch.setattr(revocation, "LISTEN_TIMEOUT_SECONDS", 0.05)
+    redis = create_redis(
+        urls=[url],
+        max_connections=5,
+        socket_timeout=0.1,
+        health_check_interval=0.1,
+    )
+    mirror = RevocationMirror(redis)
+    await mirror.start()
+    try:
+        await wait_for_ready(mirror)
+
+        # Ten times the socket timeout without a message
+        ready = []
+        for _ in range(20):
+            await asyncio.sleep(0.05)
+            ready.append(mirror.ready)
+        assert all(ready)
+        # Loaded once, with a SCAN for each key prefix, and kept alive
+        assert commands.count(b"SCAN") == 2
+        assert commands.count(b"PING") >= 3
+    finally:
+        await mirror.stop()
+        await redis.aclose()
+
+
+@pytest.mark.asyncio
+async def test_revocation_mirror_loads_every_node(redis: ShardedRedis):
+    expires_at = int(time.time()) + 60
+    for i in range(20):
+        await revoke_token(redis=redis, token_id=f"token-{i}", expires_at=expires_at)
+        await revoke_user_tokens(redis=redis, username=f"user-{i}")
+
+    mirror = RevocationMirror(redis)
+    await mirror.start()
+    try:
+        async with asyncio.timeout(2):
+            while not mirror.ready:
+                await asyncio.sleep(0.01)
+
+        assert len(mirror) == 20
+        assert all(mirror.is_revoked(f"token-{i}") for i in range(20))
+        assert all(mirror.get_generation(f"user-{i}") == 1 for i in range(20))
+    finally:
+        await mirror.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("failure_policy", "status_code"),
+    [("closed", 503), ("open", 200)],
+)
+async def test_authentication_middleware_failure_policy(
+    redis: ShardedRedis,
+    servers: dict[str, FakeServer],
+    failure_policy: str,
+    status_code: int,
+):
+    app = FastAPI()
+    app.add_middleware(
+        AuthenticationMiddleware,
+        redis=redis,
+        failure_policy=failure_policy,
+    )
+
+    @app.get("/protected")
+    @protected_route
+    def protected_endpoint():
+        return "hello world"
+
+    jwt_token = generate_jwt(username="abc", jwt_secret=settings.JWT_SECRET)
+    token_id = get_token_id(
+        jwt_token,
+        validate_jwt_token(token=jwt_token, jwt_secret=settings.JWT_SECRET),
+    )
+    servers[HashRing(NODE_NAMES).get(f"revoked:{token_id}")].connected = False
+
+    async with AsyncClient(
+        transport=ASGITransport(app),
+        base_url=BASE_URL,
+    ) as client:
+        response = await client.get(
+            f"{BASE_URL}/protected",
+            headers={"Authorization": f"Bearer {jwt_token}"},
+        )
+    assert response.status_code == status_code
@@ -0,0 +1,416 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from server.db import engine
+from server.db.models import (
+    PageView,
+    Quiz,
+    QuizQuestion,
+    QuizQuestionOption,
+    QuizSubmission,
+    QuizSubmissionAnswer,
+    User,
+)
+from server.db.sessions import ROUTE_KEY
+from server.db.shards import UNSHARDED, Shard, ShardSet, create_shard_tables
+from server.routes.platform_stats import services as platform_stats_services
+from server.routes.quizes import services as quizes_services
+from server.routes.quizes.schemas import QuizDetailSchema
+from server.routes.students import services as students_services
+from server.routes.students.schemas import StudentDetailSchema
+
+# Two shards as two schemas of the test database
+SHARD_SCHEMAS = ["test_shard_0", "test_shard_1"]
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.info = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+def test_get_shard():
+    shards = ShardSet(
+        [
+            Shard(name=str(index), engine=create_async_engine(engine.url))
+            for index in range(3)
+        ]
+    )
+    assert shards.enabled
+    assert not UNSHARDED.enabled
+    assert [shards.get_shard(user_id).name for user_id in (3, 4, 8)] == ["0", "1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_scatter():
+    db_session = FakeSession()
+    db_session.info[ROUTE_KEY] = "GET /students"
+
+    async def query(session) -> str:
+        return session.info[ROUTE_KEY]
+
+    assert await UNSHARDED.scatter(db_session, query) == ["GET /students"]
+
+    shards = ShardSet(
+        [
+            Shard(name=str(index), engine=create_async_engine(engine.url))
+            for index in range(2)
+        ]
+    )
+    for shard in shards.shards:
+        shard.session_maker = FakeSession
+    assert await shards.scatter(db_session, query) == ["GET /students"] * 2
+
+
+def test_most_popular_page():
+    get_most_popular_page = platform_stats_services.get_most_popular_page
+    assert get_most_popular_page([[("/b", 5)]], 1) == "/b"
+    assert get_most_popular_page([[], []], 2) is None
+
+    # "/a" has 9 views, "/c" at most 3 + 2 and an unlisted url 2 + 2
+    views_per_shard = [[("/a", 5), ("/c", 3)], [("/a", 4), ("/b", 2)]]
+    assert get_most_popular_page(views_per_shard, 2) == "/a"
+    # Complete lists, the tie goes to the first url
+    views_per_shard = [[("/b", 3), ("/a", 1)], [("/a", 2)]]
+    assert get_most_popular_page(views_per_shard, None) == "/a"
+
+
+@pytest.mark.parametrize(
+    "views_per_shard",
+    [
+        # "/c" may have 4 + 4 views, "/a" has 6
+        [[("/a", 5), ("/c", 4)], [("/a", 1), ("/b", 4)]],
+        # "/a" has 4 views, those missing from both lists may have 3 + 3
+        [[("/a", 4), ("/b", 3)], [("/c", 3), ("/d", 3)]],
+    ],
+)
+def test_most_popular_page_unknown(views_per_shard: list):
+    with pytest.raises(LookupError):
+        platform_stats_services.get_most_popular_page(views_per_shard, 2)
+
+
+@pytest_asyncio.fixture(scope="function", name="shards")
+async def shards():
+    """
+    Shards in scratch schemas of the test database, dropped at the end.
+    Skipped when the test database isn't running.
+    """
+    admin_engine = create_async_engine(engine.url, poolclass=NullPool)
+    try:
+        async with admin_engine.begin() as conn:
+            for schema in SHARD_SCHEMAS:
+                await conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+                await conn.exec_driver_sql(f"CREATE SCHEMA {schema}")
+                await conn.exec_driver_sql(f"SET LOCAL search_path TO {schema}")
+                await conn.run_sync(create_shard_tables)
+    except OSError:
+        await admin_engine.dispose()
+        pytest.skip("The test database isn't running")
+
+    shard_set = ShardSet(
+        [
+            Shard(
+                name=schema,
+                engine=create_async_engine(
+                    engine.url,
+                    poolclass=NullPool,
+                    connect_args={"server_settings": {"search_path": schema}},
+                ),
+            )
+            for schema in SHARD_SCHEMAS
+        ]
+    )
+    try:
+        yield shard_set
+    finally:
+        for shard in shard_set.shards:
+            await shard.engine.dispose()
+        async with admin_engine.begin() as conn:
+            for schema in SHARD_SCHEMAS:
+                await conn.exec_driver_sql(f"DROP SCHEMA {schema} CASCADE")
+        await admin_engine.dispose()
+
+
+@pytest_asyncio.fixture(scope="function", name="db_session")
+async def db_session(shards: ShardSet):
+    """
+    A primary session in a transaction rolled back at the end, with the
+    same events on the primary and on the shards.
+    """
+    db_engine = create_async_engine(engine.url, poolclass=NullPool)
+    async with db_engine.connect() as conn:
+        async with AsyncSession(bind=conn) as session:
+            await fill(session, shards)
+            yield session
+        await conn.rollback()
+    await db_engine.dispose()
+
+
+async def fill(session: AsyncSession, shards: ShardSet) -> None:
+    for model in (QuizSubmissionAnswer, QuizSubmission, PageView):
+        await session.execute(delete(model))
+
+    users = [
+        User(username=f"shard-{i}", name=f"Shard {i}", password="", role="student")
+        for i in range(7)
+    ]
+    users.append(
+        User(username="shard-editor", name="Editor", password="", role="editor")
+    )
+    quizes = [Quiz(title=f"Quiz {i}", description="") for i in range(2)]
+    session.add_all(users + quizes)
+    await session.flush()
+
+    questions = [
+        QuizQuestion(quiz_id=quiz.id, title=f"Question {i}", description="")
+        # Three questions in the first quiz, for ratios off the score bins
+        for quiz_index, quiz in enumerate(quizes)
+        for i in range(3 - quiz_index)
+    ]
+    session.add_all(questions)
+    await session.flush()
+
+    options = {
+        question.id: [
+            QuizQuestionOption(question_id=question.id, is_correct=i == 0)
+            for i in range(2)
+        ]
+        for question in questions
+    }
+    session.add_all([option for pair in options.values() for option in pair])
+    await session.flush()
+
+    # The last two students have no submissions, the editor has some
+    submissions, answers, page_views = [], [], []
+    now = datetime.now()
+    for index, user in enumerate(users[:5] + users[-1:]):
+        for attempt in range(index % 3 + 1):
+            quiz = quizes[(index + attempt) % 2]
+            submission_id = 1000 + len(submissions)
+            submissions.append(
+                {
+                    "id": submission_id,
+                    "user_id": user.id,
+                    "quiz_id": quiz.id,
+                    "created_at": now,
+                }
+            )
+            for question in questions:
+                if question.quiz_id != quiz.id:
+                    continue
+
+                option = options[question.id][(index + attempt + question.id) % 2]
+                answers.append(
+                    {
+                        "submission_id": submission_id,
+                        "question_id": question.id,
+                        "selected_option_id": option.id,
+                        "spent_time_seconds": 10 * (index + 1),
+                    }
+                )
+
+        for day in range(index + 1):
+            page_views.append(
+                {
+                    "user_id": user.id,
+                    "url": f"/quiz/{index % 3}",
+                    "created_at": now - timedelta(days=day * 10),
+                }
+            )
+
+    await session.execute(insert(QuizSubmission), submissions)
+    await session.execute(insert(QuizSubmissionAnswer), answers)
+    await session.execute(insert(PageView), page_views)
+
+    for shard in shards.shards:
+
+        def on_shard(rows, key="user_id"):
+            return [row for row in rows if shards.get_shard(row[key]) is shard]
+
+        shard_submissions = on_shard(submissions)
+        shard_submission_ids = {row["id"] for row in shard_submissions}
+        async with shard.engine.begin() as conn:
+            for model, rows in (
+                (QuizSubmission, shard_submissions),
+                (
+                    QuizSubmissionAnswer,
+                    [
+                        row
+                        for row in answers
+                        if row["submission_id"] in shard_submission_ids
+                    ],
+                ),
+                (PageView, on_shard(page_views)),
+            ):
+                if rows:
+                    await conn.execute(insert(model.__table__), rows)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"success_threshold": 0.6},
+        {"success_threshold": 0.668},
+        {"limit": 3, "offset": 2},
+        {"limit": 3, "offset": 5},
+        {"usernames": ["shard-1", "shard-6", "shard-editor"]},
+        {"usernames": ["shard-2", "shard-5"], "out_type": StudentDetailSchema},
+        {"out_type": StudentDetailSchema, "fields": frozenset()},
+        {"out_type": StudentDetailSchema, "fields": frozenset({"quizes"})},
+        {"after": (1, 2, 0)},
+        {"after": (0, 0, 0), "limit": 3},
+    ],
+)
+async def test_sharded_list_students(
+    db_session: AsyncSession, shards: ShardSet, kwargs: dict
+):
+    expected = await students_services.list_students(db_session, **kwargs)
+    result = await students_services.list_students(db_session, shards=shards, **kwargs)
+    assert result == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sharded", [False, True])
+async def test_student_quizes_add_up(
+    db_session: AsyncSession, shards: ShardSet, sharded: bool
+):
+    # Two thirds of the first quiz right are in bin 67, successful at 0.668
+    students = await students_services.list_students(
+        db_session,
+        usernames=[f"shard-{i}" for i in range(5)],
+        success_threshold=0.668,
+        out_type=StudentDetailSchema,
+        shards=shards if sharded else UNSHARDED,
+    )
+    assert students
+    for student in students:
+        assert student.successful_submissions == sum(
+            quiz.successful_submissions_count for quiz in student.quizes
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sharded", [False, True])
+async def test_students_cursor_pages(
+    db_session: AsyncSession, shards: ShardSet, sharded: bool
+):
+    # Pages across the students with and without submissions
+    usernames = [f"shard-{i}" for i in range(7)]
+    kwargs = {"usernames": usernames, "shards": shards if sharded else UNSHARDED}
+    expected = await students_services.list_students(db_session, **kwargs)
+    assert len(expected) == 7
+
+    students, after = [], None
+    while True:
+        page = await students_services.list_students(
+            db_session, limit=3, after=after, **kwargs
+        )
+        students += page
+        if len(page) < 3:
+            break
+        after = students_services.sort_key(page[-1])
+    assert students == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"success_threshold": 0.6},
+        {"success_threshold": 0.668},
+        {"limit": 1, "offset": 1},
+        {"out_type": QuizDetailSchema},
+        {"out_type": QuizDetailSchema, "fields": frozenset()},
+        {"out_type": QuizDetailSchema, "fields": frozenset({"questions"})},
+        {"after": (3, 1, 0)},
+        {"after": (0, 0, 0), "limit": 3},
+    ],
+)
+async def test_sharded_list_quizes(
+    db_session: AsyncSession, shards: ShardSet, kwargs: dict
+):
+    expected = await quizes_services.list_quizes(db_session, **kwargs)
+    result = await quizes_services.list_quizes(db_session, shards=shards, **kwargs)
+    assert result == expected
+
+
+@pytest.mark.asyncio
+async def test_sharded_quiz_stats(db_session: AsyncSession, shards: ShardSet):
+    quiz_ids = list(
+        await db_session.scalars(
+            select(Quiz.id).where(Quiz.title.like("Quiz _")).order_by(Quiz.id.desc())
+        )
+    )[:2]
+    [detail] = await quizes_services.list_quizes(
+        db_session, ids=quiz_ids[:1], out_type=QuizDetailSchema, shards=shards
+    )
+    assert detail.total_submissions_count > 0
+    assert len(detail.questions) == 2
+    assert [detail] == await quizes_services.list_quizes(
+        db_session, ids=quiz_ids[:1], out_type=QuizDetailSchema
+    )
+
+    for kwargs in ({}, {"ids": quiz_ids}, {"success_threshold": 0.6}):
+        assert await quizes_services.get_quiz_stats(
+            db_session, shards=shards, **kwargs
+        ) == await quizes_services.get_quiz_stats(db_session, **kwargs)
+
+    for quiz_id in quiz_ids:
+        distribution = await quizes_services.get_score_distribution(
+            db_session, quiz_id, shards=shards
+        )
+        assert distribution.total_submissions > 0
+        assert distribution == await quizes_services.get_score_distribution(
+            db_session, quiz_id
+        )
+
+
+@pytest.mark.asyncio
+async def test_sharded_stats(db_session: AsyncSession, shards: ShardSet):
+    student_stats = await students_services.get_student_stats(db_session, shards=shards)
+    assert student_stats == await students_services.get_student_stats(db_session)
+    # The editor's submissions don't rank them among the students
+    assert "shard-editor" not in {
+        student.username for student in student_stats.top_students
+    }
+
+    platform_stats = await platform_stats_services.get_platform_stats(
+        db_session, shards=shards
+    )
+    assert platform_stats == await platform_stats_services.get_platform_stats(
+        db_session
+    )
+    assert platform_stats.monthly_active_users_count == 6
+
+    today = date.today()
+    daily_stats = await platform_stats_services.get_daily_platform_stats_distribution(
+        db_session,
+        start_date=today - timedelta(days=60),
+        end_date=today,
+        offset=1,
+        limit=3,
+        shards=shards,
+    )
+    assert daily_stats == (
+        await platform_stats_services.get_daily_platform_stats_distribution(
+            db_session,
+            start_date=today - timedelta(days=60),
+            end_date=today,
+            offset=1,
+            limit=3,
+        )
+    )
+    assert [day.page_views for day in daily_stats] == [2, 3, 4]
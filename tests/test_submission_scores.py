@@ -0,0 +1,324 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from server.db import engine
+from server.db.models import (
+    Quiz,
+    QuizQuestion,
+    QuizQuestionOption,
+    QuizScoreHistogram,
+    QuizSubmission,
+    QuizSubmissionAnswer,
+    QuizSubmissionScore,
+    User,
+)
+from server.db.scores import rebuild_score_histograms, refresh_scores_batch
+from server.routes.quizes import services as quizes_services
+from server.routes.quizes.schemas import QuizDetailSchema
+from server.routes.students import services as students_services
+
+
+@pytest_asyncio.fixture(scope="function", name="db_session")
+async def db_session():
+    """
+    A session in a transaction rolled back at the end. Needs the migrated
+    test database, skipped when it isn't running.
+    """
+    db_engine = create_async_engine(engine.url, poolclass=NullPool)
+    try:
+        async with db_engine.connect() as conn:
+            async with AsyncSession(bind=conn) as session:
+                yield session
+            await conn.rollback()
+    except OSError:
+        pytest.skip("The test database isn't running")
+    finally:
+        await db_engine.dispose()
+
+
+async def create_quiz(session: AsyncSession) -> tuple[User, Quiz, list[list[int]]]:
+    """A student and a quiz of three questions, the first option is correct"""
+    user = User(username="scores", name="Scores", password="", role="student")
+    quiz = Quiz(title="Scores", description="")
+    session.add_all([user, quiz])
+    await session.flush()
+
+    questions = [QuizQuestion(quiz_id=quiz.id, title=f"Q{i}") for i in range(3)]
+    session.add_all(questions)
+    await session.flush()
+
+    options = [
+        [
+            QuizQuestionOption(question_id=question.id, is_correct=i == 0)
+            for i in range(2)
+        ]
+        for question in questions
+    ]
+    session.add_all([option for question in options for option in question])
+    await session.flush()
+    return user, quiz, [[option.id for option in question] for question in options]
+
+
+async def submit(
+    session: AsyncSession,
+    user: User,
+    quiz: Quiz,
+    selected_option_ids: list[int],
+) -> int:
+    submission = QuizSubmission(user_id=user.id, quiz_id=quiz.id)
+    session.add(submission)
+    await session.flush()
+
+    question_ids = await session.scalars(
+        select(QuizQuestion.id).where(QuizQuestion.quiz_id == quiz.id).order_by("id")
+    )
+    session.add_all(
+        [
+            QuizSubmissionAnswer(
+                submission_id=submission.id,
+                question_id=question_id,
+                selected_option_id=option_id,
+                spent_time_seconds=10,
+            )
+            for question_id, option_id in zip(question_ids, selected_option_ids)
+        ]
+    )
+    await session.flush()
+    return submission.id
+
+
+async def get_score(session: AsyncSession, submission_id: int) -> tuple | None:
+    result = await session.execute(
+        select(
+            QuizSubmissionScore.correct_count,
+            QuizSubmissionScore.total_count,
+            QuizSubmissionScore.spent_time_seconds,
+        ).where(QuizSubmissionScore.submission_id == submission_id)
+    )
+    return result.tuples().one_or_none()
+
+
+@pytest.mark.asyncio
+async def test_score_follows_answers(db_session: AsyncSession):
+    user, quiz, options = await create_quiz(db_session)
+    submission_id = await submit(
+        db_session, user, quiz, [options[0][0], options[1][1], options[2][0]]
+    )
+    assert await get_score(db_session, submission_id) == (2, 3, 30)
+
+    await db_session.execute(
+        update(QuizSubmissionAnswer)
+        .where(QuizSubmissionAnswer.selected_option_id == options[1][1])
+        .values(selected_option_id=options[1][0])
+    )
+    assert await get_score(db_session, submission_id) == (3, 3, 30)
+
+    await db_session.execute(
+        update(QuizQuestionOption)
+        .where(QuizQuestionOption.id == options[0][0])
+        .values(is_correct=False)
+    )
+    assert await get_score(db_session, submission_id) == (2, 3, 30)
+
+    await db_session.execute(
+        delete(QuizSubmissionAnswer).where(
+            QuizSubmissionAnswer.submission_id == submission_id
+        )
+    )
+    assert await get_score(db_session, submission_id) is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_scores_batch(db_session: AsyncSession):
+    user, quiz, options = await create_quiz(db_session)
+    first = await submit(db_session, user, quiz, [options[0][0], options[1][0]])
+    second = await submit(db_session, user, quiz, [options[0][1]])
+    await db_session.execute(
+        update(QuizSubmissionScore)
+        .where(QuizSubmissionScore.submission_id.in_([first, second]))
+        .values(correct_count=5, total_count=5)
+    )
+
+    conn = await db_session.connection()
+    assert await conn.run_sync(refresh_scores_batch, first - 1, 1) == [first]
+    assert await get_score(db_session, first) == (2, 2, 20)
+    assert await get_score(db_session, second) == (5, 5, 10)
+    assert await conn.run_sync(refresh_scores_batch, first, 10) == [second]
+    assert await get_score(db_session, second) == (0, 1, 10)
+
+
+@pytest.mark.asyncio
+async def test_quiz_list_reads_scores(db_session: AsyncSession):
+    user, quiz, options = await create_quiz(db_session)
+    await submit(db_session, user, quiz, [options[0][0], options[1][0], options[2][1]])
+    await submit(db_session, user, quiz, [options[0][1], options[1][1], options[2][1]])
+
+    [listed] = await quizes_services.list_quizes(
+        db_session, ids=[quiz.id], success_threshold=0.5
+    )
+    assert listed.total_submissions_count == 2
+    assert listed.successful_submissions_count == 1
+    assert listed.avg_time_spent_sec == 10
+
+    [counts_only] = await quizes_services.list_quizes(
+        db_session,
+        ids=[quiz.id],
+        success_threshold=0.5,
+        out_type=QuizDetailSchema,
+        fields=frozenset(),
+    )
+    assert counts_only.model_fields_set == {
+        "id",
+        "title",
+        "description",
+        "image",
+        "created_at",
+        "total_submissions_count",
+        "successful_submissions_count",
+    }
+    assert counts_only.successful_submissions_count == 1
+
+
+@pytest.mark.asyncio
+async def test_quiz_stats_are_scoped_to_ids(db_session: AsyncSession):
+    user, quiz, options = await create_quiz(db_session)
+    await submit(db_session, user, quiz, [options[0][0], options[1][0], options[2][1]])
+    await submit(db_session, user, quiz, [options[0][1], options[1][1], options[2][1]])
+    empty_quiz = Quiz(title="Empty", description="")
+    db_session.add(empty_quiz)
+    await db_session.flush()
+
+    stats = await quizes_services.get_quiz_stats(
+        db_session, ids=[quiz.id, empty_quiz.id], success_threshold=0.5
+    )
+    assert stats.quizzes_count == 2
+    assert stats.submissions_count == 2
+    assert stats.successful_submissions_count == 1
+    assert stats.avg_time_spent_sec == 10
+
+    stats = await quizes_services.get_quiz_stats(db_session, ids=[empty_quiz.id])
+    assert (stats.quizzes_count, stats.submissions_count) == (1, 0)
+    assert stats.avg_time_spent_sec == 0
+
+
+@pytest.mark.asyncio
+async def test_quiz_cursor_pages(db_session: AsyncSession):
+    user, quiz, options = await create_quiz(db_session)
+    quizes = [quiz] + [Quiz(title=f"Other {i}", description="") for i in range(3)]
+    db_session.add_all(quizes[1:])
+    await db_session.flush()
+    await submit(db_session, user, quiz, [options[0][0]])
+    await submit(db_session, user, quiz, [options[0][1]])
+
+    ids = [quiz.id for quiz in quizes]
+    expected = await quizes_services.list_quizes(db_session, ids=ids)
+    assert [listed.id for listed in expected] == sorted(ids)
+
+    listed, after = [], None
+    while True:
+        page = await quizes_services.list_quizes(
+            db_session, ids=ids, limit=2, after=after
+        )
+        listed += page
+        if len(page) < 2:
+            break
+        after = quizes_services.sort_key(page[-1])
+    assert listed == expected
+
+
+async def get_histogram(session: AsyncSession, quiz: Quiz) -> dict[int, int]:
+    result = await session.execute(
+        select(QuizScoreHistogram.bin, QuizScoreHistogram.submissions).where(
+            QuizScoreHistogram.quiz_id == quiz.id,
+            QuizScoreHistogram.submissions > 0,
+        )
+    )
+    return dict(result.tuples().all())
+
+
+@pytest.mark.asyncio
+async def test_histograms_follow_scores(db_session: AsyncSession):
+    user, quiz, options = await create_quiz(db_session)
+    # 1/3 goes to the bin of (0.33, 0.34]
+    first = await submit(db_session, user, quiz, [options[0][0], options[1][1]])
+    await submit(db_session, user, quiz, [options[0][0], options[1][1], options[2][1]])
+    assert await get_histogram(db_session, quiz) == {50: 1, 34: 1}
+
+    await db_session.execute(
+        delete(QuizSubmissionAnswer).where(
+            QuizSubmissionAnswer.submission_id == first,
+            QuizSubmissionAnswer.selected_option_id == options[1][1],
+        )
+    )
+    assert await get_histogram(db_session, quiz) == {100: 1, 34: 1}
+
+    conn = await db_session.connection()
+    await conn.run_sync(rebuild_score_histograms)
+    assert await get_histogram(db_session, quiz) == {100: 1, 34: 1}
+
+
+@pytest.mark.asyncio
+async def test_histograms_follow_truncate(db_session: AsyncSession):
+    user, quiz, options = await create_quiz(db_session)
+    await submit(db_session, user, quiz, [options[0][0]])
+    assert await get_histogram(db_session, quiz) == {100: 1}
+
+    await db_session.execute(text("TRUNCATE quiz_submissions CASCADE"))
+    assert await get_histogram(db_session, quiz) == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("success_threshold", "successful"),
+    [(0, 3), (0.33, 3), (0.34, 2), (0.66, 2), (0.67, 1), (1, 0)],
+)
+async def test_success_threshold(
+    db_session: AsyncSession, success_threshold: float, successful: int
+):
+    user, quiz, options = await create_quiz(db_session)
+    for correct in range(4):
+        await submit(
+            db_session,
+            user,
+            quiz,
+            [
+                question[0] if index < correct else question[1]
+                for index, question in enumerate(options)
+            ],
+        )
+
+    [listed] = await quizes_services.list_quizes(
+        db_session, ids=[quiz.id], success_threshold=success_threshold
+    )
+    assert listed.total_submissions_count == 4
+    assert listed.successful_submissions_count == successful
+
+    [student] = await students_services.list_students(
+        db_session, usernames=[user.username], success_threshold=success_threshold
+    )
+    assert student.successful_submissions == successful
+
+
+@pytest.mark.asyncio
+async def test_score_distribution(db_session: AsyncSession):
+    user, quiz, options = await create_quiz(db_session)
+    await submit(db_session, user, quiz, [options[0][1], options[1][1], options[2][1]])
+    await submit(db_session, user, quiz, [options[0][0], options[1][0], options[2][0]])
+
+    distribution = await quizes_services.get_score_distribution(db_session, quiz.id)
+    assert distribution.total_submissions == 2
+    assert len(distribution.bins) == 101
+    assert [
+        (score_bin.min_ratio, score_bin.max_ratio)
+        for score_bin in distribution.bins[:2]
+    ] == [(0, 0), (0, 0.01)]
+    assert {
+        score_bin.max_ratio: score_bin.submissions
+        for score_bin in distribution.bins
+        if score_bin.submissions
+    } == {0: 1, 1: 1}
+
+    assert await quizes_services.get_score_distribution(db_session, -1) is None
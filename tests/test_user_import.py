@@ -0,0 +1,122 @@
+import time
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from server.authentication.passwords import PasswordHashing
+from server.db import engine
+from server.db.sessions import create_session_maker
+from server.routes.users.importing import ImportFormat, parse_rows
+from server.routes.users.schemas import UserImportRow
+from server.routes.users.services import hash_passwords, import_users
+from server.schemas import UserRole
+
+pytestmark = pytest.mark.asyncio
+
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+async def collect(data: bytes, import_format: ImportFormat, chunk_size: int = 3):
+    return [row async for row in parse_rows(chunked(data, chunk_size), import_format)]
+
+
+async def test_parse_rows_csv():
+    data = (
+        "username,name,password,role\r\n"
+        "jdoe,John Doe,secret,editor\r\n"
+        "\r\n"
+        'ołena,"Олена, Ш.",pa55,\r\n'
+        "nopass,No Password,,student\r\n"
+        "short\n"
+    ).encode()
+
+    rows = await collect(data, ImportFormat.CSV)
+
+    assert rows[0] == (
+        1,
+        UserImportRow(
+            username="jdoe",
+            name="John Doe",
+            password="secret",
+            role=UserRole.EDITOR,
+        ),
+    )
+    assert rows[1][0] == 2
+    assert isinstance(rows[1][1], str)  # empty role is not a valid role
+    assert rows[2][0] == 3 and "password" in rows[2][1]
+    assert rows[3][0] == 4 and "name" in rows[3][1]
+
+
+async def test_parse_rows_ndjson():
+    data = (
+        b'{"username": "jdoe", "name": "John Doe", "password": "secret"}\n'
+        b"not json\n"
+        b'{"username": "x"}'
+    )
+
+    rows = await collect(data, ImportFormat.NDJSON, chunk_size=7)
+
+    assert rows[0] == (
+        1,
+        UserImportRow(username="jdoe", name="John Doe", password="secret"),
+    )
+    assert rows[0][1].role is UserRole.STUDENT
+    assert rows[1][0] == 2 and isinstance(rows[1][1], str)
+    assert rows[2][0] == 3 and isinstance(rows[2][1], str)
+
+
+class RecordingHasher:
+    """Records how many hashes wait for a worker whenever one is computed"""
+
+    def __init__(self) -> None:
+        self.hashing: PasswordHashing | None = None
+        self.waiting: list[int] = []
+
+    def hash(self, password: str) -> str:
+        self.waiting.append(self.hashing.waiting)
+        time.sleep(0.001)
+        return password[::-1]
+
+
+async def test_hash_passwords_in_chunks():
+    hasher = RecordingHasher()
+    hashing = PasswordHashing(hasher=hasher, max_workers=2)
+    hasher.hashing = hashing
+    passwords = [f"password-{i}" for i in range(7)]
+
+    try:
+        hashed = await hash_passwords(hashing, passwords)
+    finally:
+        hashing.shutdown()
+
+    assert hashed == [password[::-1] for password in passwords]
+    assert hashing.completed == 7
+    assert max(hasher.waiting) == 0
+
+
+async def test_import_users_releases_reads_first():
+    db_engine = create_async_engine(engine.url, poolclass=NullPool)
+    in_transaction: list[bool] = []
+    hashing = PasswordHashing(hasher=RecordingHasher(), max_workers=1)
+
+    async def rows():
+        in_transaction.append(session.in_transaction())
+        return
+        yield
+
+    try:
+        async with create_session_maker(db_engine)() as session:
+            await session.scalar(select(func.now()))
+            await import_users(session, hashing, rows())
+    except OSError:
+        pytest.skip("The test database isn't running")
+    finally:
+        hashing.shutdown()
+        await db_engine.dispose()
+
+    assert in_transaction == [False]